@@ -0,0 +1,86 @@
+import bisect
+import math
+from array import array
+
+DAY = 24 * 60 * 60
+AGE_BUCKETS = (
+    ("today", DAY),
+    ("last week", 8 * DAY),
+    ("last month", 31 * DAY),
+    ("this year", 366 * DAY),
+    ("last year", 731 * DAY),
+    ("waaaay too long ago", math.inf),
+)
+AGE_LIMITS = [limit for _, limit in AGE_BUCKETS]
+UNKNOWN_AGE = "unknown"
+
+
+def get_age_bucket(mtime, now: float) -> str:
+    if mtime is None:
+        return UNKNOWN_AGE
+    position = bisect.bisect_right(AGE_LIMITS, max(now - mtime, 0))
+    return AGE_BUCKETS[position][0]
+
+
+def add_to_table(table: dict, key, size: int, count: int = 1):
+    totals = table.get(key)
+    if totals is None:
+        table[key] = [size, count]
+    else:
+        totals[0] += size
+        totals[1] += count
+
+
+class Aggregates:
+    __slots__ = ("keys", "totals", "owners_start", "ages_start")
+
+    def __init__(self, extensions: dict, owners: dict, ages: dict):
+        tables = (extensions, owners, ages)
+        self.keys = tuple(key for table in tables for key in table)
+        self.totals = array("q", [value for table in tables for totals in table.values() for value in totals])
+        self.owners_start = len(extensions)
+        self.ages_start = self.owners_start + len(owners)
+
+    @property
+    def extensions(self) -> dict:
+        return self.get_table(0, self.owners_start)
+
+    @property
+    def owners(self) -> dict:
+        return self.get_table(self.owners_start, self.ages_start)
+
+    @property
+    def ages(self) -> dict:
+        return self.get_table(self.ages_start, len(self.keys))
+
+    def get_table(self, start: int, stop: int) -> dict:
+        totals = self.totals
+        return {self.keys[index]: (totals[2 * index], totals[2 * index + 1]) for index in range(start, stop)}
+
+    def add_to(self, tables: tuple[dict, dict, dict]):
+        keys, totals = self.keys, self.totals
+        bounds = (0, self.owners_start, self.ages_start, len(keys))
+        for table, start, stop in zip(tables, bounds, bounds[1:]):
+            for index in range(start, stop):
+                add_to_table(table, keys[index], totals[2 * index], totals[2 * index + 1])
+
+    @staticmethod
+    def get_largest(table: dict, count: int = None) -> list[tuple]:
+        rows = sorted(((key, size, files) for key, (size, files) in table.items()),
+                      key=lambda row: row[1], reverse=True)
+        return rows if count is None else rows[:count]
+
+
+def collect(folder, now: float):
+    tables = ({}, {}, {})
+    extensions, owners, ages = tables
+    for file in folder.files:
+        size = file.size
+        add_to_table(extensions, file.extension, size)
+        add_to_table(owners, file.owner_id, size)
+        add_to_table(ages, get_age_bucket(file.mtime, now), size)
+    for subfolder in folder.folders:
+        if subfolder.aggregates is not None:
+            subfolder.aggregates.add_to(tables)
+    folder.aggregates = Aggregates(*tables) if extensions else None
+    return folder.aggregates
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import time
+
+import duplicates
+from disk_usage import CalculatingMemoryUsage
+from duplicates import DuplicateFinder
+from largest import iterate_files
+
+FOLDERS = 20
+FILES_PER_FOLDER = 50
+FILE_SIZE = 256 * 1024
+COPIES = 4
+
+
+def make_tree(root: str):
+    for i in range(FOLDERS):
+        folder = os.path.join(root, f"folder{i}")
+        os.makedirs(folder)
+        for j in range(FILES_PER_FOLDER):
+            index = i * FILES_PER_FOLDER + j
+            seed = index // COPIES if index % 2 else index + FOLDERS * FILES_PER_FOLDER
+            with open(os.path.join(folder, f"file{j}.bin"), "wb") as file:
+                file.write(seed.to_bytes(4, "little") * (FILE_SIZE // 4))
+
+
+def hash_everything(tree) -> int:
+    digests = {}
+    for file in iterate_files(tree):
+        digests.setdefault(duplicates.hash_full(file.location), []).append(file)
+    return sum(len(files) > 1 for files in digests.values())
+
+
+def measure(function) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        make_tree(root)
+        tree = CalculatingMemoryUsage(root, resolve_owners=False).run()
+        cache_path = os.path.join(root, "hashes.json")
+        print(f"synthetic tree: {FOLDERS * FILES_PER_FOLDER} files of {FILE_SIZE // 1024} kb, half of them in groups of {COPIES // 2}")
+        elapsed, groups = measure(lambda: hash_everything(tree))
+        print(f"full hash of every file, one thread: {elapsed:.3f} s, {groups} groups")
+        for workers in sorted({1, 4, duplicates.HASH_WORKERS}):
+            finder = DuplicateFinder(tree, workers=workers)
+            elapsed, groups = measure(finder.run)
+            print(f"staged pipeline, {workers} workers: {elapsed:.3f} s, {len(groups)} groups, "
+                  f"{finder.partial_hashes} partial and {finder.full_hashes} full hashes")
+        DuplicateFinder(tree, cache_path=cache_path).run()
+        finder = DuplicateFinder(tree, cache_path=cache_path)
+        elapsed, groups = measure(finder.run)
+        print(f"staged pipeline with a warm hash cache: {elapsed:.3f} s, {len(groups)} groups")
+
+
+if __name__ == "__main__":
+    main()
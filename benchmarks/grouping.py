@@ -0,0 +1,40 @@
+import time
+
+import grouping
+
+CHILDREN = 200_000
+EXTENSIONS = 300
+
+
+def make_children() -> list[tuple[str, str]]:
+    return [(f"file{i}", f".ext{i % EXTENSIONS}" if i % 10 else "") for i in range(CHILDREN)]
+
+
+def group_per_group(children: list, get_key, is_other) -> list:
+    values = {get_key(child) for child in children if get_key(child)}
+    groups = []
+    grouped = set()
+    for value in values:
+        matching = [child for child in children if value <= get_key(child) <= value]
+        if matching:
+            groups.append((value, matching))
+            grouped.update(id(child) for child in matching)
+    other = [child for child in children if is_other(child) and id(child) not in grouped]
+    return groups + ([("other", other)] if other else [])
+
+
+def measure(function, children: list) -> float:
+    start = time.perf_counter()
+    function(children, lambda child: child[1], lambda child: not child[1])
+    return time.perf_counter() - start
+
+
+def main():
+    children = make_children()
+    print(f"{CHILDREN} children, {EXTENSIONS} extensions")
+    print(f"one pass per group: {measure(group_per_group, children):.3f} s")
+    print(f"single pass: {measure(grouping.group_by_values, children):.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import importlib.util
+import subprocess
+import sys
+from pathlib import Path
+
+RUNS = 7
+ROOT = Path(__file__).parent.parent
+IMPORTS = (
+    ("scan core (disk_usage)", "import disk_usage", ()),
+    ("scan core with the eager imports it used to have",
+     "import concurrent.futures, multiprocessing; from PyQt5 import QtCore; import disk_usage", ("PyQt5",)),
+    ("headless CLI (cli)", "import cli", ()),
+    ("GUI (main)", "import main", ("PyQt5",)),
+    ("GUI with eager ctypes.util and win32api", "import ctypes.util, win32api; import main", ("PyQt5", "win32api")),
+)
+
+
+def measure(statement: str) -> float:
+    script = f"import time; start = time.perf_counter(); {statement}; print(time.perf_counter() - start)"
+    timings = []
+    for _ in range(RUNS):
+        result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+        timings.append(float(result.stdout))
+    return min(timings)
+
+
+def main():
+    for name, statement, modules in IMPORTS:
+        missing = [module for module in modules if importlib.util.find_spec(module) is None]
+        if missing:
+            print(f"{name}: skipped, {', '.join(missing)} is not installed")
+            continue
+        print(f"{name}: {measure(statement) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
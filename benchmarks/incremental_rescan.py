@@ -0,0 +1,54 @@
+import os
+import tempfile
+import time
+
+from disk_usage import CalculatingMemoryUsage
+
+FOLDERS = 40
+SUBFOLDERS = 25
+FILES_PER_FOLDER = 20
+CHANGED_FOLDERS = 10
+
+
+def make_tree(root: str):
+    for i in range(FOLDERS):
+        for j in range(SUBFOLDERS):
+            folder = os.path.join(root, f"folder{i}", f"subfolder{j}")
+            os.makedirs(folder)
+            for k in range(FILES_PER_FOLDER):
+                with open(os.path.join(folder, f"file{k}.bin"), "wb") as file:
+                    file.write(b"\0" * k)
+    old = time.time() - 1000
+    for path, folders, _ in os.walk(root):
+        for folder in folders:
+            os.utime(os.path.join(path, folder), (old, old))
+
+
+def change_tree(root: str):
+    for i in range(CHANGED_FOLDERS):
+        with open(os.path.join(root, f"folder{i}", "subfolder0", "new.bin"), "wb") as file:
+            file.write(b"\0" * 100)
+
+
+def measure(task: CalculatingMemoryUsage) -> float:
+    start = time.perf_counter()
+    task.run()
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        make_tree(root)
+        full = CalculatingMemoryUsage(root)
+        print(f"synthetic tree: {FOLDERS * SUBFOLDERS} folders, {FOLDERS * SUBFOLDERS * FILES_PER_FOLDER} files")
+        print(f"full scan: {measure(full):.3f} s")
+        change_tree(root)
+        rescan = CalculatingMemoryUsage(root, previous=full.tree)
+        elapsed = measure(rescan)
+        print(f"rescan with {CHANGED_FOLDERS} changed folders: {elapsed:.3f} s "
+              f"({rescan.reused_folders} reused, {rescan.reread_folders} re-read)")
+        print(f"second full scan: {measure(CalculatingMemoryUsage(root)):.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+
+from inodes import InodeSet
+
+INODES = 1_000_000
+DEVICES = 2
+
+
+def build_tuple_set(devices: array, inodes: array) -> set:
+    keys = set()
+    for key in zip(devices, inodes):
+        if key not in keys:
+            keys.add(key)
+    return keys
+
+
+def build_inode_set(devices: array, inodes: array) -> InodeSet:
+    keys = InodeSet()
+    for device, inode in zip(devices, inodes):
+        keys.add(device, inode)
+    return keys
+
+
+def measure(build, devices: array, inodes: array) -> tuple[float, float]:
+    start = time.perf_counter()
+    build(devices, inodes)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keys = build(devices, inodes)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keys
+    return (after - before) / len(inodes), elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else INODES
+    generator = random.Random(0)
+    devices = array("Q", (generator.randrange(DEVICES) + 2049 for _ in range(count)))
+    inodes = array("Q", (generator.randrange(1 << 40) for _ in range(count)))
+    print(f"inodes: {count} on {DEVICES} devices")
+    for name, build in (("set of (device, inode) tuples", build_tuple_set), ("InodeSet", build_inode_set)):
+        size, elapsed = measure(build, devices, inodes)
+        print(f"{name}: {size:.1f} bytes/inode, {elapsed:.2f} s ({elapsed / count * 1e6:.1f} us/insert)")
+
+
+if __name__ == "__main__":
+    main()
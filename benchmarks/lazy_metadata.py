@@ -0,0 +1,38 @@
+import os
+import tempfile
+import time
+
+from disk_usage import CalculatingMemoryUsage
+
+FOLDERS = 100
+FILES = 200
+
+
+def make_tree(root: str):
+    for i in range(FOLDERS):
+        folder = os.path.join(root, f"folder{i}")
+        os.makedirs(folder)
+        for j in range(FILES):
+            open(os.path.join(folder, f"file{j}.bin"), "wb").close()
+
+
+def measure(root: str, lazy_metadata: bool) -> float:
+    task = CalculatingMemoryUsage(root, lazy_metadata=lazy_metadata)
+    start = time.perf_counter()
+    task.build_tree()
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        make_tree(root)
+        print(f"synthetic tree: {FOLDERS * FILES} files in {FOLDERS} folders")
+        measure(root, False)
+        eager = min(measure(root, False) for _ in range(3))
+        lazy = min(measure(root, True) for _ in range(3))
+        print(f"eager metadata: {eager:.3f} s")
+        print(f"lazy metadata: {lazy:.3f} s ({eager / lazy:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import datetime
+import os
+import sys
+import tracemalloc
+from unittest.mock import patch
+
+from disk_usage import File
+
+NODES = 200_000
+FILES_PER_FOLDER = 100
+
+
+class LegacyFile:
+    def __init__(self, path: str, stat_result: os.stat_result, is_dir: bool):
+        self.name = os.path.basename(path)
+        self.location = path
+        self.size = 0 if is_dir else stat_result.st_size
+        self.creation_date = datetime.datetime.fromtimestamp(stat_result.st_ctime)
+        self.change_date = datetime.datetime.fromtimestamp(stat_result.st_mtime)
+        self.extension = "" if is_dir else os.path.splitext(path)[1]
+        self.owner = "owner"
+        self.files = []
+        self.folders = []
+        self.parents = []
+        self.children = []
+        self.grouped = False
+        self.filtered = False
+
+
+def fake_stat(index: int, is_dir: bool) -> os.stat_result:
+    mode = 0o40755 if is_dir else 0o100644
+    timestamp = 1_600_000_000 + index
+    return os.stat_result((mode, index, 0, 1, 0, 0, index * 512, timestamp, timestamp, timestamp))
+
+
+def build_legacy_tree(root_path: str, count: int) -> LegacyFile:
+    root = LegacyFile(root_path, fake_stat(0, True), True)
+    folder = root
+    for index in range(1, count):
+        if index % FILES_PER_FOLDER == 0:
+            folder_path = os.path.join(root_path, f"folder{index}")
+            folder = LegacyFile(folder_path, fake_stat(index, True), True)
+            folder.parents.append(root)
+            root.folders.append(folder)
+        else:
+            folder.files.append(LegacyFile(os.path.join(folder.location, f"file{index}.txt"),
+                                           fake_stat(index, False), False))
+    return root
+
+
+def build_tree(root_path: str, count: int) -> File:
+    root = File(root_path, fake_stat(0, True), True)
+    folder = root
+    for index in range(1, count):
+        if index % FILES_PER_FOLDER == 0:
+            folder = File(os.path.join(root_path, f"folder{index}"), fake_stat(index, True), True, root)
+            root.add_folder(folder)
+        else:
+            folder.add_file(File(os.path.join(folder.location, f"file{index}.txt"),
+                                 fake_stat(index, False), False, folder))
+    return root
+
+
+def measure(build, count: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tree = build(os.path.join(os.sep, "volume", "projects", "disk_usage"), count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tree
+    return (after - before) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else NODES
+    with patch("owners.get_owner_id", lambda path, stat_result: 1000):
+        legacy = measure(build_legacy_tree, count)
+        current = measure(build_tree, count)
+    print(f"nodes: {count}")
+    print(f"before (__dict__, datetime, lists): {legacy:.1f} bytes/node")
+    print(f"after (__slots__, int timestamps):  {current:.1f} bytes/node")
+    print(f"saved: {(1 - current / legacy) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import os
+import sys
+import tempfile
+import time
+
+from disk_usage import CalculatingMemoryUsage
+
+FOLDERS = 40
+SUBFOLDERS = 25
+FILES_PER_FOLDER = 20
+
+
+def make_tree(root: str):
+    for i in range(FOLDERS):
+        for j in range(SUBFOLDERS):
+            folder = os.path.join(root, f"folder{i}", f"subfolder{j}")
+            os.makedirs(folder)
+            for k in range(FILES_PER_FOLDER):
+                with open(os.path.join(folder, f"file{k}.bin"), "wb") as file:
+                    file.write(b"\0" * k)
+
+
+def measure(root: str, workers: int) -> float:
+    task = CalculatingMemoryUsage(root, workers)
+    start = time.perf_counter()
+    tree = task.build_tree() if workers <= 1 else task.build_tree_in_parallel()
+    elapsed = time.perf_counter() - start
+    assert task.scanned_folders == task.discovered_folders and tree.size > 0
+    return elapsed
+
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as root:
+        make_tree(root)
+        print(f"synthetic tree: {FOLDERS * SUBFOLDERS} folders, {FOLDERS * SUBFOLDERS * FILES_PER_FOLDER} files")
+        baseline = None
+        workers = 1
+        while workers <= max_workers:
+            elapsed = measure(root, workers)
+            baseline = baseline or elapsed
+            print(f"{workers:>3} workers: {elapsed:.3f} s (x{baseline / elapsed:.2f})")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
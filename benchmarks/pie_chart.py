@@ -0,0 +1,40 @@
+import sys
+import time
+
+from PyQt5.QtChart import QPieSeries
+from PyQt5.QtWidgets import QApplication
+
+from chart_data import ChartData
+from disk_usage import File
+
+CHILDREN = 5_000
+SLICES = 20
+
+
+def make_children() -> list[File]:
+    folder = File.from_values(None, "folder", 0, 0, 0, "", None)
+    return [File.from_values(folder, f"file{i}", i * 7919 % CHILDREN + 1, 0, 0, "", None) for i in range(CHILDREN)]
+
+
+def fill_series(slices) -> float:
+    start = time.perf_counter()
+    series = QPieSeries()
+    for label, size in slices:
+        series.append(label, size)
+    return time.perf_counter() - start
+
+
+def main():
+    app = QApplication(sys.argv)
+    children = make_children()
+    print(f"{CHILDREN} children")
+    print(f"slice per child: {fill_series((child.name, child.size) for child in children):.3f} s")
+    start = time.perf_counter()
+    chart_data = ChartData(children, SLICES)
+    selection = time.perf_counter() - start
+    print(f"top {SLICES} and other: {selection + fill_series(chart_data.slices):.3f} s")
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
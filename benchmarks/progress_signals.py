@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import time
+
+from PyQt5.QtCore import QCoreApplication, QEventLoop
+
+from scan_thread import ScanThread
+
+FOLDERS = 100
+SUBFOLDERS = 100
+
+
+def make_tree(root: str):
+    for i in range(FOLDERS):
+        for j in range(SUBFOLDERS):
+            folder = os.path.join(root, f"folder{i}", f"subfolder{j}")
+            os.makedirs(folder)
+            open(os.path.join(folder, "file.bin"), "wb").close()
+
+
+def measure(root: str, progress_rate: float) -> tuple[float, int]:
+    task = ScanThread(root, progress_rate=progress_rate)
+    updates = []
+    loop = QEventLoop()
+    task.updated.connect(updates.append)
+    task.finished.connect(lambda tree, count: loop.quit())
+    start = time.perf_counter()
+    task.start()
+    loop.exec_()
+    QCoreApplication.processEvents()
+    elapsed = time.perf_counter() - start
+    task.wait()
+    return elapsed, len(updates)
+
+
+def main():
+    app = QCoreApplication(sys.argv)
+    with tempfile.TemporaryDirectory() as root:
+        make_tree(root)
+        print(f"synthetic tree: {FOLDERS * SUBFOLDERS + FOLDERS + 1} folders")
+        measure(root, 20)
+        per_folder, per_folder_signals = measure(root, 0)
+        throttled, throttled_signals = measure(root, 20)
+        print(f"signal per folder: {per_folder:.3f} s, {per_folder_signals} signals")
+        print(f"throttled to 20 Hz: {throttled:.3f} s, {throttled_signals} signals")
+        print(f"signal traffic cost: {(per_folder - throttled) / per_folder * 100:.1f}% of scan time")
+    del app
+
+
+if __name__ == "__main__":
+    main()
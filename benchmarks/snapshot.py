@@ -0,0 +1,48 @@
+import os
+import tempfile
+import time
+
+import snapshot
+from disk_usage import File
+
+NODES = 500_000
+FILES_PER_FOLDER = 100
+
+
+def make_tree(root_path: str) -> File:
+    tree = File.from_values(None, "root", 0, 0, 0, "", None)
+    tree._location = root_path
+    folder = tree
+    for index in range(1, NODES):
+        if index % FILES_PER_FOLDER == 0:
+            folder = File.from_values(tree, f"folder{index}", 0, index, index, "", 1000)
+            tree.add_folder(folder)
+        else:
+            folder.add_file(File.from_values(folder, f"file{index}.txt", index, index, index, ".txt", 1000))
+            folder.size += index
+            tree.size += index
+    return tree
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "scan.snapshot")
+        tree = make_tree(directory)
+        start = time.perf_counter()
+        snapshot.save(tree, path)
+        print(f"{NODES} nodes, {os.path.getsize(path) / 1024 ** 2:.1f} mb")
+        print(f"save: {time.perf_counter() - start:.3f} s")
+        start = time.perf_counter()
+        loaded = snapshot.load(path)
+        folders = loaded.folders
+        print(f"open and list the root: {time.perf_counter() - start:.3f} s ({len(folders)} folders)")
+        start = time.perf_counter()
+        stack = [loaded]
+        while stack:
+            stack.extend(stack.pop().folders)
+        count = sum(len(folder.files) for folder in folders)
+        print(f"build every node: {time.perf_counter() - start:.3f} s ({count} files)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import sys
+import time
+
+from PyQt5.QtCore import QCoreApplication, QSortFilterProxyModel, Qt
+
+from disk_usage import File
+from enums import TreeWidgetColumns
+from tree_model import FileTreeModel, LayoutProxyModel
+
+SIZES = (10_000, 100_000, 1_000_000)
+CALLBACK_LIMIT = 100_000
+
+
+def make_tree(children_count: int) -> File:
+    tree = File.from_values(None, "root", 0, 0, 0, "", None)
+    for i in range(children_count):
+        tree.add_file(File.from_values(tree, f"file{i * 7919 % children_count}.bin", i * 31 % 4096, 0, 0, ".bin", None))
+    return tree
+
+
+def measure_callback_sort(tree: File) -> float:
+    model = FileTreeModel(tree)
+    model.fetch_all(model.index(0, 0))
+    proxy = QSortFilterProxyModel()
+    proxy.setSourceModel(model)
+    proxy.rowCount(proxy.index(0, 0))
+    start = time.perf_counter()
+    proxy.sort(TreeWidgetColumns.FILE_OR_FOLDER_NAME, Qt.AscendingOrder)
+    proxy.rowCount(proxy.index(0, 0))
+    return time.perf_counter() - start
+
+
+def measure_key_sort(tree: File) -> float:
+    model = FileTreeModel(tree)
+    proxy = LayoutProxyModel()
+    proxy.setSourceModel(model)
+    root = proxy.index(0, 0)
+    proxy.fetchMore(root)
+    proxy.index(0, 0, root)
+    start = time.perf_counter()
+    proxy.sort(TreeWidgetColumns.FILE_OR_FOLDER_NAME, Qt.AscendingOrder)
+    proxy.sort(TreeWidgetColumns.SIZE, Qt.AscendingOrder)
+    proxy.sort(TreeWidgetColumns.SIZE, Qt.DescendingOrder)
+    return (time.perf_counter() - start) / 3
+
+
+def main():
+    app = QCoreApplication(sys.argv)
+    for children_count in SIZES:
+        tree = make_tree(children_count)
+        key_sort = measure_key_sort(tree)
+        if children_count <= CALLBACK_LIMIT:
+            callback = f"{measure_callback_sort(tree):.3f} s"
+        else:
+            callback = "skipped"
+        print(f"{children_count} children: per-comparison data() {callback}, precomputed keys {key_sort:.3f} s")
+    del app
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import heapq
+import operator
+from typing import Iterable
+
+get_size = operator.attrgetter("size")
+
+
+class ChartData:
+    __slots__ = ("slices", "items")
+
+    def __init__(self, nodes: Iterable, count: int):
+        total = 0
+        sized = []
+        for node in nodes:
+            if node.size > 0:
+                total += node.size
+                sized.append(node)
+        largest = heapq.nlargest(count, sized, key=get_size) if len(sized) > count else sized
+        self.slices = [(node.name, node.size) for node in largest]
+        self.items = {}
+        for node in largest:
+            self.items.setdefault(node.name, []).append(node)
+        if len(sized) > len(largest):
+            rest = total - sum(size for _, size in self.slices)
+            self.slices.append((f"other ({len(sized) - len(largest)} items)", rest))
+
+    def get_items(self, label: str) -> list:
+        return self.items.get(label, [])
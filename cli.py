@@ -0,0 +1,180 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from typing import Iterable, Iterator, TextIO
+
+from disk_usage import CalculatingMemoryUsage, File
+from progress import Progress
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_INCOMPLETE = 3
+EXIT_INTERRUPTED = 130
+
+FORMATS = ("ndjson", "csv")
+SORT_ORDERS = ("size", "name", "none")
+SIZE_MODES = ("apparent", "on-disk")
+FIELDS = ("path", "type", "size", "depth", "incomplete")
+SIZE_SUFFIXES = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+
+
+def parse_size(text: str) -> int:
+    number = text.strip().lower().removesuffix("b")
+    multiplier = SIZE_SUFFIXES.get(number[-1:])
+    if multiplier is None:
+        multiplier = 1
+    else:
+        number = number[:-1]
+    try:
+        size = int(float(number) * multiplier)
+    except (ValueError, OverflowError):
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}")
+    if size < 0:
+        raise argparse.ArgumentTypeError(f"invalid size: {text!r}")
+    return size
+
+
+def parse_depth(text: str) -> int:
+    try:
+        depth = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid depth: {text!r}")
+    if depth < 0:
+        raise argparse.ArgumentTypeError(f"invalid depth: {text!r}")
+    return depth
+
+
+def get_children(folder: File, min_size: int, sort: str, reverse: bool,
+                 folders_only: bool) -> list[tuple[File, bool]]:
+    children = [(subfolder, True) for subfolder in folder.folders if subfolder.size >= min_size]
+    if not folders_only:
+        children.extend((file, False) for file in folder.files if file.size >= min_size)
+    if sort == "size":
+        children.sort(key=lambda child: child[0].size, reverse=not reverse)
+    elif sort == "name":
+        children.sort(key=lambda child: child[0].name.lower(), reverse=reverse)
+    elif reverse:
+        children.reverse()
+    return children
+
+
+def iterate_rows(folders: Iterable[File], max_depth: int = None, min_size: int = 0, sort: str = "size",
+                 reverse: bool = False, folders_only: bool = False) -> Iterator[dict]:
+    for folder in folders:
+        depth = CalculatingMemoryUsage.get_depth(folder)
+        if max_depth is None or depth < max_depth:
+            path = folder.location
+            for child, is_folder in get_children(folder, min_size, sort, reverse, folders_only):
+                yield make_row(child, os.path.join(path, child.name), is_folder, depth + 1)
+        folder.files = None
+        folder.folders = None
+        if folder.parent is None:
+            yield make_row(folder, folder.location, True, 0)
+
+
+def make_row(node: File, path: str, is_folder: bool, depth: int) -> dict:
+    return {
+        "path": path,
+        "type": "folder" if is_folder else "file",
+        "size": node.size,
+        "depth": depth,
+        "incomplete": node.incomplete,
+    }
+
+
+def write_ndjson(rows: Iterable[dict], output: TextIO):
+    for row in rows:
+        output.write(json.dumps(row))
+        output.write("\n")
+
+
+def write_csv(rows: Iterable[dict], output: TextIO):
+    writer = csv.DictWriter(output, FIELDS, lineterminator="\n")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+
+WRITERS = {"ndjson": write_ndjson, "csv": write_csv}
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="disk_usage",
+        description="Scan a folder and stream its folders and files with their sizes as NDJSON or CSV. "
+                    "Entries of a folder are written as soon as the folder is scanned, so subfolders come "
+                    "before their parents and the scanned folder itself is the last row.",
+    )
+    parser.add_argument("path", help="folder to scan")
+    parser.add_argument("-f", "--format", choices=FORMATS, default="ndjson", help="output format")
+    parser.add_argument("-d", "--max-depth", type=parse_depth, default=None,
+                        help="do not list entries deeper than this (the scanned folder has depth 0)")
+    parser.add_argument("-m", "--min-size", type=parse_size, default=0,
+                        help="skip entries smaller than this, e.g. 512, 10k, 1.5G")
+    parser.add_argument("-s", "--sort", choices=SORT_ORDERS, default="size",
+                        help="order of entries inside each folder: largest first, by name or as scanned")
+    parser.add_argument("-r", "--reverse", action="store_true", help="reverse the sort order")
+    parser.add_argument("--folders-only", action="store_true", help="list folders only")
+    parser.add_argument("--size", choices=SIZE_MODES, default="apparent",
+                        help="report file lengths or space allocated on disk; hard links are counted once")
+    parser.add_argument("-o", "--output", help="write to this file instead of stdout")
+    parser.add_argument("--progress", action="store_true", help="report scanning progress to stderr")
+    return parser
+
+
+def print_progress(progress: Progress):
+    print(f"\r{progress.done}/{progress.total} folders, {progress.entries} entries", end="", file=sys.stderr)
+
+
+def create_task(path: str, progress: bool, on_disk: bool = False) -> CalculatingMemoryUsage:
+    return CalculatingMemoryUsage(path, resolve_owners=False, lazy_metadata=True,
+                                  on_progress=print_progress if progress else None, on_disk=on_disk)
+
+
+def scan(task: CalculatingMemoryUsage, progress: bool) -> Iterator[File]:
+    task.progress.start()
+    try:
+        yield from task.iterate_tree()
+    finally:
+        task.progress.finish()
+        if progress:
+            print(file=sys.stderr)
+
+
+def main(argv: list[str] = None, output: TextIO = None) -> int:
+    arguments = create_parser().parse_args(argv)
+    if not os.path.isdir(arguments.path):
+        print(f"disk_usage: {arguments.path}: not a directory", file=sys.stderr)
+        return EXIT_ERROR
+    task = create_task(arguments.path, arguments.progress, arguments.size == "on-disk")
+    try:
+        folders = scan(task, arguments.progress)
+        rows = iterate_rows(folders, arguments.max_depth, arguments.min_size, arguments.sort,
+                            arguments.reverse, arguments.folders_only)
+        if output is not None:
+            WRITERS[arguments.format](rows, output)
+        elif arguments.output is not None:
+            with open(arguments.output, "w", newline="", encoding="utf-8", errors="surrogateescape") as file:
+                WRITERS[arguments.format](rows, file)
+        else:
+            sys.stdout.reconfigure(errors="surrogateescape")
+            WRITERS[arguments.format](rows, sys.stdout)
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return EXIT_ERROR
+    except OSError as error:
+        print(f"disk_usage: {error}", file=sys.stderr)
+        return EXIT_ERROR
+    if task.tree.incomplete:
+        print(f"disk_usage: {arguments.path}: some folders could not be read", file=sys.stderr)
+        return EXIT_INCOMPLETE
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,42 +1,220 @@
+import collections
 import datetime
 import os
+import stat
+import sys
+import threading
 import time
+from functools import partial
+from typing import Callable, Iterator
 
-import pywintypes
-import win32security
-from PyQt5 import QtCore
+import aggregates
+import inodes
+import owners
+from inodes import SizeAccounting
+from largest import LargestIndex, iterate_files
+from progress import Progress, ProgressReporter
+
+_NO_CHILDREN = ()
+NOT_LOADED = object()
 
 
 class File:
-    def __init__(self, path: str):
+    __slots__ = ("name", "_location", "parent", "size", "other_size", "inode", "_ctime", "_mtime", "_extension",
+                 "_owner_id", "_files", "_folders", "incomplete", "aggregates")
+
+    def __init__(self, path: str, stat_result: os.stat_result = None, is_dir: bool = None, parent=None,
+                 with_owner: bool = True, sizes: SizeAccounting = None):
+        self.parent = parent
+        self._location = path if parent is None else None
+        self._files = None
+        self._folders = None
+        self.incomplete = False
+        self.aggregates = None
+        self.other_size = 0
+        self.inode = None
         try:
+            if stat_result is None:
+                stat_result = os.stat(path)
+            if is_dir is None:
+                is_dir = stat.S_ISDIR(stat_result.st_mode)
             self.name = self.get_catalog_name(path)
-            self.location = path
-            self.size = 0 if os.path.isdir(path) else os.path.getsize(path)
-            self.creation_date = datetime.datetime.fromtimestamp(os.path.getctime(path))
-            self.change_date = datetime.datetime.fromtimestamp(os.path.getmtime(path))
-            self.extension = self.get_file_extension(path)
-            self.owner = self.get_owner(path)
-            self.files = []
-            self.folders = []
-            self.parents = []
-            self.children = []
-            self.grouped = False
-            self.filtered = False
+            if is_dir:
+                self.size = 0
+            else:
+                self.size, self.other_size, self.inode = inodes.measure(stat_result, sizes, self)
+            self._ctime = int(stat_result.st_ctime)
+            self._mtime = int(stat_result.st_mtime)
+            self._extension = NOT_LOADED if stat.S_ISREG(stat_result.st_mode) else ""
+            self._owner_id = owners.get_owner_id(path, stat_result) if with_owner else None
         except FileNotFoundError:
             self.name = os.path.basename(path)
-            self.location = path
-            self.creation_date = None
-            self.change_date = None
-            self.extension = "protected system file"
-            self.owner = "???"
             self.size = 0
-            self.files = []
-            self.folders = []
-            self.parents = []
-            self.children = []
-            self.grouped = False
-            self.filtered = False
+            self.set_protected()
+
+    @classmethod
+    def from_dir_entry(cls, entry: os.DirEntry, parent=None, with_owner: bool = True, lazy: bool = False,
+                       sizes: SizeAccounting = None):
+        if lazy:
+            return cls.from_dir_entry_lazily(entry, parent, with_owner, sizes)
+        try:
+            stat_result = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            stat_result = None
+        return cls(entry.path, stat_result, entry.is_dir(follow_symlinks=False), parent, with_owner, sizes)
+
+    @classmethod
+    def from_dir_entry_lazily(cls, entry: os.DirEntry, parent=None, with_owner: bool = True,
+                              sizes: SizeAccounting = None):
+        is_dir = entry.is_dir(follow_symlinks=False)
+        extension = NOT_LOADED if not is_dir and entry.is_file(follow_symlinks=False) else ""
+        owner_id = NOT_LOADED if with_owner else None
+        file = cls.from_values(parent, entry.name, 0, NOT_LOADED, NOT_LOADED, extension, owner_id)
+        if parent is None:
+            file._location = entry.path
+        if not is_dir:
+            try:
+                file.size, file.other_size, file.inode = inodes.measure(entry.stat(follow_symlinks=False), sizes, file)
+            except FileNotFoundError:
+                file.set_protected()
+        return file
+
+    @classmethod
+    def from_values(cls, parent, name: str, size: int, ctime, mtime, extension, owner_id, other_size: int = None,
+                    inode: tuple = None):
+        file = cls.__new__(cls)
+        file.parent = parent
+        file._location = None
+        file._files = None
+        file._folders = None
+        file.incomplete = False
+        file.aggregates = None
+        file.name = name
+        file.size = size
+        file.other_size = size if other_size is None else other_size
+        file.inode = inode
+        file._ctime = ctime
+        file._mtime = mtime
+        file._extension = extension
+        file._owner_id = owner_id
+        return file
+
+    def set_protected(self):
+        self._ctime = None
+        self._mtime = None
+        self._extension = "protected system file"
+        self._owner_id = owners.UNKNOWN
+
+    def load_metadata(self):
+        try:
+            stat_result = os.stat(self.location, follow_symlinks=self.parent is None)
+        except FileNotFoundError:
+            self.set_protected()
+            return
+        self._ctime = int(stat_result.st_ctime)
+        self._mtime = int(stat_result.st_mtime)
+        if self._owner_id is NOT_LOADED:
+            self._owner_id = owners.get_owner_id(self.location, stat_result)
+
+    @property
+    def location(self) -> str:
+        names = []
+        node = self
+        while node._location is None:
+            names.append(node.name)
+            node = node.parent
+        return os.path.join(node._location, *reversed(names))
+
+    @property
+    def ctime(self):
+        if self._ctime is NOT_LOADED:
+            self.load_metadata()
+        return self._ctime
+
+    @property
+    def mtime(self):
+        if self._mtime is NOT_LOADED:
+            self.load_metadata()
+        return self._mtime
+
+    @property
+    def extension(self) -> str:
+        if self._extension is NOT_LOADED:
+            self._extension = sys.intern(os.path.splitext(self.name)[1])
+        return self._extension
+
+    @property
+    def owner_id(self):
+        if self._owner_id is NOT_LOADED:
+            self.load_metadata()
+        return self._owner_id
+
+    @property
+    def owner(self) -> str:
+        return owners.get_owner_name(self.owner_id)
+
+    @property
+    def creation_date(self):
+        ctime = self.ctime
+        return None if ctime is None else datetime.datetime.fromtimestamp(ctime)
+
+    @property
+    def change_date(self):
+        mtime = self.mtime
+        return None if mtime is None else datetime.datetime.fromtimestamp(mtime)
+
+    @property
+    def files(self):
+        return _NO_CHILDREN if self._files is None else self._files
+
+    @files.setter
+    def files(self, files):
+        self._files = files
+
+    @property
+    def folders(self):
+        return _NO_CHILDREN if self._folders is None else self._folders
+
+    @folders.setter
+    def folders(self, folders):
+        self._folders = folders
+
+    def add_file(self, file):
+        if self._files is None:
+            self._files = []
+        self._files.append(file)
+        file.parent = self
+
+    def add_folder(self, folder):
+        if self._folders is None:
+            self._folders = []
+        self._folders.append(folder)
+        folder.parent = self
+
+    def add_size(self, delta: int):
+        file = self
+        while file is not None:
+            file.size += delta
+            file = file.parent
+
+    def find_folder(self, path: str):
+        relative_path = os.path.relpath(path, self.location)
+        if relative_path == os.curdir:
+            return self
+        if relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep):
+            return None
+        folder = self
+        for name in relative_path.split(os.sep):
+            folder = next((subfolder for subfolder in folder.folders if subfolder.name == name), None)
+            if folder is None:
+                return None
+        return folder
+
+    def mark_incomplete(self):
+        file = self
+        while file is not None and not file.incomplete:
+            file.incomplete = True
+            file = file.parent
 
     def is_file(self):
         return os.path.isfile(self.location)
@@ -52,112 +230,440 @@ class File:
             return path.split(":")[0]
         return name
 
-    @staticmethod
-    def get_owner(path):
-        try:
-            sid = win32security.GetFileSecurity(
-                path, win32security.OWNER_SECURITY_INFORMATION
-            ).GetSecurityDescriptorOwner()
-            owner = win32security.LookupAccountSid(None, sid)[0]
-            return owner
-        except pywintypes.error:
-            return "??? (access denied)"
-
-
-class CalculatingFilesCount(QtCore.QThread):
-    finished = QtCore.pyqtSignal(int)
-    updated = QtCore.pyqtSignal(int)
-    result = 0
-
-    def __init__(self, disk):
-        super(CalculatingFilesCount, self).__init__()
-        self.disk = disk
 
-    def run(self):
-        count = self.get_files_count(self.disk)
-        self.result = count
-        self.finished.emit(count)
-
-    def get_files_count(self, directory):
-        c = 0
-        for root, dirs, files in os.walk(directory):
-            c += len(dirs) + len(files)
-            self.updated.emit(c)
-        return c
+def switch_sizes(tree: File, now: float = None):
+    stack = [(tree, iter(tree.folders))]
+    while stack:
+        folder, subfolders = stack[-1]
+        subfolder = next(subfolders, None)
+        if subfolder is not None:
+            stack.append((subfolder, iter(subfolder.folders)))
+            continue
+        stack.pop()
+        size = 0
+        for file in folder.files:
+            file.size, file.other_size = file.other_size, file.size
+            size += file.size
+        folder.size = size + sum(subfolder.size for subfolder in folder.folders)
+        if folder.aggregates is not None:
+            aggregates.collect(folder, time.time() if now is None else now)
 
 
-class CalculatingMemoryUsage(QtCore.QThread):
-    updated = QtCore.pyqtSignal(int, int)
-    finished = QtCore.pyqtSignal(File, int)
+class CalculatingMemoryUsage:
     running = False
 
-    def __init__(self, disk, required_count):
-        super(CalculatingMemoryUsage, self).__init__()
+    def __init__(self, disk, workers: int = 1, processes: int = 0, progress_rate: float = 20.0,
+                 resolve_owners: bool = True, lazy_metadata: bool = False, aggregate: bool = False,
+                 largest_count: int = 0, snapshot_path: str = None, previous: File = None,
+                 on_progress: Callable[[Progress], None] = None, on_disk: bool = False,
+                 sizes: SizeAccounting = None, deferred: bool = False):
         self.disk = disk
-        self.percent = 0
+        self.workers = workers
+        self.processes = processes
+        self.resolve_owners = resolve_owners
+        self.lazy_metadata = lazy_metadata and not aggregate
+        self.aggregate = aggregate
+        self.largest = LargestIndex(largest_count) if largest_count else None
+        self.snapshot_path = snapshot_path
+        self.snapshot_error = None
+        self.previous = previous
+        self.on_disk = on_disk
+        self.sizes = sizes
+        self.staged = [] if deferred else None
+        self.reused_folders = 0
+        self.reread_folders = 0
+        self.started_at = time.time()
         self.running = True
         self.tree = None
         self.count = 0
-        self.required_count = required_count
+        self.scanned_bytes = 0
+        self.scanned_folders = 0
+        self.discovered_folders = 1
+        self.on_progress = on_progress
+        self.progress = ProgressReporter(self.report_progress, progress_rate)
+        self.lock = threading.RLock()
+        self.scanning_done = threading.Event()
+        self.work_queued = threading.Condition(self.lock)
+        self.pending_folders = 0
+        self.unfinished_subfolders = {}
+        self.cancel_event = None
 
     def run(self):
-        tree = self.build_tree()
-        self.finished.emit(tree, self.required_count)
+        self.started_at = time.time()
+        self.progress.start()
+        if self.previous is not None:
+            tree = self.rescan_tree(self.previous)
+        elif self.processes:
+            tree = self.build_tree_in_processes()
+        elif self.workers > 1:
+            tree = self.build_tree_in_parallel()
+        else:
+            tree = self.build_tree()
+        self.progress.finish()
+        return tree
+
+    def report_progress(self, progress: Progress):
+        if self.on_progress is not None:
+            self.on_progress(progress)
+
+    def save_snapshot(self, tree: File):
+        if self.snapshot_path is None or not self.running:
+            return
+        import snapshot
+
+        try:
+            snapshot.save(tree, self.snapshot_path, self.on_disk, self.started_at)
+        except OSError as error:
+            self.snapshot_error = error
+
+    def prepare_sizes(self, tree: File = None):
+        if self.sizes is None:
+            self.sizes = SizeAccounting(self.on_disk) if tree is None else SizeAccounting.from_tree(tree, self.on_disk)
+
+    def rescan_tree(self, previous: File) -> File:
+        self.prepare_sizes(previous)
+        self.tree = previous
+        self.rescan_folders([(previous, False)])
+        self.defer(self.index_tree, previous)
+        return previous
+
+    def rescan_folders(self, stack: list[tuple[File, bool]]):
+        while stack and self.running:
+            folder, is_new = stack.pop()
+            path = folder.location
+            unchanged = self.check_folder(folder, path)
+            if unchanged and not is_new and not folder.incomplete:
+                self.reused_folders += 1
+                self.count += len(folder.folders) + len(folder.files)
+                stack.extend((subfolder, False) for subfolder in folder.folders)
+            else:
+                self.reread_folders += 1
+                stack.extend(self.refill_folder(folder, path))
+            self.scanned_folders += 1
+            self.discovered_folders += len(folder.folders)
+            self.progress.update(self.scanned_folders, self.discovered_folders, self.count, self.scanned_bytes)
+        for folder, _ in stack:
+            folder.mark_incomplete()
+
+    def update_folders(self, tree: File, paths) -> File:
+        self.prepare_sizes(tree)
+        self.tree = tree
+        for path in sorted(paths):
+            folder = tree.find_folder(path)
+            if folder is None:
+                continue
+            self.check_folder(folder, path)
+            self.reread_folders += 1
+            new_folders = [subfolder for subfolder, is_new in self.refill_folder(folder, path) if is_new]
+            self.rescan_folders([(subfolder, True) for subfolder in new_folders])
+            for subfolder in new_folders:
+                self.defer(self.index_tree, subfolder)
+            if self.aggregate:
+                self.defer(self.collect_parents, folder)
+        return tree
+
+    def collect_parents(self, folder: File):
+        while folder is not None:
+            aggregates.collect(folder, self.started_at)
+            folder = folder.parent
+
+    def defer(self, function: Callable, *args):
+        if self.staged is None:
+            function(*args)
+        else:
+            self.staged.append(partial(function, *args))
+
+    def apply_staged(self):
+        staged, self.staged = self.staged, None
+        for change in staged or ():
+            change()
+
+    @staticmethod
+    def check_folder(folder: File, path: str) -> bool:
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return False
+        ctime, mtime = int(stat_result.st_ctime), int(stat_result.st_mtime)
+        unchanged = folder._ctime == ctime and folder._mtime == mtime
+        folder._ctime = ctime
+        folder._mtime = mtime
+        return unchanged
+
+    def refill_folder(self, folder: File, path: str) -> list[tuple[File, bool]]:
+        previous_folders = {subfolder.name: subfolder for subfolder in folder.folders}
+        delta = -sum(file.size for file in folder.files)
+        self.sizes.forget(folder.files)
+        files = []
+        folders = []
+        subfolders = []
+        folder.incomplete = False
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if not self.running:
+                        folder.mark_incomplete()
+                        break
+                    if entry.is_dir(follow_symlinks=False):
+                        subfolder = previous_folders.pop(entry.name, None)
+                        is_new = subfolder is None
+                        if is_new:
+                            subfolder = File.from_dir_entry(entry, folder, self.resolve_owners, self.lazy_metadata,
+                                                            self.sizes)
+                        folders.append(subfolder)
+                        subfolders.append((subfolder, is_new))
+                    else:
+                        file = File.from_dir_entry(entry, folder, self.resolve_owners, self.lazy_metadata,
+                                                   self.sizes)
+                        files.append(file)
+                        delta += file.size
+        except OSError:
+            folder.mark_incomplete()
+        delta -= sum(subfolder.size for subfolder in previous_folders.values())
+        self.sizes.forget([file for subfolder in previous_folders.values() for file in iterate_files(subfolder)])
+        self.defer(self.attach_children, folder, files, folders, delta)
+        self.count += len(files) + len(folders)
+        self.scanned_bytes += sum(file.size for file in files)
+        return subfolders
+
+    @staticmethod
+    def attach_children(folder: File, files: list[File], folders: list[File], delta: int):
+        folder.files = files or None
+        folder.folders = folders or None
+        folder.add_size(delta)
+
+    def index_tree(self, tree: File):
+        if not self.aggregate and self.largest is None:
+            return
+        stack = [(tree, iter(tree.folders))]
+        while stack:
+            folder, subfolders = stack[-1]
+            subfolder = next(subfolders, None)
+            if subfolder is None:
+                stack.pop()
+                self.index_folder(folder)
+                continue
+            stack.append((subfolder, iter(subfolder.folders)))
 
     def fill_disk_usage(self, path: str, current: File):
         try:
-            for file in os.scandir(path):
-                if os.path.isdir(file.path):
-                    folder_instance = File(file.path)
-                    current.folders.append(folder_instance)
-                    folder_instance.parents.append(current)
-                else:
-                    file_instance = File(file.path)
-                    current.files.append(file_instance)
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if not self.running:
+                        current.mark_incomplete()
+                        break
+                    if entry.is_dir(follow_symlinks=False):
+                        current.add_folder(File.from_dir_entry(entry, current, self.resolve_owners, self.lazy_metadata,
+                                                               self.sizes))
+                    else:
+                        file = File.from_dir_entry(entry, current, self.resolve_owners, self.lazy_metadata, self.sizes)
+                        current.add_file(file)
+                        current.size += file.size
+        except OSError:
+            current.mark_incomplete()
 
-        except PermissionError:
-            pass
-        self.count += len(current.folders) + len(current.files)
-        self.updated.emit(self.count, self.required_count)
-        for folder in current.folders:
-            self.fill_disk_usage(os.path.join(path, folder.name), folder)
+    def on_folder_scanned(self, folder: File):
+        self.count += len(folder.folders) + len(folder.files)
+        self.discovered_folders += len(folder.folders)
+        self.scanned_folders += 1
+        self.scanned_bytes += folder.size
+        self.progress.update(self.scanned_folders, self.discovered_folders, self.count, self.scanned_bytes)
 
     def build_tree(self):
-        start_time = time.time()
-        self.tree = File(self.disk)
+        for _ in self.iterate_tree():
+            pass
+        return self.tree
+
+    def iterate_tree(self) -> Iterator[File]:
+        self.prepare_sizes()
+        self.tree = File(self.disk, with_owner=self.resolve_owners)
         self.fill_disk_usage(self.disk, self.tree)
+        self.on_folder_scanned(self.tree)
+        stack = [(self.tree, self.disk, iter(self.tree.folders))]
+        try:
+            while stack:
+                folder, path, subfolders = stack[-1]
+                subfolder = next(subfolders, None)
+                if subfolder is None:
+                    stack.pop()
+                    self.roll_up(folder)
+                    yield folder
+                    continue
+                subfolder_path = os.path.join(path, subfolder.name)
+                self.fill_disk_usage(subfolder_path, subfolder)
+                self.on_folder_scanned(subfolder)
+                stack.append((subfolder, subfolder_path, iter(subfolder.folders)))
+                if not self.running:
+                    break
+        except GeneratorExit:
+            self.running = False
+            for _ in self.unwind(stack):
+                pass
+            raise
+        yield from self.unwind(stack)
+
+    def unwind(self, stack: list) -> Iterator[File]:
+        while stack:
+            folder, _, subfolders = stack.pop()
+            for subfolder in subfolders:
+                subfolder.mark_incomplete()
+            folder.mark_incomplete()
+            self.roll_up(folder)
+            yield folder
+
+    def index_folder(self, folder: File):
+        if self.aggregate:
+            aggregates.collect(folder, self.started_at)
+        if self.largest is not None:
+            if folder.parent is None:
+                self.largest.root = folder
+            self.largest.add_folder(folder)
+
+    def roll_up(self, folder: File):
+        self.index_folder(folder)
+        if folder.parent is not None:
+            folder.parent.size += folder.size
+
+    def build_tree_in_parallel(self):
+        self.prepare_sizes()
+        self.tree = File(self.disk, with_owner=self.resolve_owners)
+        queues = [collections.deque() for _ in range(self.workers)]
+        queues[0].append((self.tree, self.disk))
+        self.pending_folders = 1
+        self.scanning_done.clear()
+        threads = [threading.Thread(target=self.work, args=(queue, queues), daemon=True) for queue in queues]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if not self.running:
+            self.finish_partial_tree(folder for queue in queues for folder, _ in queue)
         return self.tree
 
-    def stop(self):
-        self.running = False
+    def build_tree_in_processes(self):
+        import concurrent.futures
+        import multiprocessing
 
+        import process_scan
 
-class UpdatingFoldersSize(QtCore.QThread):
-    updated = QtCore.pyqtSignal(int, int)
-    finished = QtCore.pyqtSignal(File, int)
-    running = False
+        self.prepare_sizes()
+        self.tree = File(self.disk, with_owner=self.resolve_owners)
+        self.fill_disk_usage(self.disk, self.tree)
+        self.on_folder_scanned(self.tree)
+        context = multiprocessing.get_context("spawn")
+        self.cancel_event = context.Event()
+        if not self.running:
+            self.cancel_event.set()
+        released_queues = [context.Queue() for _ in range(self.processes)] if os.name == "nt" else None
+        executor = concurrent.futures.ProcessPoolExecutor(
+            self.processes, mp_context=context, initializer=process_scan.init_worker,
+            initargs=(self.cancel_event, released_queues, context.Value("i", 0))
+        )
+        with executor:
+            futures = {
+                executor.submit(
+                    process_scan.scan_subtree, os.path.join(self.disk, folder.name),
+                    self.resolve_owners, self.lazy_metadata, self.on_disk
+                ): folder
+                for folder in self.tree.folders
+            }
+            completed = concurrent.futures.as_completed(futures)
+            for subtrees_count, future in enumerate(completed, 1):
+                folder = futures[future]
+                if future.cancelled():
+                    folder.mark_incomplete()
+                    continue
+                try:
+                    name, size, folders_count, entries_count, complete, owner_ids, slot = future.result()
+                except (OSError, concurrent.futures.BrokenExecutor):
+                    folder.mark_incomplete()
+                    continue
+                if not self.running:
+                    for pending_future in futures:
+                        pending_future.cancel()
+                process_scan.read_subtree(name, size, folder, owner_ids, self.index_folder, self.sizes)
+                if released_queues is not None:
+                    released_queues[slot].put(name)
+                if not complete or not self.running:
+                    folder.mark_incomplete()
+                self.tree.size += folder.size
+                self.count += entries_count
+                self.scanned_bytes += folder.size
+                self.scanned_folders += folders_count
+                self.discovered_folders += folders_count - 1
+                self.progress.update(subtrees_count + 1, len(futures) + 1, self.count, self.scanned_bytes)
+        self.index_folder(self.tree)
+        return self.tree
 
-    def __init__(self, tree: File, required_count: int):
-        super(UpdatingFoldersSize, self).__init__()
-        self.tree = tree
-        self.required_count = required_count
-        self.count = 0
-        self.running = True
+    def work(self, own_queue: collections.deque, queues: list[collections.deque]):
+        while not self.scanning_done.is_set():
+            task = self.take_task(own_queue, queues)
+            if task is None:
+                with self.lock:
+                    while not self.scanning_done.is_set() and not any(queues):
+                        self.work_queued.wait()
+                continue
+            folder, path = task
+            self.fill_disk_usage(path, folder)
+            subfolders = folder.folders
+            with self.lock:
+                self.on_folder_scanned(folder)
+                self.pending_folders += len(subfolders) - 1
+                if subfolders:
+                    self.unfinished_subfolders[folder] = len(subfolders)
+                else:
+                    self.finish_folder(folder)
+                if not self.pending_folders:
+                    self.scanning_done.set()
+                    self.work_queued.notify_all()
+                own_queue.extend((subfolder, os.path.join(path, subfolder.name)) for subfolder in subfolders)
+                self.work_queued.notify(len(subfolders))
 
-    def run(self):
-        self.update_size(self.tree)
-        self.finished.emit(self.tree, self.required_count)
+    @staticmethod
+    def take_task(own_queue: collections.deque, queues: list[collections.deque]):
+        try:
+            return own_queue.pop()
+        except IndexError:
+            pass
+        for queue in queues:
+            try:
+                return queue.popleft()
+            except IndexError:
+                continue
+        return None
 
-    def update_size(self, file: File):
-        if not file.files and not file.folders:
-            return
-        self.count += len(file.folders) + len(file.files)
-        self.updated.emit(self.count, self.required_count)
-        for child_file in file.files:
-            file.size += child_file.size
-        for child_folder in file.folders:
-            self.update_size(child_folder)
-            file.size += child_folder.size
+    def finish_folder(self, folder: File):
+        while folder is not self.tree:
+            parent = folder.parent
+            self.roll_up(folder)
+            self.unfinished_subfolders[parent] -= 1
+            if self.unfinished_subfolders[parent]:
+                return
+            del self.unfinished_subfolders[parent]
+            folder = parent
+        self.index_folder(folder)
+
+    def finish_partial_tree(self, unscanned_folders):
+        for folder in unscanned_folders:
+            folder.mark_incomplete()
+        for folder in sorted(self.unfinished_subfolders, key=self.get_depth, reverse=True):
+            folder.mark_incomplete()
+            self.roll_up(folder)
+        self.unfinished_subfolders.clear()
+
+    @staticmethod
+    def get_depth(folder: File) -> int:
+        depth = 0
+        while folder.parent is not None:
+            depth += 1
+            folder = folder.parent
+        return depth
 
     def stop(self):
         self.running = False
+        self.scanning_done.set()
+        with self.lock:
+            self.work_queued.notify_all()
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+
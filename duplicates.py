@@ -0,0 +1,234 @@
+import concurrent.futures
+import hashlib
+import json
+import os
+import stat
+import threading
+from typing import Callable
+
+from largest import is_inside, iterate_files
+
+PARTIAL_SIZE = 4 * 1024
+CHUNK_SIZE = 1024 * 1024
+HASH_WORKERS = min(8, os.cpu_count() or 1)
+CACHE_VERSION = 1
+
+
+def hash_partial(path: str, size: int) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        digest.update(file.read(PARTIAL_SIZE))
+        if size > 2 * PARTIAL_SIZE:
+            file.seek(size - PARTIAL_SIZE)
+        digest.update(file.read(PARTIAL_SIZE))
+    return digest.hexdigest()
+
+
+def hash_full(path: str, is_running: Callable[[], bool] = None) -> str:
+    digest = hashlib.blake2b()
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as file:
+        while True:
+            read = file.readinto(buffer)
+            if not read:
+                break
+            if is_running is not None and not is_running():
+                return None
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+
+class HashCache:
+    def __init__(self):
+        self.entries = {}
+        self.used = set()
+        self.roots = set()
+
+    @classmethod
+    def load(cls, path: str) -> "HashCache":
+        cache = cls()
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return cache
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return cache
+        for path, size, mtime, partial, full in data.get("entries", ()):
+            cache.entries[(path, size, mtime)] = [partial, full]
+        return cache
+
+    def get(self, key: tuple) -> list:
+        self.used.add(key)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = [None, None]
+        return entry
+
+    def save(self, path: str):
+        entries = [
+            [*key, partial, full] for key, (partial, full) in self.entries.items()
+            if (partial is not None or full is not None)
+            and (key in self.used or not any(is_path_inside(key[0], root) for root in self.roots))
+        ]
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump({"version": CACHE_VERSION, "entries": entries}, file)
+        os.replace(temporary_path, path)
+
+
+def is_path_inside(path: str, folder: str) -> bool:
+    return path == folder or path.startswith(folder.rstrip(os.sep) + os.sep)
+
+
+class DuplicateGroup:
+    __slots__ = ("name", "size", "file_size", "files")
+
+    def __init__(self, files: list, file_size: int):
+        self.name = f"{files[0].name} ({len(files)} copies)"
+        self.size = file_size * (len(files) - 1)
+        self.file_size = file_size
+        self.files = files
+
+
+def get_groups_inside(groups: list[DuplicateGroup], folder) -> list[DuplicateGroup]:
+    if folder.parent is None:
+        return groups
+    result = []
+    for group in groups:
+        files = [file for file in group.files if is_inside(file, folder)]
+        if len(files) > 1:
+            result.append(DuplicateGroup(files, group.file_size))
+    return result
+
+
+def refresh_groups(groups: list[DuplicateGroup]) -> list[DuplicateGroup]:
+    attached = {}
+    names = {}
+    result = []
+    for group in groups:
+        files = []
+        for file in group.files:
+            folder = file.parent
+            if folder is None or not is_attached(folder, attached):
+                continue
+            children = names.get(id(folder))
+            if children is None:
+                children = names[id(folder)] = {child.name: child for child in folder.files}
+            current = children.get(file.name)
+            if current is not None and current.size == file.size:
+                files.append(current)
+        if len(files) > 1:
+            result.append(DuplicateGroup(files, files[0].size))
+    return sorted(result, key=lambda group: group.size, reverse=True)
+
+
+def is_attached(folder, attached: dict) -> bool:
+    chain = []
+    while id(folder) not in attached:
+        parent = folder.parent
+        if parent is None:
+            attached[id(folder)] = True
+            break
+        if not any(subfolder is folder for subfolder in parent.folders):
+            attached[id(folder)] = False
+            break
+        chain.append(folder)
+        folder = parent
+    result = attached[id(folder)]
+    for node in chain:
+        attached[id(node)] = result
+    return result
+
+
+class DuplicateFinder:
+    running = False
+
+    def __init__(self, tree, cache: HashCache = None, workers: int = HASH_WORKERS, min_size: int = 1,
+                 cache_path: str = None):
+        self.tree = tree
+        self.cache = cache
+        self.workers = workers
+        self.min_size = min_size
+        self.cache_path = cache_path
+        self.running = True
+        self.lock = threading.Lock()
+        self.candidates = 0
+        self.partial_hashes = 0
+        self.full_hashes = 0
+        self.groups = []
+
+    def run(self) -> list[DuplicateGroup]:
+        if self.cache is None:
+            self.cache = HashCache() if self.cache_path is None else HashCache.load(self.cache_path)
+        self.cache.roots.add(self.tree.location)
+        sizes = {}
+        for file in iterate_files(self.tree):
+            if file.size >= self.min_size:
+                sizes.setdefault(file.size, []).append(file)
+        candidates = [file for files in sizes.values() if len(files) > 1 for file in files]
+        self.candidates = len(candidates)
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as executor:
+            partial_groups = self.group_by(executor, candidates, self.get_partial_key)
+            groups = [(size, files) for (size, _), files in partial_groups.items() if size <= 2 * PARTIAL_SIZE]
+            colliding = [file for (size, _), files in partial_groups.items() if size > 2 * PARTIAL_SIZE
+                         for file in files]
+            full_groups = self.group_by(executor, colliding, self.get_full_key)
+        groups.extend((size, files) for (size, _), files in full_groups.items())
+        self.groups = sorted((DuplicateGroup(files, size) for size, files in groups),
+                             key=lambda group: group.size, reverse=True)
+        if self.cache_path is not None:
+            self.save_cache()
+        return self.groups
+
+    def group_by(self, executor, files: list, get_key) -> dict[tuple, list]:
+        groups = {}
+        inodes = set()
+        for file, key in zip(files, executor.map(get_key, files)):
+            if key is None or not self.running:
+                continue
+            size, inode, digest = key
+            if inode in inodes:
+                continue
+            inodes.add(inode)
+            groups.setdefault((size, digest), []).append(file)
+        return {key: files for key, files in groups.items() if len(files) > 1}
+
+    def get_partial_key(self, file):
+        return self.get_key(file, 0, hash_partial)
+
+    def get_full_key(self, file):
+        return self.get_key(file, 1, lambda path, size: hash_full(path, lambda: self.running))
+
+    def get_key(self, file, stage: int, get_hash):
+        if not self.running:
+            return None
+        path = file.location
+        try:
+            stat_result = os.stat(path, follow_symlinks=False)
+            if not stat.S_ISREG(stat_result.st_mode) or stat_result.st_size not in (file.size, file.other_size):
+                return None
+            entry = self.cache.get((path, stat_result.st_size, stat_result.st_mtime_ns))
+            if entry[stage] is None:
+                digest = get_hash(path, stat_result.st_size)
+                if digest is None:
+                    return None
+                entry[stage] = digest
+                with self.lock:
+                    if stage:
+                        self.full_hashes += 1
+                    else:
+                        self.partial_hashes += 1
+        except OSError:
+            return None
+        return stat_result.st_size, (stat_result.st_dev, stat_result.st_ino), entry[stage]
+
+    def save_cache(self):
+        try:
+            self.cache.save(self.cache_path)
+        except OSError:
+            pass
+
+    def stop(self):
+        self.running = False
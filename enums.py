@@ -47,6 +47,18 @@ class Filters(StrEnum):
     FOLDERS = "folders"
 
 
+class ChartContent(StrEnum):
+    CHILDREN = "children"
+    LARGEST_FILES = "largest files"
+    LARGEST_FOLDERS = "largest folders"
+    DUPLICATES = "duplicates"
+
+
+class SizeMode(StrEnum):
+    APPARENT = "apparent"
+    ON_DISK = "on disk"
+
+
 class TreeWidgetColumns(IntEnum):
     FILE_OR_FOLDER_NAME = 0
     SIZE = 1
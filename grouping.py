@@ -0,0 +1,81 @@
+import bisect
+import collections
+from typing import Any, Callable, Hashable, Iterable
+
+OTHER = "other"
+
+
+def group_by_ranges(items: Iterable, ranges: list[tuple[str, Any, Any]], get_key: Callable,
+                    is_other: Callable) -> list[tuple[str, list]]:
+    ordered = sorted(range(len(ranges)), key=lambda index: ranges[index][1])
+    lows = [ranges[index][1] for index in ordered]
+    highs = [ranges[index][2] for index in ordered]
+    buckets = [[] for _ in ordered]
+    other = []
+    for item in items:
+        key = get_key(item)
+        if key is not None:
+            position = bisect.bisect_right(lows, key) - 1
+            if position >= 0 and key <= highs[position]:
+                buckets[position].append(item)
+                continue
+        if is_other(item):
+            other.append(item)
+    groups = [None] * len(ranges)
+    for position, index in enumerate(ordered):
+        groups[index] = (ranges[index][0], buckets[position])
+    return collect_groups(groups, other)
+
+
+def group_by_values(items: Iterable, get_key: Callable, is_other: Callable) -> list[tuple[str, list]]:
+    buckets = {}
+    other = []
+    for item in items:
+        key = get_key(item)
+        if key:
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = bucket = []
+            bucket.append(item)
+        elif is_other(item):
+            other.append(item)
+    return collect_groups(sorted(buckets.items()), other)
+
+
+def collect_groups(groups: Iterable[tuple[str, list]], other: list) -> list[tuple[str, list]]:
+    result = [(name, bucket) for name, bucket in groups if bucket]
+    if other:
+        result.append((OTHER, other))
+    return result
+
+
+class LayoutCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.layouts = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable):
+        layout = self.layouts.get(key)
+        if layout is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.layouts.move_to_end(key)
+        return layout
+
+    def put(self, key: Hashable, layout: list):
+        self.layouts[key] = layout
+        self.layouts.move_to_end(key)
+        while len(self.layouts) > self.maxsize:
+            self.layouts.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        return self.layouts.pop(key, None)
+
+    def clear(self):
+        self.layouts.clear()
+
+    def __len__(self) -> int:
+        return len(self.layouts)
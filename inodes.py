@@ -0,0 +1,163 @@
+import bisect
+import os
+import threading
+from array import array
+
+BLOCK_SIZE = 512
+MERGE_SIZE = 64 * 1024
+MAX_RUN = 1024 * 1024
+MAX_INODE = 2 ** 64 - 1
+
+
+def get_allocated_size(stat_result: os.stat_result) -> int:
+    blocks = getattr(stat_result, "st_blocks", None)
+    return stat_result.st_size if blocks is None else blocks * BLOCK_SIZE
+
+
+def measure(stat_result: os.stat_result, sizes: "SizeAccounting" = None, file=None) -> tuple[int, int, tuple]:
+    if sizes is None:
+        return stat_result.st_size, get_allocated_size(stat_result), None
+    return sizes.measure(stat_result, file)
+
+
+class InodeSet:
+    def __init__(self, merge_size: int = MERGE_SIZE, max_run: int = MAX_RUN):
+        self.merge_size = merge_size
+        self.max_run = max_run
+        self.devices = {}
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add(self, device: int, inode: int) -> bool:
+        with self.lock:
+            inodes = self.devices.get(device)
+            if inodes is None:
+                inodes = self.devices[device] = ([], set())
+            runs, pending = inodes
+            if inode in pending:
+                return False
+            if runs and inode <= MAX_INODE:
+                for run in runs:
+                    index = bisect.bisect_left(run, inode)
+                    if index < len(run) and run[index] == inode:
+                        return False
+            pending.add(inode)
+            self.count += 1
+            if len(pending) >= self.merge_size:
+                self.merge(runs, pending)
+            return True
+
+    def discard(self, device: int, inode: int):
+        with self.lock:
+            inodes = self.devices.get(device)
+            if inodes is None:
+                return
+            runs, pending = inodes
+            if inode in pending:
+                pending.remove(inode)
+                self.count -= 1
+                return
+            found = self.find(runs, inode)
+            if found is not None:
+                run, index = found
+                del run[index]
+                self.count -= 1
+
+    def merge(self, runs: list, pending: set):
+        large = {inode for inode in pending if inode > MAX_INODE}
+        run = array("Q", sorted(pending - large))
+        pending.clear()
+        pending.update(large)
+        while runs and len(runs[-1]) <= len(run) and len(runs[-1]) + len(run) <= self.max_run:
+            run = array("Q", sorted(runs.pop() + run))
+        runs.append(run)
+
+    @staticmethod
+    def find(runs: list, inode: int):
+        if inode > MAX_INODE:
+            return None
+        for run in runs:
+            index = bisect.bisect_left(run, inode)
+            if index < len(run) and run[index] == inode:
+                return run, index
+        return None
+
+    def __contains__(self, key: tuple) -> bool:
+        device, inode = key
+        inodes = self.devices.get(device)
+        return inodes is not None and (inode in inodes[1] or self.find(inodes[0], inode) is not None)
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class SizeAccounting:
+    def __init__(self, on_disk: bool = False):
+        self.on_disk = on_disk
+        self.inodes = InodeSet()
+        self.links = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_tree(cls, tree, on_disk: bool = False) -> "SizeAccounting":
+        from largest import iterate_files
+
+        sizes = cls(on_disk)
+        empty = []
+        for file in iterate_files(tree):
+            if file.inode is None:
+                continue
+            if file.size or file.other_size:
+                sizes.inodes.add(*file.inode)
+            else:
+                empty.append(file)
+        for file in empty:
+            sizes.count(file.inode, file)
+        return sizes
+
+    def measure(self, stat_result: os.stat_result, file=None) -> tuple[int, int, tuple]:
+        apparent = stat_result.st_size
+        allocated = get_allocated_size(stat_result)
+        size, other_size = (allocated, apparent) if self.on_disk else (apparent, allocated)
+        if stat_result.st_nlink <= 1:
+            return size, other_size, None
+        inode = (stat_result.st_dev, stat_result.st_ino)
+        if not self.count(inode, file):
+            return 0, 0, inode
+        return size, other_size, inode
+
+    def count(self, inode: tuple, file=None) -> bool:
+        if self.inodes.add(*inode):
+            return True
+        if file is not None:
+            with self.lock:
+                self.links.setdefault(inode, []).append(file)
+        return False
+
+    def forget(self, files):
+        counted = []
+        with self.lock:
+            for file in files:
+                if file.inode is None:
+                    continue
+                links = self.links.get(file.inode)
+                index = next((index for index, link in enumerate(links) if link is file), None) \
+                    if links is not None else None
+                if index is None:
+                    counted.append(file)
+                    continue
+                del links[index]
+                if not links:
+                    del self.links[file.inode]
+        for file in counted:
+            self.inodes.discard(*file.inode)
+            with self.lock:
+                links = self.links.get(file.inode)
+                survivor = links.pop() if links else None
+                if links is not None and not links:
+                    del self.links[file.inode]
+            if survivor is None:
+                continue
+            self.inodes.add(*file.inode)
+            survivor.other_size = file.other_size
+            survivor.add_size(file.size)
@@ -0,0 +1,81 @@
+import heapq
+import itertools
+import operator
+
+get_size = operator.attrgetter("size")
+
+
+def iterate_folders(folder):
+    stack = [iter(folder.folders)]
+    while stack:
+        subfolder = next(stack[-1], None)
+        if subfolder is None:
+            stack.pop()
+            continue
+        yield subfolder
+        stack.append(iter(subfolder.folders))
+
+
+def iterate_files(folder):
+    yield from folder.files
+    for subfolder in iterate_folders(folder):
+        yield from subfolder.files
+
+
+def is_inside(node, folder) -> bool:
+    node = node.parent
+    while node is not None:
+        if node is folder:
+            return True
+        node = node.parent
+    return False
+
+
+class LargestIndex:
+    def __init__(self, count: int, root=None):
+        self.count = count
+        self.root = root
+        self.files = []
+        self.folders = []
+        self.counter = itertools.count()
+
+    @classmethod
+    def from_tree(cls, tree, count: int):
+        index = cls(count, tree)
+        index.add_folder(tree)
+        for folder in iterate_folders(tree):
+            index.add_folder(folder)
+        return index
+
+    def add_folder(self, folder):
+        if folder.parent is not None:
+            self.push(self.folders, folder)
+        for file in folder.files:
+            self.push(self.files, file)
+
+    def push(self, heap: list, node):
+        if len(heap) < self.count:
+            heapq.heappush(heap, (node.size, next(self.counter), node))
+        elif heap and node.size > heap[0][0]:
+            heapq.heapreplace(heap, (node.size, next(self.counter), node))
+
+    def get_files(self, folder=None, count: int = None) -> list:
+        return self.get_largest(self.files, iterate_files, folder, count)
+
+    def get_folders(self, folder=None, count: int = None) -> list:
+        return self.get_largest(self.folders, iterate_folders, folder, count)
+
+    def get_largest(self, heap: list, iterate, folder, count: int) -> list:
+        count = self.count if count is None else count
+        folder = self.root if folder is None else folder
+        if count <= self.count:
+            if folder is self.root:
+                return self.sort(heap)[:count]
+            nodes = self.sort(entry for entry in heap if is_inside(entry[2], folder))
+            if len(nodes) >= count or len(heap) < self.count:
+                return nodes[:count]
+        return heapq.nlargest(count, iterate(folder), key=get_size)
+
+    @staticmethod
+    def sort(entries) -> list:
+        return [node for _, _, node in sorted(entries, key=lambda entry: entry[0], reverse=True)]
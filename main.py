@@ -1,68 +1,47 @@
+import hashlib
 import math
 import os.path
 import sys
-import time
 from datetime import datetime, timedelta
 from functools import partial
 from pathlib import Path
 
-import win32api
-from PyQt5 import QtCore
 from PyQt5.QtChart import QChart, QPieSeries, QPieSlice
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QColor, QFont, QIcon, QMovie, QPainter
-from PyQt5.QtWidgets import (QApplication, QPushButton, QSizePolicy,
-                             QStackedWidget, QTreeWidgetItem)
+from PyQt5.QtCore import QItemSelectionModel, Qt, QTimer
+from PyQt5.QtGui import QFont, QIcon, QMovie, QPainter
+from PyQt5.QtWidgets import QApplication, QPushButton, QSizePolicy, QStackedWidget
 from PyQt5.uic import loadUi
 
 import disk_usage
 import down_arrow  # noqa: F401
-from enums import Filters, Grouping, Styles, TreeWidgetColumns
-
-
-class QFileItem(QTreeWidgetItem):
-    def __init__(self, file: disk_usage.File):
-        info = [
-            file.name,
-            self.convert_bytes(file.size),
-            (
-                file.creation_date.strftime("%H:%M:%S %d.%m.%y")
-                if file.extension != "protected system file"
-                else "??:??:?? ??.??.????"
-            ),
-            (
-                file.change_date.strftime("%H:%M:%S %d.%m.%y")
-                if file.extension != "protected system file"
-                else "??:??:?? ??.??.????"
-            ),
-            str(file.extension),
-            file.owner,
-        ]
-        super().__init__(info)
-        self.file = file
-
-    def __lt__(self, other) -> bool:
-        column = self.treeWidget().sortColumn()
-        match column:
-            case TreeWidgetColumns.FILE_OR_FOLDER_NAME:
-                return self.file.name < other.file.name
-            case TreeWidgetColumns.SIZE:
-                return self.file.size < other.file.size
-            case TreeWidgetColumns.CREATION_DATE:
-                return self.file.creation_date < other.file.creation_date
-            case TreeWidgetColumns.CHANGE_DATE:
-                return self.file.change_date < other.file.change_date
-
-    @staticmethod
-    def convert_bytes(size) -> str:
-        if size < 1024:
-            return f"{size} b"
-        elif 1024 <= size < 1024 ** 2:
-            return f"{round(size / 1024, 1)} kb"
-        elif 1024 ** 2 <= size < 1024 ** 3:
-            return f"{round(size / 1024 ** 2, 1)} mb"
-        else:
-            return f"{round(size / 1024 ** 3, 1)} gb"
+import duplicates
+import grouping
+import snapshot
+from chart_data import ChartData
+from enums import ChartContent, Filters, Grouping, SizeMode, Styles, TreeWidgetColumns
+from largest import LargestIndex
+from progress import Progress
+from scan_thread import DuplicatesThread, ScanThread, UpdateThread
+from tree_model import (FILE_ROLE, FileTreeModel, Group, LayoutProxyModel,
+                        convert_bytes)
+from watcher import Watcher
+
+SCAN_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+SCAN_PROCESSES = 0
+RESOLVE_OWNERS = True
+LAZY_METADATA = True
+AGGREGATE_SUBTREES = False
+LAYOUT_CACHE_SIZE = 32
+LARGEST_COUNT = 100
+LARGEST_CHART_COUNT = 20
+CHART_SLICES = 20
+CHART_CACHE_SIZE = 64
+SNAPSHOT_DIR = Path.home() / ".disk_usage"
+RESCAN_INCREMENTALLY = False
+WINDOW_TITLE = "Disk Usage"
+WATCH_CHANGES = False
+WATCH_INTERVAL = 500
+HASH_CACHE_NAME = "hashes.json"
 
 
 class MainWindow(QStackedWidget):
@@ -73,14 +52,34 @@ class MainWindow(QStackedWidget):
 
         self.current_processing_phrase = ""
 
+        self.files_model = FileTreeModel()
+        self.layout_model = LayoutProxyModel()
+        self.layout_model.setSourceModel(self.files_model)
+        self.filesTreeView.setModel(self.layout_model)
+
         self.connect_functions()
         self.resize_tree_sections()
 
         self.processed_disk = ""
+        self.processing_files_task = None
 
         self.current_selected_folder = None
         self.current_selected_group = None
-        self.filtered_items = []
+        self.chart_content = ChartContent.CHILDREN
+        self.chart_data = None
+        self.chart_cache = grouping.LayoutCache(CHART_CACHE_SIZE)
+        self.largest_index = None
+        self.duplicate_groups = None
+        self.duplicates_task = None
+        self.hash_cache = None
+        self.size_mode = SizeMode.APPARENT
+        self.size_accounting = None
+        self.watcher = None
+        self.update_task = None
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setInterval(WATCH_INTERVAL)
+        self.watch_timer.timeout.connect(self.apply_changes)
+        self.expanded_folders = set()
 
         self.chart.setRenderHint(QPainter.Antialiasing)
 
@@ -88,22 +87,32 @@ class MainWindow(QStackedWidget):
         self.group_settings = Grouping.NO_GROUPING
         self.sorting_order = Qt.SortOrder.DescendingOrder
         self.sorting_by = TreeWidgetColumns.FILE_OR_FOLDER_NAME
+        self.layout_cache = grouping.LayoutCache(LAYOUT_CACHE_SIZE)
+        self.current_layout_key = None
+        self.sort_items()
 
+        self.incrementalCheckBox.setChecked(RESCAN_INCREMENTALLY)
         self.add_disk_buttons()
 
     def connect_functions(self):
         self.groupingComboBox.currentTextChanged.connect(self.set_groups)
         self.filterComboBox.currentTextChanged.connect(self.on_filter_settings_changed)
         self.sortingComboBox.currentTextChanged.connect(self.change_sort_settings)
+        self.chartContentComboBox.currentTextChanged.connect(self.set_chart_content)
+        self.sizeModeComboBox.currentTextChanged.connect(self.set_size_mode)
         self.startButton.clicked.connect(self.on_start_button_pressed)
-        self.filesTreeWidget.itemClicked.connect(self.on_selection_new_item)
+        self.openSnapshotButton.clicked.connect(self.on_open_snapshot_button_pressed)
+        self.cancelButton.clicked.connect(self.on_cancel_button_pressed)
+        self.filesTreeView.clicked.connect(self.on_selection_new_item)
+        self.filesTreeView.expanded.connect(self.on_expanded)
+        self.filesTreeView.collapsed.connect(self.on_collapsed)
         self.customPathEdit.textChanged.connect(self.on_text_changed)
         self.descendingRadioButton.toggled.connect(self.on_order_radiobutton_toggled)
 
     def resize_tree_sections(self):
-        self.filesTreeWidget.header().resizeSection(0, 300)
-        self.filesTreeWidget.header().resizeSection(1, 50)
-        self.filesTreeWidget.header().resizeSection(4, 100)
+        self.filesTreeView.header().resizeSection(0, 300)
+        self.filesTreeView.header().resizeSection(1, 50)
+        self.filesTreeView.header().resizeSection(4, 100)
 
     def add_disk_buttons(self):
         for disk in self.get_disks():
@@ -127,13 +136,13 @@ class MainWindow(QStackedWidget):
                 self.sorting_by = TreeWidgetColumns.CHANGE_DATE
         self.sort_items()
 
-    def sort_items(self, item=None):
-        sorting_item = item if item else self.current_selected_folder
-        if sorting_item.file.grouped:
-            for child in self.get_children(sorting_item):
-                child.sortChildren(self.sorting_by, self.sorting_order)
-        else:
-            sorting_item.sortChildren(self.sorting_by, self.sorting_order)
+    def sort_items(self):
+        self.layout_model.sort(self.sorting_by, self.sorting_order)
+        if self.current_layout_key is not None:
+            layout = self.layout_cache.pop(self.current_layout_key)
+            self.current_layout_key = self.get_layout_key()
+            if layout is not None:
+                self.layout_cache.put(self.current_layout_key, layout)
 
     def on_order_radiobutton_toggled(self):
         if self.descendingRadioButton.isChecked():
@@ -144,48 +153,51 @@ class MainWindow(QStackedWidget):
 
     def on_filter_settings_changed(self, filter_settings):
         self.filter_settings = "" if filter_settings == Filters.FOLDERS else filter_settings
-        self.filter_file_items()
-
-    def filter_file_items(self):
-        if self.current_selected_folder.file.grouped:
-            self.ungroup()
-        if self.filter_settings == Filters.NO_FILTER:
-            if self.current_selected_folder.file.filtered:
-                self.undo_filter()
-            self.set_groups(self.group_settings)
-            return
-        if self.current_selected_folder.file.filtered:
-            self.undo_filter()
-        children = self.remove_children_and_temporarily_save_them(self.current_selected_folder)
-        for child in children:
-            if child.file.extension == self.filter_settings:
-                self.current_selected_folder.addChild(child)
-            else:
-                self.filtered_items.append(child)
-        self.set_groups(self.group_settings)
-        self.current_selected_folder.file.filtered = True
-        self.sort_items()
-
-    def undo_filter(self):
-        for filtered_item in self.filtered_items:
-            self.current_selected_folder.addChild(filtered_item)
-        self.filtered_items.clear()
-        self.current_selected_folder.file.filtered = False
-        self.sort_items()
+        self.arrange_current_folder()
 
     def set_groups(self, group):
         self.group_settings = group
-        if self.current_selected_folder.file.grouped:
-            self.ungroup()
-        match group:
+        self.arrange_current_folder()
+
+    def get_layout_key(self) -> tuple:
+        return (self.current_selected_folder, self.group_settings, self.filter_settings,
+                self.sorting_by, self.sorting_order)
+
+    def arrange_current_folder(self):
+        folder = self.current_selected_folder
+        if folder is None:
+            return
+        key = self.get_layout_key()
+        if key == self.current_layout_key:
+            return
+        self.current_layout_key = key
+        if self.group_settings == Grouping.NO_GROUPING and self.filter_settings == Filters.NO_FILTER:
+            self.layout_model.reset_layout(folder)
+            return
+        layout = self.layout_cache.get(key)
+        if layout is not None:
+            self.layout_model.set_layout(folder, layout, sort=False)
+            return
+        children = FileTreeModel.get_children(folder)
+        if self.filter_settings != Filters.NO_FILTER:
+            children = [child for child in children if child.extension == self.filter_settings]
+        groups = self.get_groups(children)
+        layout = children if groups is None else groups
+        self.layout_model.set_layout(folder, layout)
+        self.layout_cache.put(key, layout)
+
+    def get_groups(self, children: list[disk_usage.File]):
+        match self.group_settings:
             case Grouping.NAME:
-                self.group_by(
+                return self.group_by(
+                    children,
                     [("A-H", "a", "h"), ("I-P", "i", "p"), ("Q-Z", "q", "z")],
-                    lambda file_item: file_item.file.name[0].lower(),
-                    lambda file_item: not file_item.file.name[0].isalpha(),
+                    lambda file: file.name[0].lower(),
+                    lambda file: not file.name[0].isalpha(),
                 )
             case Grouping.SIZE:
-                self.group_by(
+                return self.group_by(
+                    children,
                     [
                         ("huge (more than 10 gb)", 10737418240, math.inf),
                         ("large (1 - 10 gb)", 1073741824, 10737418239),
@@ -195,21 +207,23 @@ class MainWindow(QStackedWidget):
                         ("tiny (1-16 kb)", 1, 17403),
                         ("no size", 0, 0),
                     ],
-                    lambda file_item: file_item.file.size,
-                    lambda file_item: False,
+                    lambda file: file.size,
+                    lambda file: False,
                 )
             case Grouping.EXTENSION:
-                self.group_by_specific_data(
-                    lambda item: item.file.extension,
-                    lambda item: not item.file.extension,
+                return self.group_by_specific_data(
+                    children,
+                    lambda file: file.extension,
+                    lambda file: not file.extension,
                 )
             case Grouping.OWNER:
-                self.group_by_specific_data(
-                    lambda item: item.file.owner, lambda item: not item.file.owner
+                return self.group_by_specific_data(
+                    children, lambda file: file.owner, lambda file: not file.owner
                 )
             case Grouping.CREATION_DATE | Grouping.CHANGE_DATE:
                 today = datetime.today().date()
-                self.group_by(
+                return self.group_by(
+                    children,
                     [
                         ('today', today, today),
                         ('last week', today - timedelta(days=7), today - timedelta(days=1)),
@@ -218,60 +232,24 @@ class MainWindow(QStackedWidget):
                         ('last year', today - timedelta(days=730), today - timedelta(days=366)),
                         ('waaaay too long ago', datetime.min.date(), today - timedelta(days=731))
                     ],
-                    lambda file_item: self.get_specific_file_date(file_item, group),
-                    lambda file_item: not self.get_specific_file_date(file_item, group))
-        self.sort_items()
+                    lambda file: self.get_specific_file_date(file, self.group_settings),
+                    lambda file: not self.get_specific_file_date(file, self.group_settings))
+        return None
 
-    def group_by_specific_data(self, get_specific_data: callable, function_for_other: callable):
-        data = set()
-        for child in self.get_children(self.current_selected_folder):
-            data_piece = get_specific_data(child)
-            if data_piece:
-                data.add(data_piece)
-        self.group_by(
-            [(data_piece, data_piece, data_piece) for data_piece in data],
-            lambda file_item: get_specific_data(file_item),
-            lambda file_item: function_for_other(file_item),
-        )
+    def group_by_specific_data(self, children: list[disk_usage.File], get_specific_data: callable,
+                               function_for_other: callable) -> list[Group]:
+        groups = grouping.group_by_values(children, get_specific_data, function_for_other)
+        return [Group(name, self.current_selected_folder, files) for name, files in groups]
 
     @staticmethod
-    def get_specific_file_date(item, date_name):
-        return (
-            item.file.creation_date.date()
-            if date_name == "creation date"
-            else item.file.change_date.date()
-        )
+    def get_specific_file_date(file: disk_usage.File, date_name):
+        date = file.creation_date if date_name == "creation date" else file.change_date
+        return None if date is None else date.date()
 
-    def group_by(self, groups: list[tuple], comparison_function: callable, function_for_other: callable):
-        temp = self.remove_children_and_temporarily_save_them(self.current_selected_folder)
-        for group in groups:
-            group_item = QTreeWidgetItem([group[0], "", "", "", "", ""])
-            self.current_selected_folder.addChild(group_item)
-            group_item.setExpanded(True)
-            self.change_color_of_item(group_item, QColor(255, 239, 232))
-            files_that_match_group = [file for file in temp if group[1] <= comparison_function(file) <= group[2]]
-            if files_that_match_group:
-                group_item.addChildren(files_that_match_group)
-            else:
-                self.current_selected_folder.removeChild(group_item)
-        doesnt_match_any_group = [file for file in temp if function_for_other(file) and not file.parent()]
-        if doesnt_match_any_group:
-            other = QTreeWidgetItem(["other", "", "", "", "", ""])
-            self.current_selected_folder.addChild(other)
-            other.addChildren(doesnt_match_any_group)
-            self.change_color_of_item(other, QColor(255, 239, 232))
-            other.setExpanded(True)
-        self.current_selected_folder.file.grouped = True
-
-    def ungroup(self):
-        temp = []
-        for child in self.get_children(self.current_selected_folder, reversed_flag=True):
-            for group_child in self.get_children(child, reversed_flag=True):
-                temp.append(group_child)
-                child.removeChild(group_child)
-            self.current_selected_folder.removeChild(child)
-        self.current_selected_folder.addChildren(temp)
-        self.current_selected_folder.file.grouped = False
+    def group_by(self, children: list[disk_usage.File], groups: list[tuple], comparison_function: callable,
+                 function_for_other: callable) -> list[Group]:
+        groups = grouping.group_by_ranges(children, groups, comparison_function, function_for_other)
+        return [Group(name, self.current_selected_folder, files) for name, files in groups]
 
     def set_directory(self, disk_button):
         self.processed_disk = disk_button.text() + ":\\"
@@ -280,6 +258,7 @@ class MainWindow(QStackedWidget):
             button.setStyleSheet(Styles.BUTTON_STYLE_SHEET
                                  if button != disk_button
                                  else Styles.SELECTED_BUTTON_STYLE_SHEET)
+        self.update_snapshot_button()
 
     def on_start_button_pressed(self):
         if self.customPathEdit.text():
@@ -289,125 +268,339 @@ class MainWindow(QStackedWidget):
             QTimer.singleShot(2000, lambda: self.errorLabel.setText(""))
             return
         else:
-            self.calculate_files_count()
+            self.start_preparing_files()
 
-    def calculate_files_count(self):
+    def on_open_snapshot_button_pressed(self):
+        try:
+            tree = self.load_last_scan(self.get_selected_path())
+        except (OSError, snapshot.SnapshotError):
+            self.errorLabel.setText("The last scan can't be opened!")
+            QTimer.singleShot(2000, lambda: self.errorLabel.setText(""))
+            return
+        self.wait_for_scan()
+        self.processing_files_task = None
+        self.display_tree_on_preparing_files_finished(tree, 0)
+
+    def load_last_scan(self, path: str) -> disk_usage.File:
+        return snapshot.load(str(self.get_snapshot_path(path)), self.is_on_disk())
+
+    def get_previous_scan(self, path: str):
+        if not self.incrementalCheckBox.isChecked():
+            return None
+        try:
+            return self.load_last_scan(path)
+        except (OSError, snapshot.SnapshotError):
+            return None
+
+    def get_selected_path(self) -> str:
+        return self.customPathEdit.text() or self.processed_disk
+
+    def update_snapshot_button(self):
+        path = self.get_selected_path()
+        has_snapshot = bool(path) and self.get_snapshot_path(path).is_file()
+        self.openSnapshotButton.setEnabled(has_snapshot)
+        self.incrementalCheckBox.setEnabled(has_snapshot)
+
+    @staticmethod
+    def get_snapshot_path(path: str) -> Path:
+        key = hashlib.sha1(os.path.abspath(path).encode("utf-8", "surrogatepass")).hexdigest()
+        return SNAPSHOT_DIR / f"{key}.snapshot"
+
+    def on_cancel_button_pressed(self):
+        self.cancelButton.setEnabled(False)
+        self.current_processing_phrase = "cancelling, partial results will be shown"
+        if self.processing_files_task is not None and self.processing_files_task.isRunning():
+            self.processing_files_task.stop()
+
+    def start_preparing_files(self):
+        self.stop_watching()
+        self.wait_for_scan()
         self.setCurrentIndex(1)
-        movie = QMovie("assets/gifs/searching.gif")
+        self.cancelButton.setEnabled(True)
+        self.current_processing_phrase = "folders scanned"
+        movie = QMovie(f'assets/gifs/preparing_files.gif')
         self.label_3.setMovie(movie)
         movie.start()
         if self.customPathEdit.text():
             self.processed_disk = self.customPathEdit.text()
-        self.calculating_task = disk_usage.CalculatingFilesCount(self.processed_disk)
-        self.calculating_task.finished.connect(self.start_preparing_files_on_calculating_files_count_finished)
-        self.calculating_task.updated.connect(self.on_preparing)
-        self.progressBar.setValue(0)
-        self.calculating_task.start()
-
-    def on_preparing(self, prepared_files_count):
-        self.progressBar.setFormat(f"{prepared_files_count} files found...")
-
-    def start_preparing_files_on_calculating_files_count_finished(self, required_files_count):
-        self.current_processing_phrase = "files prepared"
-        movie = QMovie(f'assets/gifs/preparing_files.gif')
-        self.label_3.setMovie(movie)
-        movie.start()
-        self.processing_files_task = disk_usage.CalculatingMemoryUsage(self.processed_disk, required_files_count)
+        SNAPSHOT_DIR.mkdir(exist_ok=True)
+        if self.files_model.tree is not None:
+            self.forget_duplicates()
+            snapshot.close(self.files_model.tree)
+        previous = self.get_previous_scan(self.processed_disk)
+        if previous is not None:
+            self.current_processing_phrase = "folders checked"
+        self.processing_files_task = ScanThread(
+            self.processed_disk, SCAN_WORKERS, SCAN_PROCESSES,
+            resolve_owners=RESOLVE_OWNERS, lazy_metadata=LAZY_METADATA, aggregate=AGGREGATE_SUBTREES,
+            largest_count=LARGEST_COUNT, snapshot_path=str(self.get_snapshot_path(self.processed_disk)),
+            previous=previous, on_disk=self.is_on_disk()
+        )
         self.processing_files_task.updated.connect(self.on_update)
-        self.processing_files_task.finished.connect(self.update_files_size_on_preparing_files_finished)
+        self.processing_files_task.finished.connect(self.display_tree_on_preparing_files_finished)
+        self.processing_files_task.saved.connect(partial(self.on_scan_saved, self.processing_files_task))
+        self.progressBar.setValue(0)
         self.processing_files_task.start()
 
-    def update_files_size_on_preparing_files_finished(self, tree: disk_usage.File, required_files_count: int):
-        self.current_processing_phrase = "files sizes updated"
-        movie = QMovie(f'assets/gifs/updating_size.gif')
-        self.label_3.setMovie(movie)
-        movie.start()
-        self.updating_size_task = disk_usage.UpdatingFoldersSize(tree, required_files_count)
-        self.updating_size_task.updated.connect(self.on_update)
-        self.updating_size_task.finished.connect(self.build_widget_on_size_updating_finished)
-        self.updating_size_task.start()
-
-    def build_widget_on_size_updating_finished(self, tree: disk_usage.File, required_count: int):
-        self.current_processing_phrase = "files in widget built"
-        movie = QMovie(f'assets/gifs/building_widget.gif')
-        self.label_3.setMovie(movie)
-        movie.start()
-        self.building_widget_task = BuildingTreeWidget(tree, required_count)
-        self.building_widget_task.updated.connect(self.on_update)
-        self.building_widget_task.finished.connect(self.display_tree_on_widget_building_finished)
-        self.building_widget_task.start()
-
-    def display_tree_on_widget_building_finished(self, element: QFileItem):
-        self.filesTreeWidget.addTopLevelItem(element)
-        element.setExpanded(True)
-        element.setSelected(True)
-        self.current_selected_folder = element
-        self.on_selection_new_item(element)
+    def display_tree_on_preparing_files_finished(self, tree: disk_usage.File, required_count: int):
+        self.current_selected_folder = None
+        self.current_layout_key = None
+        self.layout_cache.clear()
+        self.chart_cache.clear()
+        scan = None if self.processing_files_task is None else self.processing_files_task.scan
+        if scan is not None and scan.tree is not tree:
+            scan = None
+        self.largest_index = None if scan is None else scan.largest
+        self.size_accounting = None if scan is None else scan.sizes
+        self.forget_duplicates()
+        self.show_scan_report(scan)
+        self.expanded_folders.clear()
+        self.files_model.set_tree(tree)
+        self.on_file_selected(tree)
         self.setCurrentIndex(2)
+        self.start_watching(tree)
 
-    def on_update(self, count, req_count):
-        progress = int(count / req_count * 100)
-        self.progressBar.setFormat(f"{progress}% ({count}/{req_count} {self.current_processing_phrase})")
-        self.progressBar.setValue(progress)
+    def on_scan_saved(self, task: ScanThread):
+        if task is not self.processing_files_task:
+            return
+        self.show_scan_report(task.scan)
+        self.update_snapshot_button()
+
+    def wait_for_scan(self):
+        if self.processing_files_task is not None:
+            self.processing_files_task.wait()
+
+    def start_watching(self, tree: disk_usage.File):
+        self.stop_watching()
+        if not WATCH_CHANGES:
+            return
+        self.watcher = Watcher(tree.location, excluded=(str(SNAPSHOT_DIR),))
+        self.watcher.start()
+        self.watch_timer.start()
+
+    def stop_watching(self):
+        self.watch_timer.stop()
+        if self.update_task is not None:
+            self.update_task.stop()
+            self.update_task.wait()
+            self.update_task = None
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+    def apply_changes(self):
+        if self.watcher is None or self.update_task is not None:
+            return
+        if self.processing_files_task is not None and self.processing_files_task.isRunning():
+            return
+        paths, rescan = self.watcher.take_changes()
+        if not paths and not rescan:
+            return
+        self.update_task = UpdateThread(
+            self.files_model.tree, paths, rescan, resolve_owners=RESOLVE_OWNERS, lazy_metadata=LAZY_METADATA,
+            aggregate=AGGREGATE_SUBTREES, on_disk=self.is_on_disk(), sizes=None if rescan else self.size_accounting
+        )
+        self.update_task.finished.connect(partial(self.on_changes_applied, self.update_task))
+        self.update_task.start()
+
+    def on_changes_applied(self, task: UpdateThread):
+        if task is not self.update_task:
+            return
+        self.update_task = None
+        task.update.apply_staged()
+        self.size_accounting = task.update.sizes
+        self.refresh_tree()
+
+    def wait_for_changes(self):
+        task = self.update_task
+        if task is not None:
+            task.wait()
+            self.on_changes_applied(task)
+
+    def is_on_disk(self) -> bool:
+        return self.size_mode == SizeMode.ON_DISK
+
+    def set_size_mode(self, size_mode):
+        if size_mode == self.size_mode:
+            return
+        self.wait_for_changes()
+        self.wait_for_scan()
+        self.size_mode = SizeMode(size_mode)
+        if self.size_accounting is not None:
+            self.size_accounting.on_disk = self.is_on_disk()
+        if self.files_model.tree is not None:
+            disk_usage.switch_sizes(self.files_model.tree)
+            self.refresh_tree()
+
+    def refresh_tree(self):
+        tree = self.files_model.tree
+        selected_folder = self.current_selected_folder
+        if selected_folder is None or not self.is_attached(selected_folder, tree):
+            selected_folder = tree
+        expanded_folders = sorted((folder for folder in self.expanded_folders if self.is_attached(folder, tree)),
+                                  key=disk_usage.CalculatingMemoryUsage.get_depth)
+        self.current_selected_folder = None
+        self.current_layout_key = None
+        self.layout_cache.clear()
+        self.chart_cache.clear()
+        self.largest_index = None
+        if self.duplicate_groups is not None:
+            self.show_duplicates(duplicates.refresh_groups(self.duplicate_groups))
+        self.expanded_folders.clear()
+        self.files_model.set_tree(tree)
+        for folder in expanded_folders:
+            self.filesTreeView.expand(self.get_view_index(folder))
+        self.on_file_selected(selected_folder)
+
+    @staticmethod
+    def is_attached(folder: disk_usage.File, tree: disk_usage.File) -> bool:
+        while folder.parent is not None:
+            if not any(subfolder is folder for subfolder in folder.parent.folders):
+                return False
+            folder = folder.parent
+        return folder is tree
+
+    def on_expanded(self, index):
+        node = index.data(FILE_ROLE)
+        if isinstance(node, disk_usage.File):
+            self.expanded_folders.add(node)
+
+    def on_collapsed(self, index):
+        self.expanded_folders.discard(index.data(FILE_ROLE))
+
+    def show_scan_report(self, scan):
+        notes = []
+        if scan is not None and scan.previous is not None:
+            notes.append(f"{scan.reused_folders} folders reused, {scan.reread_folders} re-read")
+        if scan is not None and scan.snapshot_error is not None:
+            notes.append(f"scan not saved: {scan.snapshot_error.strerror or scan.snapshot_error}")
+        self.setWindowTitle(f"{WINDOW_TITLE} ({'; '.join(notes)})" if notes else WINDOW_TITLE)
+
+    def on_update(self, progress: Progress):
+        text = f"{progress.percent}% ({progress.done}/{progress.total} {self.current_processing_phrase})"
+        text += f", {int(progress.entries_per_second)} files/s"
+        if progress.bytes:
+            text += f", {convert_bytes(int(progress.bytes_per_second))}/s"
+        if progress.eta is not None:
+            text += f", ETA {timedelta(seconds=round(progress.eta))}"
+        self.progressBar.setFormat(text)
+        self.progressBar.setValue(progress.percent)
 
     def on_text_changed(self):
         for button in (self.disksLayout.itemAt(i).widget() for i in range(self.disksLayout.count())):
             button.setEnabled(not self.customPathEdit.text())
             button.setStyleSheet(Styles.BUTTON_STYLE_SHEET)
+        self.update_snapshot_button()
 
-    def on_selection_new_item(self, item):
-        if type(item) is QTreeWidgetItem:
-            self.on_group_selected(item)
+    def on_selection_new_item(self, index):
+        node = index.data(FILE_ROLE)
+        if isinstance(node, Group):
+            self.on_group_selected(node)
         else:
-            self.on_file_selected(item)
+            self.on_file_selected(node)
 
-    def on_file_selected(self, item):
+    def on_file_selected(self, file: disk_usage.File):
         self.groupWidget.setEnabled(True)
         self.filterWidget.setEnabled(True)
-        if item.file.extension != "":
+        if file.extension != "":
             return
-        if self.current_selected_folder.file.grouped:
-            self.ungroup()
-        if self.current_selected_folder.file.filtered:
-            self.undo_filter()
-        self.filesTreeWidget.setCurrentItem(item)
-        item.setExpanded(True)
-        self.current_selected_folder = self.filesTreeWidget.currentItem()
+        previous_folder = self.current_selected_folder
+        self.current_selected_folder = file
+        if previous_folder is not None and previous_folder is not file:
+            self.layout_model.reset_layout(previous_folder)
+        index = self.get_view_index(file)
+        self.filesTreeView.setCurrentIndex(index)
+        self.filesTreeView.scrollTo(index)
+        self.filesTreeView.expand(index)
         self.update_chart()
         self.update_filters()
-        self.sort_items()
-        self.set_groups(self.group_settings)
+        self.arrange_current_folder()
 
-    def on_group_selected(self, item):
-        self.current_selected_group = item
+    def on_group_selected(self, group: Group):
+        self.current_selected_group = group
         self.groupWidget.setEnabled(False)
         self.filterWidget.setEnabled(False)
-        series = QPieSeries()
-        series.setPieSize(0.5)
-        for child in self.get_children(item):
-            if child.file.size > 0:
-                series.append(child.file.name, child.file.size)
-        chart = QChart()
-        chart = QChart()
-        chart.setAnimationOptions(QChart.SeriesAnimations)
-        chart.addSeries(series)
-        self.chart.setChart(chart)
-        series.hovered.connect(self.on_hovered)
-        series.clicked.connect(self.on_group_clicked)
+        self.show_chart(self.get_chart_data(group, lambda: group.files), legend=True)
+
+    def set_chart_content(self, chart_content):
+        self.chart_content = chart_content
+        if self.current_selected_folder is not None:
+            self.update_chart()
+
+    def get_largest_index(self) -> LargestIndex:
+        if self.largest_index is None:
+            self.largest_index = LargestIndex.from_tree(self.files_model.tree, LARGEST_COUNT)
+        return self.largest_index
 
     def update_chart(self):
-        file = self.current_selected_folder.file
+        file = self.current_selected_folder
         if file.extension != "":
             return
+        match self.chart_content:
+            case ChartContent.LARGEST_FILES:
+                get_nodes = partial(self.get_largest_index().get_files, file, LARGEST_CHART_COUNT)
+            case ChartContent.LARGEST_FOLDERS:
+                get_nodes = partial(self.get_largest_index().get_folders, file, LARGEST_CHART_COUNT)
+            case ChartContent.DUPLICATES:
+                if self.duplicate_groups is None:
+                    self.find_duplicates()
+                    self.show_chart(ChartData((), CHART_SLICES))
+                    return
+                get_nodes = partial(duplicates.get_groups_inside, self.duplicate_groups, file)
+            case _:
+                get_nodes = partial(FileTreeModel.get_children, file)
+        self.show_chart(self.get_chart_data((file, self.chart_content), get_nodes))
+
+    def find_duplicates(self):
+        if self.duplicates_task is not None:
+            return
+        self.duplicatesLabel.setText("searching...")
+        SNAPSHOT_DIR.mkdir(exist_ok=True)
+        self.duplicates_task = DuplicatesThread(self.files_model.tree, self.hash_cache,
+                                                cache_path=str(SNAPSHOT_DIR / HASH_CACHE_NAME))
+        self.duplicates_task.finished.connect(partial(self.on_duplicates_found, self.duplicates_task))
+        self.duplicates_task.start()
+
+    def on_duplicates_found(self, task: DuplicatesThread, groups: list):
+        if task is not self.duplicates_task:
+            return
+        self.duplicates_task = None
+        self.hash_cache = task.finder.cache
+        self.show_duplicates(duplicates.refresh_groups(groups))
+        if self.chart_content == ChartContent.DUPLICATES and self.current_selected_folder is not None:
+            self.update_chart()
+
+    def show_duplicates(self, groups: list):
+        self.duplicate_groups = groups
+        reclaimable = sum(group.size for group in groups)
+        self.duplicatesLabel.setText(f"{len(groups)} groups, {convert_bytes(reclaimable)} reclaimable")
+
+    def forget_duplicates(self):
+        if self.duplicates_task is not None:
+            self.duplicates_task.stop()
+            self.duplicates_task.wait()
+            self.duplicates_task = None
+        self.duplicate_groups = None
+        self.duplicatesLabel.setText("")
+
+    def get_chart_data(self, key, get_nodes: callable) -> ChartData:
+        chart_data = self.chart_cache.get(key)
+        if chart_data is None:
+            chart_data = ChartData(get_nodes(), CHART_SLICES)
+            self.chart_cache.put(key, chart_data)
+        return chart_data
+
+    def show_chart(self, chart_data: ChartData, legend: bool = False):
+        self.chart_data = chart_data
         series = QPieSeries()
         series.setPieSize(0.5)
-        for child in file.files + file.folders:
-            if child.size > 0:
-                series.append(child.name, child.size)
+        for label, size in chart_data.slices:
+            series.append(label, size)
         chart = QChart()
         chart.setAnimationOptions(QChart.SeriesAnimations)
         chart.addSeries(series)
-        chart.legend().hide()
+        if not legend:
+            chart.legend().hide()
         self.chart.setChart(chart)
         series.hovered.connect(self.on_hovered)
         series.clicked.connect(self.on_clicked)
@@ -416,9 +609,9 @@ class MainWindow(QStackedWidget):
         self.filterComboBox.setCurrentIndex(0)
         for i in reversed(range(1, self.filterComboBox.count())):
             self.filterComboBox.removeItem(i)
-        selected_item = self.current_selected_folder if not item else item
-        extensions = {file.extension for file in selected_item.file.files if file.extension}
-        if selected_item.file.folders:
+        selected_folder = self.current_selected_folder if not item else item
+        extensions = {file.extension for file in selected_folder.files if file.extension}
+        if selected_folder.folders:
             extensions.add("folders")
         self.filterComboBox.addItems(extensions)
 
@@ -431,93 +624,42 @@ class MainWindow(QStackedWidget):
             slice.setLabelVisible(False)
 
     def on_clicked(self, slice: QPieSlice):
-        file_name = slice.label()
-        if self.current_selected_folder.file.grouped:
-            for group in self.get_children(self.current_selected_folder):
-                for child in self.get_children(group):
-                    if child.file.name == file_name:
-                        child.setSelected(True)
-                    else:
-                        child.setSelected(False)
-        else:
-            for child in self.get_children(self.current_selected_folder):
-                if file_name == child.file.name:
-                    child.setSelected(True)
-                else:
-                    child.setSelected(False)
-
-    def on_group_clicked(self, pie_slice: QPieSlice):
-        file_name = pie_slice.label()
-        for child in self.get_children(self.current_selected_group):
-            if file_name == child.file.name:
-                child.setSelected(True)
-            else:
-                child.setSelected(False)
-
-    @staticmethod
-    def remove_children_and_temporarily_save_them(item):
-        temp = []
-        for child in MainWindow.get_children(item, reversed_flag=True):
-            temp.append(child)
-            item.removeChild(child)
-        return temp
+        files = []
+        for item in self.chart_data.get_items(slice.label()):
+            files.extend(item.files if isinstance(item, duplicates.DuplicateGroup) else [item])
+        self.select_files(files)
+
+    def select_files(self, files: list[disk_usage.File]):
+        selection = self.filesTreeView.selectionModel()
+        selection.clearSelection()
+        for file in files:
+            index = self.get_view_index(file)
+            if index.isValid():
+                selection.select(index, QItemSelectionModel.Select | QItemSelectionModel.Rows)
+                self.filesTreeView.scrollTo(index)
+
+    def get_view_index(self, file: disk_usage.File):
+        parent = file.parent
+        while parent is not None:
+            if not self.layout_model.is_arranged(parent):
+                self.files_model.fetch_all(self.files_model.index_of(parent))
+            parent = parent.parent
+        return self.layout_model.find_index(file)
 
     @staticmethod
     def get_disks():
+        import win32api
+
         drives = win32api.GetLogicalDriveStrings()
         drives = drives.split("\000")[:-1]
         drives = [drive.split(":")[0] for drive in drives]
         return drives
 
-    @staticmethod
-    def change_color_of_item(item, color: QColor):
-        for i in range(item.columnCount()):
-            item.setBackground(i, color)
-
-    @staticmethod
-    def get_children(item, reversed_flag=False):
-        if not reversed_flag:
-            for child in (item.child(i) for i in range(item.childCount())):
-                yield child
-        else:
-            for child in (item.child(i) for i in reversed(range(item.childCount()))):
-                yield child
-
-
-class BuildingTreeWidget(QtCore.QThread):
-    updated = QtCore.pyqtSignal(int, int)
-    finished = QtCore.pyqtSignal(QFileItem)
-    running = False
-
-    def __init__(self, tree: disk_usage.File, required_files_count: int):
-        super(BuildingTreeWidget, self).__init__()
-        self.tree = tree
-        self.count = 0
-        self.required_files_count = required_files_count
-
-    def run(self):
-        element = QFileItem(self.tree)
-        element.setSelected(True)
-        element.setExpanded(True)
-        self.display_tree(element, self.tree)
-        self.finished.emit(element)
-
-    def display_tree(self, el, catalog: disk_usage.File):
-        content = catalog.files + catalog.folders
-        self.count += len(catalog.files) + len(catalog.folders)
-        self.updated.emit(self.count, self.required_files_count)
-        time.sleep(0.00001)
-        for item in content:
-            tree_item = QFileItem(item)
-            el.addChild(tree_item)
-            if item.extension == "":
-                self.display_tree(tree_item, item)
-
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     main_window = MainWindow()
-    main_window.setWindowTitle("Disk Usage")
+    main_window.setWindowTitle(WINDOW_TITLE)
     main_window.setWindowIcon(QIcon("assets/icons/window_icon.png"))
     main_window.resize(1400, 850)
     main_window.show()
@@ -0,0 +1,56 @@
+import functools
+import os
+import sys
+
+ACCESS_DENIED = -1
+UNKNOWN = -2
+CACHE_SIZE = 4096
+
+if os.name == "nt":
+    def get_owner_id(path: str, stat_result: os.stat_result):
+        import pywintypes
+        import win32security
+
+        try:
+            sid = win32security.GetFileSecurity(
+                path, win32security.OWNER_SECURITY_INFORMATION
+            ).GetSecurityDescriptorOwner()
+            return sys.intern(win32security.ConvertSidToStringSid(sid))
+        except pywintypes.error:
+            return ACCESS_DENIED
+
+    def lookup_owner_name(owner_id) -> str:
+        import pywintypes
+        import win32security
+
+        try:
+            sid = win32security.ConvertStringSidToSid(owner_id)
+            return win32security.LookupAccountSid(None, sid)[0]
+        except pywintypes.error:
+            return owner_id
+else:
+    import pwd
+
+    def get_owner_id(path: str, stat_result: os.stat_result):
+        return stat_result.st_uid
+
+    def lookup_owner_name(owner_id) -> str:
+        try:
+            return pwd.getpwuid(owner_id).pw_name
+        except KeyError:
+            return str(owner_id)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def resolve_owner(owner_id) -> str:
+    return sys.intern(lookup_owner_name(owner_id))
+
+
+def get_owner_name(owner_id) -> str:
+    if owner_id is None:
+        return ""
+    if owner_id == ACCESS_DENIED:
+        return "??? (access denied)"
+    if owner_id == UNKNOWN:
+        return "???"
+    return resolve_owner(owner_id)
@@ -0,0 +1,216 @@
+import os
+import queue
+import stat
+import struct
+import sys
+from multiprocessing import shared_memory
+from typing import Callable
+
+import inodes
+import owners
+from disk_usage import NOT_LOADED, File
+from inodes import SizeAccounting
+
+BLOCK = struct.Struct("<I")
+RECORD = struct.Struct("<BHIqqqq")
+INODE = struct.Struct("<QQ")
+
+FOLDER = 1
+REGULAR_FILE = 2
+PROTECTED = 4
+LAZY = 8
+HARD_LINK = 16
+LAZY_OWNER = -3
+PARTIAL_BLOCK = 1 << 31
+CANCEL_CHECK_INTERVAL = 128
+
+_exported_blocks = {}
+_cancel_event = None
+_released_names = None
+_slot = 0
+
+
+def init_worker(cancel_event, released_queues: list = None, slots=None):
+    global _cancel_event, _released_names, _slot
+    _cancel_event = cancel_event
+    _released_names = None
+    _slot = 0
+    if released_queues is not None:
+        with slots.get_lock():
+            _slot = slots.value
+            slots.value += 1
+        _released_names = released_queues[_slot]
+
+
+def release_exported_blocks():
+    while _released_names is not None:
+        try:
+            name = _released_names.get_nowait()
+        except queue.Empty:
+            return
+        block = _exported_blocks.pop(name, None)
+        if block is not None:
+            block.close()
+
+
+def is_cancelled() -> bool:
+    return _cancel_event is not None and _cancel_event.is_set()
+
+
+def scan_subtree(path: str, with_owner: bool = True, lazy: bool = False,
+                 on_disk: bool = False) -> tuple[str, int, int, int, bool, list, int]:
+    release_exported_blocks()
+    buffer = bytearray()
+    owner_ids = {}
+    sizes = SizeAccounting(on_disk)
+    subfolders, entries_count = write_block(buffer, path, owner_ids, with_owner, lazy, sizes)
+    folders_count = 1
+    stack = [iter(subfolders)]
+    while stack and not is_cancelled():
+        subfolder = next(stack[-1], None)
+        if subfolder is None:
+            stack.pop()
+            continue
+        subfolders, count = write_block(buffer, subfolder, owner_ids, with_owner, lazy, sizes)
+        entries_count += count
+        folders_count += 1
+        stack.append(iter(subfolders))
+    complete = not stack
+    return export_buffer(buffer), len(buffer), folders_count, entries_count, complete, list(owner_ids), _slot
+
+
+def write_block(buffer: bytearray, path: str, owner_ids: dict, with_owner: bool,
+                lazy: bool = False, sizes: SizeAccounting = None) -> tuple[list[str], int]:
+    records = []
+    subfolders = []
+    partial = 0
+    count = 0
+    try:
+        with os.scandir(path) as entries:
+            for index, entry in enumerate(entries):
+                if index % CANCEL_CHECK_INTERVAL == 0 and is_cancelled():
+                    partial = PARTIAL_BLOCK
+                    break
+                is_dir = entry.is_dir(follow_symlinks=False)
+                other_size, inode = 0, None
+                try:
+                    if lazy:
+                        flags, owner_id = get_lazy_values(entry, is_dir, with_owner)
+                        ctime = mtime = 0
+                    else:
+                        stat_result = entry.stat(follow_symlinks=False)
+                        flags = FOLDER if is_dir else 0
+                        if stat.S_ISREG(stat_result.st_mode):
+                            flags |= REGULAR_FILE
+                        ctime, mtime = int(stat_result.st_ctime), int(stat_result.st_mtime)
+                        owner_id = owners.get_owner_id(entry.path, stat_result) if with_owner else None
+                    size = 0
+                    if not is_dir:
+                        size, other_size, inode = inodes.measure(entry.stat(follow_symlinks=False), sizes)
+                except FileNotFoundError:
+                    flags = (FOLDER if is_dir else 0) | PROTECTED
+                    size, other_size, ctime, mtime, owner_id = 0, 0, 0, 0, owners.UNKNOWN
+                encoded_name = os.fsencode(entry.name)
+                owner_index = owner_ids.setdefault(owner_id, len(owner_ids))
+                if inode is not None:
+                    flags |= HARD_LINK
+                records.append(RECORD.pack(flags, len(encoded_name), owner_index, size, other_size, ctime, mtime))
+                records.append(encoded_name)
+                if inode is not None:
+                    records.append(INODE.pack(*inode))
+                count += 1
+                if is_dir:
+                    subfolders.append(entry.path)
+    except OSError:
+        partial = PARTIAL_BLOCK
+    buffer += BLOCK.pack(count | partial)
+    buffer += b"".join(records)
+    return subfolders, count
+
+
+def get_lazy_values(entry: os.DirEntry, is_dir: bool, with_owner: bool) -> tuple[int, int]:
+    flags = LAZY
+    if is_dir:
+        flags |= FOLDER
+    elif entry.is_file(follow_symlinks=False):
+        flags |= REGULAR_FILE
+    return flags, LAZY_OWNER if with_owner else None
+
+
+def export_buffer(buffer: bytearray) -> str:
+    block = shared_memory.SharedMemory(create=True, size=max(len(buffer), 1))
+    block.buf[:len(buffer)] = buffer
+    if _released_names is not None:
+        _exported_blocks[block.name] = block
+    else:
+        block.close()
+    return block.name
+
+
+def read_subtree(name: str, size: int, folder: File, owner_ids: list, on_folder_finished: Callable = None,
+                 sizes: SizeAccounting = None):
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        buffer = block.buf[:size]
+        decode_subtree(buffer, folder, owner_ids, on_folder_finished, sizes)
+        buffer.release()
+    finally:
+        block.close()
+        block.unlink()
+
+
+def decode_subtree(buffer, folder: File, owner_ids: list, on_folder_finished: Callable = None,
+                   sizes: SizeAccounting = None):
+    offset = read_block(buffer, 0, folder, owner_ids, sizes)
+    stack = [(folder, iter(folder.folders))]
+    while stack:
+        current, subfolders = stack[-1]
+        subfolder = next(subfolders, None)
+        if subfolder is None:
+            stack.pop()
+            if on_folder_finished is not None:
+                on_folder_finished(current)
+            if stack:
+                stack[-1][0].size += current.size
+            continue
+        if offset >= len(buffer):
+            subfolder.mark_incomplete()
+            continue
+        offset = read_block(buffer, offset, subfolder, owner_ids, sizes)
+        stack.append((subfolder, iter(subfolder.folders)))
+
+
+def read_block(buffer, offset: int, folder: File, owner_ids: list, sizes: SizeAccounting = None) -> int:
+    count = BLOCK.unpack_from(buffer, offset)[0]
+    offset += BLOCK.size
+    if count & PARTIAL_BLOCK:
+        count &= ~PARTIAL_BLOCK
+        folder.mark_incomplete()
+    for _ in range(count):
+        flags, name_length, owner_index, size, other_size, ctime, mtime = RECORD.unpack_from(buffer, offset)
+        offset += RECORD.size
+        name = os.fsdecode(bytes(buffer[offset:offset + name_length]))
+        offset += name_length
+        inode = None
+        if flags & HARD_LINK:
+            inode = INODE.unpack_from(buffer, offset)
+            offset += INODE.size
+        if flags & PROTECTED:
+            file = File.from_values(folder, name, 0, None, None, "protected system file", owners.UNKNOWN)
+        else:
+            extension = sys.intern(os.path.splitext(name)[1]) if flags & REGULAR_FILE else ""
+            owner_id = owner_ids[owner_index]
+            if flags & LAZY:
+                ctime = mtime = NOT_LOADED
+                extension = NOT_LOADED if flags & REGULAR_FILE else ""
+                if owner_id == LAZY_OWNER:
+                    owner_id = NOT_LOADED
+            file = File.from_values(folder, name, size, ctime, mtime, extension, owner_id, other_size, inode)
+        if inode is not None and sizes is not None and not sizes.count(inode, file):
+            file.size = file.other_size = 0
+        if flags & FOLDER:
+            folder.add_folder(file)
+        else:
+            folder.add_file(file)
+            folder.size += file.size
+    return offset
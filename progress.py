@@ -0,0 +1,61 @@
+import math
+import time
+from typing import Callable, NamedTuple
+
+
+class Progress(NamedTuple):
+    done: int
+    total: int
+    entries: int
+    bytes: int
+    elapsed: float
+
+    @property
+    def percent(self) -> int:
+        return int(self.done / self.total * 100) if self.total else 0
+
+    @property
+    def entries_per_second(self) -> float:
+        return self.entries / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta(self):
+        if not self.done or self.done >= self.total:
+            return None
+        return self.elapsed * (self.total - self.done) / self.done
+
+
+class ProgressReporter:
+    def __init__(self, callback: Callable[[Progress], None], rate: float = 20.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.callback = callback
+        self.interval = 1 / rate if rate else 0.0
+        self.clock = clock
+        self.started_at = clock()
+        self.last_report = -math.inf
+        self.reports = 0
+        self.current = Progress(0, 0, 0, 0, 0.0)
+
+    def start(self):
+        self.started_at = self.clock()
+        self.last_report = -math.inf
+        self.reports = 0
+        self.current = Progress(0, 0, 0, 0, 0.0)
+
+    def update(self, done: int, total: int, entries: int = 0, size: int = 0):
+        now = self.clock()
+        self.current = Progress(done, total, entries, size, now - self.started_at)
+        if now - self.last_report >= self.interval:
+            self.report(now)
+
+    def finish(self):
+        self.report(self.clock())
+
+    def report(self, now: float):
+        self.last_report = now
+        self.reports += 1
+        self.callback(self.current._replace(elapsed=now - self.started_at))
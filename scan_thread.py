@@ -0,0 +1,58 @@
+from PyQt5 import QtCore
+
+from disk_usage import CalculatingMemoryUsage, File
+from duplicates import DuplicateFinder
+
+
+class ScanThread(QtCore.QThread):
+    updated = QtCore.pyqtSignal(object)
+    finished = QtCore.pyqtSignal(File, int)
+    saved = QtCore.pyqtSignal()
+
+    def __init__(self, disk, *args, **kwargs):
+        super(ScanThread, self).__init__()
+        self.scan = CalculatingMemoryUsage(disk, *args, on_progress=self.updated.emit, **kwargs)
+
+    def run(self):
+        tree = self.scan.run()
+        self.finished.emit(tree, self.scan.count)
+        self.scan.save_snapshot(tree)
+        self.saved.emit()
+
+    def stop(self):
+        self.scan.stop()
+
+
+class UpdateThread(QtCore.QThread):
+    finished = QtCore.pyqtSignal()
+
+    def __init__(self, tree: File, paths, rescan: bool, *args, **kwargs):
+        super(UpdateThread, self).__init__()
+        self.tree = tree
+        self.paths = paths
+        self.rescan = rescan
+        self.update = CalculatingMemoryUsage(tree.location, *args, deferred=True, **kwargs)
+
+    def run(self):
+        if self.rescan:
+            self.update.rescan_tree(self.tree)
+        else:
+            self.update.update_folders(self.tree, self.paths)
+        self.finished.emit()
+
+    def stop(self):
+        self.update.stop()
+
+
+class DuplicatesThread(QtCore.QThread):
+    finished = QtCore.pyqtSignal(object)
+
+    def __init__(self, tree: File, *args, **kwargs):
+        super(DuplicatesThread, self).__init__()
+        self.finder = DuplicateFinder(tree, *args, **kwargs)
+
+    def run(self):
+        self.finished.emit(self.finder.run())
+
+    def stop(self):
+        self.finder.stop()
@@ -0,0 +1,331 @@
+import collections
+import mmap
+import os
+import struct
+import sys
+
+from disk_usage import NOT_LOADED, File, switch_sizes
+from inodes import MAX_INODE
+
+MAGIC = b"DUSNAP"
+VERSION = 2
+HEADER = struct.Struct("<6sHQQQQQIB")
+RECORD = struct.Struct("<IqqqqIIIIIB")
+COUNT = struct.Struct("<Q")
+RANGE = struct.Struct("<QQ")
+OWNER = struct.Struct("<Bq")
+LINK = struct.Struct("<QQQ")
+
+INCOMPLETE = 1
+NO_DATES = 2
+DATES_NOT_LOADED = 4
+EXTENSION_NOT_LOADED = 8
+
+NO_OWNER = 0
+INT_OWNER = 1
+STR_OWNER = 2
+OWNER_NOT_LOADED = 3
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+class StringTable:
+    def __init__(self):
+        self.indexes = {}
+        self.blob = bytearray()
+        self.offsets = [0]
+
+    def add(self, string: str) -> int:
+        index = self.indexes.get(string)
+        if index is None:
+            index = self.indexes[string] = len(self.offsets) - 1
+            self.blob += encode(string)
+            self.offsets.append(len(self.blob))
+        return index
+
+    def write(self, output):
+        output.write(COUNT.pack(len(self.offsets) - 1))
+        output.write(b"".join(COUNT.pack(offset) for offset in self.offsets))
+        output.write(self.blob)
+
+
+def encode(string: str) -> bytes:
+    return string.encode("utf-8", "surrogatepass")
+
+
+def decode(data: bytes) -> str:
+    return data.decode("utf-8", "surrogatepass")
+
+
+def save(tree: File, path: str, on_disk: bool = False, started_at: float = None):
+    changed_since = None if started_at is None else int(started_at)
+    strings = StringTable()
+    location = strings.add(tree.location)
+    owner_ids = {}
+    links = []
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as output:
+        output.write(bytes(HEADER.size))
+        queue = collections.deque([(tree, True)])
+        index = 0
+        first_child = 1
+        while queue:
+            node, is_folder = queue.popleft()
+            if is_folder and changed_since is not None:
+                forget_racy_dates(node, changed_since)
+            output.write(pack_record(node, first_child, strings, owner_ids))
+            if node.inode is not None and max(node.inode) <= MAX_INODE:
+                links.append(LINK.pack(index, *node.inode))
+            queue.extend((folder, True) for folder in node.folders)
+            queue.extend((file, False) for file in node.files)
+            index += 1
+            first_child += len(node.folders) + len(node.files)
+        owners_offset = output.tell()
+        output.write(COUNT.pack(len(owner_ids)))
+        output.write(b"".join(pack_owner(owner_id, strings) for owner_id in owner_ids))
+        links_offset = output.tell()
+        output.write(COUNT.pack(len(links)))
+        output.write(b"".join(links))
+        strings_offset = output.tell()
+        strings.write(output)
+        output.seek(0)
+        output.write(HEADER.pack(MAGIC, VERSION, first_child, HEADER.size, owners_offset, links_offset,
+                                 strings_offset, location, on_disk))
+    os.replace(temporary_path, path)
+
+
+def forget_racy_dates(folder: File, changed_since: int):
+    ctime, mtime = folder._ctime, folder._mtime
+    if isinstance(ctime, int) and isinstance(mtime, int) and max(ctime, mtime) >= changed_since:
+        folder._ctime = folder._mtime = NOT_LOADED
+
+
+def pack_record(node: File, first_child: int, strings: StringTable, owner_ids: dict) -> bytes:
+    flags = INCOMPLETE if node.incomplete else 0
+    ctime, mtime = node._ctime, node._mtime
+    if ctime is NOT_LOADED:
+        flags |= DATES_NOT_LOADED
+        ctime = mtime = 0
+    elif ctime is None:
+        flags |= NO_DATES
+        ctime = mtime = 0
+    extension = node._extension
+    if extension is NOT_LOADED:
+        flags |= EXTENSION_NOT_LOADED
+        extension = ""
+    owner_index = owner_ids.setdefault(node._owner_id, len(owner_ids))
+    return RECORD.pack(
+        strings.add(node.name), node.size, node.other_size, ctime, mtime, strings.add(extension), owner_index,
+        first_child, len(node.folders), len(node.files), flags
+    )
+
+
+def pack_owner(owner_id, strings: StringTable) -> bytes:
+    if owner_id is None:
+        return OWNER.pack(NO_OWNER, 0)
+    if owner_id is NOT_LOADED:
+        return OWNER.pack(OWNER_NOT_LOADED, 0)
+    if isinstance(owner_id, str):
+        return OWNER.pack(STR_OWNER, strings.add(owner_id))
+    return OWNER.pack(INT_OWNER, owner_id)
+
+
+def load(path: str, on_disk: bool = None) -> File:
+    snapshot = Snapshot(path)
+    try:
+        tree = snapshot.read_node(0, None)
+    finally:
+        snapshot.release()
+    if on_disk is not None and on_disk != snapshot.on_disk:
+        switch_sizes(tree)
+    return tree
+
+
+def close(tree: File):
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if getattr(node, "_snapshot", None) is not None:
+            node._snapshot.close()
+            return
+        stack.extend(node._folders or ())
+
+
+class Snapshot:
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            try:
+                self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f"{path} is empty")
+        self.unloaded = 1
+        try:
+            self.read_header(path)
+        except SnapshotError:
+            self.buffer.close()
+            raise
+
+    def read_header(self, path: str):
+        size = len(self.buffer)
+        if size < HEADER.size:
+            raise SnapshotError(f"{path} is not a snapshot")
+        magic, version, self.count, self.nodes_offset, owners_offset, links_offset, strings_offset, location, \
+            on_disk = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a snapshot")
+        if version != VERSION:
+            raise SnapshotError(f"{path} has unsupported snapshot version {version}")
+        nodes_end = self.nodes_offset + self.count * RECORD.size
+        if not HEADER.size <= self.nodes_offset <= nodes_end <= owners_offset <= links_offset <= strings_offset \
+                <= size - COUNT.size:
+            raise SnapshotError(f"{path} is truncated")
+        self.strings_count = COUNT.unpack_from(self.buffer, strings_offset)[0]
+        self.offsets_offset = strings_offset + COUNT.size
+        self.blob_offset = self.offsets_offset + COUNT.size * (self.strings_count + 1)
+        if self.blob_offset > size:
+            raise SnapshotError(f"{path} is truncated")
+        self.blob_size = size - self.blob_offset
+        self.location = self.get_string(location)
+        self.extensions = {}
+        self.owner_ids = self.read_owners(owners_offset, links_offset)
+        self.links = self.read_links(links_offset, strings_offset)
+        self.on_disk = bool(on_disk)
+
+    def read_owners(self, offset: int, end: int) -> list:
+        count = self.read_count(offset, OWNER.size, end)
+        owner_ids = []
+        for index in range(count):
+            kind, value = OWNER.unpack_from(self.buffer, offset + COUNT.size + index * OWNER.size)
+            if kind == INT_OWNER:
+                owner_ids.append(value)
+            elif kind == STR_OWNER:
+                owner_ids.append(sys.intern(self.get_string(value)))
+            elif kind == OWNER_NOT_LOADED:
+                owner_ids.append(NOT_LOADED)
+            else:
+                owner_ids.append(None)
+        return owner_ids
+
+    def read_links(self, offset: int, end: int) -> dict:
+        links = {}
+        for index in range(self.read_count(offset, LINK.size, end)):
+            node_index, device, inode = LINK.unpack_from(self.buffer, offset + COUNT.size + index * LINK.size)
+            links[node_index] = (device, inode)
+        return links
+
+    def read_count(self, offset: int, item_size: int, end: int) -> int:
+        if offset + COUNT.size > end:
+            raise SnapshotError("section is truncated")
+        count = COUNT.unpack_from(self.buffer, offset)[0]
+        if offset + COUNT.size + count * item_size > end:
+            raise SnapshotError("section is truncated")
+        return count
+
+    def get_string(self, index: int) -> str:
+        if not 0 <= index < self.strings_count:
+            raise SnapshotError(f"string {index} is out of range")
+        start, end = RANGE.unpack_from(self.buffer, self.offsets_offset + index * COUNT.size)
+        if not start <= end <= self.blob_size:
+            raise SnapshotError(f"string {index} is out of range")
+        try:
+            return decode(self.buffer[self.blob_offset + start:self.blob_offset + end])
+        except UnicodeDecodeError as error:
+            raise SnapshotError(f"string {index} is not valid UTF-8") from error
+
+    def get_extension(self, index: int) -> str:
+        extension = self.extensions.get(index)
+        if extension is None:
+            extension = self.extensions[index] = sys.intern(self.get_string(index))
+        return extension
+
+    def read_record(self, index: int) -> tuple:
+        if not 0 <= index < self.count:
+            raise SnapshotError(f"node {index} is out of range")
+        return RECORD.unpack_from(self.buffer, self.nodes_offset + index * RECORD.size)
+
+    def read_node(self, index: int, parent):
+        name, size, other_size, ctime, mtime, extension, owner_index, _, folders_count, files_count, flags = \
+            self.read_record(index)
+        if flags & DATES_NOT_LOADED:
+            ctime = mtime = NOT_LOADED
+        elif flags & NO_DATES:
+            ctime = mtime = None
+        extension = NOT_LOADED if flags & EXTENSION_NOT_LOADED else self.get_extension(extension)
+        if owner_index >= len(self.owner_ids):
+            raise SnapshotError(f"owner {owner_index} is out of range")
+        node = SnapshotFile.from_values(
+            parent, self.get_string(name), size, ctime, mtime, extension, self.owner_ids[owner_index], other_size,
+            self.links.get(index)
+        )
+        node.incomplete = bool(flags & INCOMPLETE)
+        if parent is None:
+            node._location = self.location
+        if folders_count or files_count:
+            node._snapshot = self
+            node._index = index
+            self.unloaded += 1
+        else:
+            node._snapshot = None
+        return node
+
+    def load_children(self, folder: "SnapshotFile"):
+        _, _, _, _, _, _, _, first_child, folders_count, files_count, _ = self.read_record(folder._index)
+        if first_child + folders_count + files_count > self.count:
+            raise SnapshotError(f"children of node {folder._index} are out of range")
+        folder._snapshot = None
+        try:
+            if folders_count:
+                folder._folders = [self.read_node(index, folder)
+                                   for index in range(first_child, first_child + folders_count)]
+            first_file = first_child + folders_count
+            if files_count:
+                folder._files = [self.read_node(index, folder)
+                                 for index in range(first_file, first_file + files_count)]
+        finally:
+            self.release()
+
+    def release(self):
+        self.unloaded -= 1
+        if self.unloaded == 0:
+            self.close()
+
+    def close(self):
+        self.buffer.close()
+
+
+class SnapshotFile(File):
+    __slots__ = ("_snapshot", "_index")
+
+    def load_children(self):
+        if self._snapshot is not None:
+            self._snapshot.load_children(self)
+
+    @property
+    def files(self):
+        self.load_children()
+        return File.files.fget(self)
+
+    @files.setter
+    def files(self, files):
+        self.load_children()
+        File.files.fset(self, files)
+
+    @property
+    def folders(self):
+        self.load_children()
+        return File.folders.fget(self)
+
+    @folders.setter
+    def folders(self, folders):
+        self.load_children()
+        File.folders.fset(self, folders)
+
+    def add_file(self, file):
+        self.load_children()
+        super().add_file(file)
+
+    def add_folder(self, folder):
+        self.load_children()
+        super().add_folder(folder)
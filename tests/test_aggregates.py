@@ -0,0 +1,104 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import aggregates
+from disk_usage import CalculatingMemoryUsage, File
+
+DAY = aggregates.DAY
+
+
+class TestAggregates(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        now = time.time()
+        files = (
+            ("a.log", 10, now), ("b.txt", 20, now - 3 * DAY),
+            ("dir0/c.log", 100, now - 400 * DAY), ("dir0/sub/d.log", 1000, now - 1000 * DAY),
+            ("dir1/e", 7, now - 20 * DAY),
+        )
+        for path, size, mtime in files:
+            path = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(b"\0" * size)
+            os.utime(path, (mtime, mtime))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def scan(self, **kwargs):
+        with patch('owners.get_owner_id', return_value=0):
+            task = CalculatingMemoryUsage(self.root, aggregate=True, **kwargs)
+            task.run()
+        return task.tree
+
+    def test_get_age_bucket(self):
+        now = 1_000 * DAY
+        self.assertEqual(aggregates.get_age_bucket(now, now), "today")
+        self.assertEqual(aggregates.get_age_bucket(now + 60, now), "today")
+        self.assertEqual(aggregates.get_age_bucket(now - 7 * DAY, now), "last week")
+        self.assertEqual(aggregates.get_age_bucket(now - 30 * DAY, now), "last month")
+        self.assertEqual(aggregates.get_age_bucket(now - 365 * DAY, now), "this year")
+        self.assertEqual(aggregates.get_age_bucket(now - 730 * DAY, now), "last year")
+        self.assertEqual(aggregates.get_age_bucket(0, now), "waaaay too long ago")
+        self.assertEqual(aggregates.get_age_bucket(None, now), aggregates.UNKNOWN_AGE)
+
+    def test_collect_rolls_up_subfolder_tables(self):
+        root = File.from_values(None, "root", 0, 0, 0, "", None)
+        folder = File.from_values(root, "folder", 0, 0, 0, "", None)
+        root.add_folder(folder)
+        root.add_file(File.from_values(root, "a.log", 5, 0, 0, ".log", 1))
+        folder.add_file(File.from_values(folder, "b.log", 7, 0, 0, ".log", 2))
+        self.assertIsNone(aggregates.collect(File.from_values(None, "empty", 0, 0, 0, "", None), 0))
+        aggregates.collect(folder, 0)
+        aggregates.collect(root, 0)
+        self.assertEqual(root.aggregates.extensions, {".log": (12, 2)})
+        self.assertEqual(root.aggregates.owners, {1: (5, 1), 2: (7, 1)})
+        self.assertEqual(folder.aggregates.owners, {2: (7, 1)})
+        self.assertEqual(root.aggregates.ages, {"today": (12, 2)})
+        self.assertFalse(hasattr(root.aggregates, "__dict__"))
+        self.assertEqual(root.aggregates.keys, (".log", 1, 2, "today"))
+        self.assertEqual(list(root.aggregates.totals), [12, 2, 5, 1, 7, 1, 12, 2])
+
+    def test_get_largest(self):
+        table = {".a": [1, 1], ".b": [30, 2], ".c": [20, 4]}
+        self.assertEqual(aggregates.Aggregates.get_largest(table, 2), [(".b", 30, 2), (".c", 20, 4)])
+
+    def test_scan_rolls_up_subtree_tables(self):
+        tree = self.scan()
+        self.assertEqual(tree.aggregates.extensions, {".log": (1110, 3), ".txt": (20, 1), "": (7, 1)})
+        self.assertEqual(tree.aggregates.owners, {0: (1137, 5)})
+        self.assertEqual(tree.aggregates.ages, {
+            "today": (10, 1), "last week": (20, 1), "last month": (7, 1),
+            "last year": (100, 1), "waaaay too long ago": (1000, 1),
+        })
+        dir0 = next(folder for folder in tree.folders if folder.name == "dir0")
+        self.assertEqual(dir0.aggregates.extensions, {".log": (1100, 2)})
+        self.assertEqual(dir0.folders[0].aggregates.extensions, {".log": (1000, 1)})
+
+    def test_parallel_and_process_scans_match_serial_tables(self):
+        serial = self.scan()
+        for tree in (self.scan(workers=3), self.scan(processes=2)):
+            self.assertEqual(tree.aggregates.extensions, serial.aggregates.extensions)
+            self.assertEqual(tree.aggregates.ages, serial.aggregates.ages)
+            self.assertEqual(
+                {folder.name: folder.aggregates.extensions for folder in tree.folders},
+                {folder.name: folder.aggregates.extensions for folder in serial.folders},
+            )
+
+    def test_tables_are_optional(self):
+        with patch('owners.get_owner_id', return_value=0):
+            task = CalculatingMemoryUsage(self.root, lazy_metadata=True)
+            task.run()
+        self.assertIsNone(task.tree.aggregates)
+        self.assertTrue(task.lazy_metadata)
+        self.assertFalse(CalculatingMemoryUsage(self.root, lazy_metadata=True, aggregate=True).lazy_metadata)
+
+
+if __name__ == '__main__':
+    unittest.main()
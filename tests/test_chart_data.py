@@ -0,0 +1,32 @@
+import unittest
+
+from chart_data import ChartData
+from disk_usage import File
+
+
+class TestChartData(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = File.from_values(None, "root", 0, 0, 0, "", None)
+        for i in range(10):
+            self.tree.add_file(File.from_values(self.tree, f"file{i}", i, 0, 0, "", None))
+
+    def test_small_folders_keep_every_sized_child(self):
+        chart_data = ChartData(self.tree.files[:4], 5)
+        self.assertEqual(chart_data.slices, [("file1", 1), ("file2", 2), ("file3", 3)])
+
+    def test_rest_is_folded_into_other(self):
+        chart_data = ChartData(self.tree.files, 3)
+        self.assertEqual(chart_data.slices, [("file9", 9), ("file8", 8), ("file7", 7), ("other (6 items)", 21)])
+        self.assertEqual(chart_data.get_items("file8"), [self.tree.files[8]])
+        self.assertEqual(chart_data.get_items("other (6 items)"), [])
+
+    def test_items_with_same_name(self):
+        folder = File.from_values(self.tree, "folder", 0, 0, 0, "", None)
+        folder.add_file(File.from_values(folder, "file9", 4, 0, 0, "", None))
+        chart_data = ChartData([self.tree.files[9], folder.files[0]], 2)
+        self.assertEqual(chart_data.get_items("file9"), [self.tree.files[9], folder.files[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import cli
+import inodes
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        for path, size in (("a/b/deep.bin", 5000), ("a/mid.bin", 300), ("top.txt", 10)):
+            Path(self.root, path).parent.mkdir(parents=True, exist_ok=True)
+            Path(self.root, path).write_bytes(b"\0" * size)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_cli(self, *arguments) -> tuple[int, str]:
+        output = io.StringIO()
+        code = cli.main([self.root, *arguments], output)
+        return code, output.getvalue()
+
+    def test_streams_ndjson_as_folders_finish(self):
+        code, output = self.run_cli()
+        rows = [json.loads(line) for line in output.splitlines()]
+        self.assertEqual(code, cli.EXIT_OK)
+        self.assertEqual([(os.path.relpath(row["path"], self.root), row["type"], row["size"], row["depth"])
+                          for row in rows], [
+            (os.path.join("a", "b", "deep.bin"), "file", 5000, 3),
+            (os.path.join("a", "b"), "folder", 5000, 2),
+            (os.path.join("a", "mid.bin"), "file", 300, 2),
+            ("a", "folder", 5300, 1),
+            ("top.txt", "file", 10, 1),
+            (".", "folder", 5310, 0),
+        ])
+
+    def test_finished_folders_are_dropped(self):
+        task = cli.CalculatingMemoryUsage(self.root, resolve_owners=False)
+        rows = cli.iterate_rows(task.iterate_tree())
+        self.assertEqual(next(rows)["depth"], 3)
+        self.assertEqual([folder.name for folder in task.tree.folders], ["a"])
+        self.assertEqual(len(list(rows)), 5)
+        self.assertEqual(task.tree.folders, ())
+        self.assertEqual(task.tree.files, ())
+
+    def test_depth_size_and_sort_limits(self):
+        code, output = self.run_cli("--format", "csv", "--max-depth", "1", "--sort", "name", "--reverse",
+                                    "--min-size", "0.01k")
+        rows = list(csv.DictReader(io.StringIO(output)))
+        self.assertEqual(code, cli.EXIT_OK)
+        self.assertEqual([os.path.basename(row["path"]) for row in rows[:-1]], ["top.txt", "a"])
+        _, output = self.run_cli("--min-size", "1k", "--folders-only")
+        self.assertEqual([json.loads(line)["size"] for line in output.splitlines()], [5000, 5300, 5310])
+
+    def test_on_disk_sizes(self):
+        code, output = self.run_cli("--size", "on-disk", "--max-depth", "0")
+        self.assertEqual(code, cli.EXIT_OK)
+        expected = sum(inodes.get_allocated_size(os.stat(Path(self.root, path)))
+                       for path in ("a/b/deep.bin", "a/mid.bin", "top.txt"))
+        self.assertEqual(json.loads(output)["size"], expected)
+
+    def test_exit_codes(self):
+        self.assertEqual(cli.main([os.path.join(self.root, "top.txt")], io.StringIO()), cli.EXIT_ERROR)
+        with self.assertRaises(SystemExit) as context, \
+                patch('sys.stderr', io.StringIO()):
+            cli.main([self.root, "--min-size", "lots"], io.StringIO())
+        self.assertEqual(context.exception.code, 2)
+
+    def test_unreadable_folders_are_incomplete(self):
+        scandir = os.scandir
+
+        def deny_b(path):
+            if os.path.basename(path) == "b":
+                raise PermissionError(13, "Permission denied", path)
+            return scandir(path)
+
+        with patch('os.scandir', deny_b), patch('sys.stderr', io.StringIO()) as stderr:
+            code, output = self.run_cli()
+        rows = {os.path.relpath(row["path"], self.root): row for row in map(json.loads, output.splitlines())}
+        self.assertEqual(code, cli.EXIT_INCOMPLETE)
+        self.assertIn("could not be read", stderr.getvalue())
+        self.assertNotIn(os.path.join("a", "b", "deep.bin"), rows)
+        self.assertEqual({path: row["incomplete"] for path, row in rows.items()}, {
+            os.path.join("a", "b"): True, os.path.join("a", "mid.bin"): False, "a": True, "top.txt": False, ".": True,
+        })
+
+    def test_parse_size(self):
+        self.assertEqual(cli.parse_size("512"), 512)
+        self.assertEqual(cli.parse_size("10K"), 10240)
+        self.assertEqual(cli.parse_size("1.5gb"), 3 * 1024 ** 3 // 2)
+
+    def test_runs_without_gui_dependencies(self):
+        script = ("import sys, cli; code = cli.main(sys.argv[1:]); "
+                  "print(code, sorted(name for name in sys.modules if name.startswith(('PyQt5', 'win32'))))")
+        result = subprocess.run([sys.executable, "-c", script, self.root, "-o", os.devnull],
+                                cwd=Path(__file__).parent.parent, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.stdout.strip(), "0 []")
+
+
+if __name__ == '__main__':
+    unittest.main()
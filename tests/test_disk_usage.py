@@ -1,12 +1,54 @@
+import datetime
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
-from disk_usage import (CalculatingFilesCount, CalculatingMemoryUsage, File,
-                        UpdatingFoldersSize)
+import disk_usage
+import inodes
+import owners
+from disk_usage import CalculatingMemoryUsage, File
+from largest import iterate_files
 
 import math
 
+real_scandir = os.scandir
+
+
+class CountingDirEntry:
+    def __init__(self, entry):
+        self.entry = entry
+        self.name = entry.name
+        self.path = entry.path
+        self.stat_calls = 0
+
+    def is_dir(self, follow_symlinks=True):
+        return self.entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_file(self, follow_symlinks=True):
+        return self.entry.is_file(follow_symlinks=follow_symlinks)
+
+    def stat(self, follow_symlinks=True):
+        self.stat_calls += 1
+        return self.entry.stat(follow_symlinks=follow_symlinks)
+
+
+class CountingScandir:
+    def __init__(self):
+        self.entries = []
+
+    def __call__(self, path):
+        with real_scandir(path) as entries:
+            wrapped = [CountingDirEntry(entry) for entry in entries]
+        self.entries.extend(wrapped)
+        return MagicMock(__enter__=MagicMock(return_value=iter(wrapped)))
+
 
 class TestDiskUsage(unittest.TestCase):
 
@@ -33,37 +75,544 @@ class TestDiskUsage(unittest.TestCase):
         self.assertEqual(File.get_catalog_name("C:\\test"), "test")
         self.assertEqual(File.get_catalog_name("C:\\"), "C")
 
-    def test_file_get_owner(self):
-        with patch('disk_usage.win32security.GetFileSecurity') as mock_get_file_security:
-            mock_get_file_security.return_value = MagicMock()
-            mock_get_file_security.return_value.GetSecurityDescriptorOwner.return_value = "owner_sid"
-            with patch('disk_usage.win32security.LookupAccountSid') as mock_lookup_account_sid:
-                mock_lookup_account_sid.return_value = ("owner", None, None)
-                self.assertEqual(File.get_owner("test.txt"), "owner")
-
-    def test_calculating_files_count(self):
-        with patch('os.walk') as mock_walk:
-            task = CalculatingFilesCount("root")
-            mock_walk.return_value = [('root', ['dir1', 'dir2'], []),
-                                      ('root\\dir1', [], ['file1']),
-                                      ('root\\dir2', [], ['file2'])]
+    def test_file_owner_is_resolved_lazily(self):
+        path = Path(__file__).parent / "test.txt"
+        with patch('owners.lookup_owner_name', return_value="owner") as lookup:
+            owners.resolve_owner.cache_clear()
+            file = File(str(path))
+            lookup.assert_not_called()
+            self.assertEqual(file.owner, "owner")
+            self.assertEqual(file.owner, "owner")
+            lookup.assert_called_once_with(file.owner_id)
+        owners.resolve_owner.cache_clear()
+
+    def test_file_without_owner(self):
+        file = File(str(Path(__file__).parent / "test.txt"), with_owner=False)
+        self.assertIsNone(file.owner_id)
+        self.assertEqual(file.owner, "")
+
+    def test_file_from_dir_entry(self):
+        with os.scandir(Path(__file__).parent) as entries:
+            entry = next(entry for entry in entries if entry.name == "test.txt")
+        file = File.from_dir_entry(entry)
+        self.assertEqual(file.name, "test.txt")
+        self.assertEqual(file.size, entry.stat().st_size)
+        self.assertEqual(file.extension, ".txt")
+        self.assertEqual(file.mtime, int(entry.stat().st_mtime))
+
+    def test_file_from_dir_entry_of_folder(self):
+        with os.scandir(Path(__file__).parent) as entries:
+            entry = next(entry for entry in entries if entry.name == "root")
+        file = File.from_dir_entry(entry)
+        self.assertEqual(file.size, 0)
+        self.assertEqual(file.extension, "")
+
+    def test_file_has_no_instance_dict(self):
+        file = File(str(Path(__file__).parent / "test.txt"))
+        self.assertFalse(hasattr(file, "__dict__"))
+        self.assertIsInstance(file.mtime, int)
+        self.assertEqual(file.change_date, datetime.datetime.fromtimestamp(file.mtime))
+
+    def test_file_child_containers_are_allocated_lazily(self):
+        folder = File(str(Path(__file__).parent / "root"))
+        self.assertEqual(folder.files, ())
+        self.assertEqual(folder.folders, ())
+        child = File(str(Path(__file__).parent / "root" / "dir1"), parent=folder)
+        folder.add_folder(child)
+        self.assertEqual(folder.folders, [child])
+        self.assertEqual(folder.files, ())
+        self.assertIs(child.parent, folder)
+
+    def test_file_location_is_built_from_parents(self):
+        root_path = Path(__file__).parent / "root"
+        task = CalculatingMemoryUsage(str(root_path))
+        with patch('owners.get_owner_id', return_value=0):
+            tree = task.build_tree()
+        dir1 = next(folder for folder in tree.folders if folder.name == "dir1")
+        self.assertEqual(dir1.location, str(root_path / "dir1"))
+        self.assertEqual(dir1.files[0].location, str(root_path / "dir1" / "file1"))
+
+    def test_calculating_memory_usage_stats_each_entry_once(self):
+        root = Path(__file__).parent / "root"
+        scandir = CountingScandir()
+        forbidden = AssertionError("per-path stat call")
+        with patch('disk_usage.os.scandir', scandir), \
+                patch('owners.get_owner_id', return_value=0), \
+                patch('os.path.isdir', side_effect=forbidden), \
+                patch('os.path.isfile', side_effect=forbidden), \
+                patch('os.path.getsize', side_effect=forbidden), \
+                patch('os.path.getctime', side_effect=forbidden), \
+                patch('os.path.getmtime', side_effect=forbidden):
+            task = CalculatingMemoryUsage(str(root))
+            task.run()
+        self.assertEqual(len(scandir.entries), 4)
+        for entry in scandir.entries:
+            self.assertLessEqual(entry.stat_calls, 1)
+
+    def test_lazy_scan_stats_only_files(self):
+        root = Path(__file__).parent / "root"
+        scandir = CountingScandir()
+        with patch('disk_usage.os.scandir', scandir), \
+                patch('owners.get_owner_id', return_value=0) as get_owner_id:
+            task = CalculatingMemoryUsage(str(root), lazy_metadata=True)
             task.run()
-            self.assertEqual(task.result, 4)
+        get_owner_id.assert_called_once()
+        for entry in scandir.entries:
+            self.assertEqual(entry.stat_calls, 0 if entry.is_dir() else 1)
+        files = [entry for entry in scandir.entries if not entry.is_dir()]
+        self.assertEqual(task.tree.size, sum(entry.entry.stat().st_size for entry in files))
+
+    def test_lazy_metadata_is_loaded_once_on_access(self):
+        root = Path(__file__).parent / "root"
+        task = CalculatingMemoryUsage(str(root), lazy_metadata=True)
+        task.build_tree()
+        dir1 = next(folder for folder in task.tree.folders if folder.name == "dir1")
+        file = dir1.files[0]
+        stat_result = os.stat(file.location)
+        with patch('disk_usage.os.stat', return_value=stat_result) as mock_stat, \
+                patch('owners.get_owner_id', return_value=7):
+            self.assertEqual(file.mtime, int(stat_result.st_mtime))
+            self.assertEqual(file.ctime, int(stat_result.st_ctime))
+            self.assertEqual(file.owner_id, 7)
+            self.assertEqual(file.extension, "")
+        mock_stat.assert_called_once_with(file.location, follow_symlinks=False)
+
+    def test_lazy_metadata_of_vanished_file(self):
+        root = Path(__file__).parent / "root"
+        task = CalculatingMemoryUsage(str(root), lazy_metadata=True)
+        task.build_tree()
+        file = next(folder for folder in task.tree.folders if folder.name == "dir1").files[0]
+        with patch('disk_usage.os.stat', side_effect=FileNotFoundError):
+            self.assertIsNone(file.change_date)
+        self.assertEqual(file.extension, "protected system file")
+        self.assertEqual(file.owner_id, owners.UNKNOWN)
 
     def test_calculating_memory_usage(self):
         with patch('disk_usage.os.scandir') as mock_scandir:
-            mock_scandir.return_value = [MagicMock(path="file1"), MagicMock(path="dir1")]
-            task = CalculatingMemoryUsage("C:\\", 4)
+            file1 = MagicMock(path="file1")
+            file1.is_dir.return_value = False
+            file1.stat.side_effect = FileNotFoundError
+            dir1 = MagicMock(path="dir1")
+            dir1.is_dir.return_value = False
+            dir1.stat.side_effect = FileNotFoundError
+            mock_scandir.return_value.__enter__.return_value = [file1, dir1]
+            task = CalculatingMemoryUsage("C:\\")
             task.run()
             self.assertIsNotNone(task.tree)
+            self.assertEqual(task.count, 2)
+            self.assertEqual(task.scanned_folders, task.discovered_folders)
 
-    def test_updating_folders_size(self):
-        file = File("test.txt")
-        file.files = [File("file1.txt"), File("file2.txt")]
-        file.folders = [File("dir1")]
-        task = UpdatingFoldersSize(file, 4)
+    def test_calculating_memory_usage_progress_estimate(self):
+        root = Path(__file__).parent / "root"
+        progress = []
+        task = CalculatingMemoryUsage(str(root), progress_rate=0,
+                                      on_progress=lambda update: progress.append((update.done, update.total)))
         task.run()
-        self.assertEqual(file.size, 0)
+        self.assertEqual(progress[0], (1, 3))
+        self.assertEqual(progress[-1], (3, 3))
+        self.assertEqual(task.count, 4)
+
+    def test_calculating_memory_usage_throttles_progress(self):
+        root = Path(__file__).parent / "root"
+        progress = []
+        task = CalculatingMemoryUsage(str(root), on_progress=progress.append)
+        task.run()
+        self.assertEqual(len(progress), 2)
+        self.assertEqual(progress[-1].done, 3)
+        self.assertEqual(progress[-1].entries, 4)
+
+    def test_calculating_memory_usage_rolls_up_folder_sizes(self):
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, "a", "b"))
+            for path, size in (("top.bin", 10), ("a/mid.bin", 100), ("a/b/deep.bin", 1000)):
+                with open(os.path.join(root, path), "wb") as file:
+                    file.write(b"\0" * size)
+            with patch('owners.get_owner_id', return_value=0):
+                tree = CalculatingMemoryUsage(root).build_tree()
+        a = tree.folders[0]
+        self.assertEqual(tree.size, 1110)
+        self.assertEqual(a.size, 1100)
+        self.assertEqual(a.folders[0].size, 1000)
+
+    def test_parallel_scan_matches_serial_scan(self):
+        with tempfile.TemporaryDirectory() as root:
+            for i in range(5):
+                for j in range(4):
+                    folder = os.path.join(root, f"dir{i}", f"sub{j}")
+                    os.makedirs(folder)
+                    with open(os.path.join(folder, "data.bin"), "wb") as file:
+                        file.write(b"\0" * (i * 10 + j))
+            with patch('owners.get_owner_id', return_value=0):
+                serial = CalculatingMemoryUsage(root)
+                serial.run()
+                parallel = CalculatingMemoryUsage(root, workers=4)
+                tree = parallel.run()
+        self.assertIs(tree, parallel.tree)
+        self.assertEqual(parallel.count, serial.count)
+        self.assertEqual(tree.size, serial.tree.size)
+        self.assertEqual(parallel.scanned_folders, parallel.discovered_folders)
+        self.assertEqual(parallel.unfinished_subfolders, {})
+        serial_sizes = {folder.name: folder.size for folder in serial.tree.folders}
+        parallel_sizes = {folder.name: folder.size for folder in tree.folders}
+        self.assertEqual(parallel_sizes, serial_sizes)
+
+    def test_iterate_tree_yields_finished_folders(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.make_sized_tree(root)
+            with patch('owners.get_owner_id', return_value=0):
+                task = CalculatingMemoryUsage(root)
+                folders = list(task.iterate_tree())
+        self.assertEqual(len(folders), 17)
+        self.assertIs(folders[-1], task.tree)
+        for folder in folders:
+            self.assertEqual(folder.size, sum(file.size for file in folder.files) + sum(
+                subfolder.size for subfolder in folder.folders))
+            self.assertTrue(all(subfolder in folders[:folders.index(folder)] for subfolder in folder.folders))
+
+    def test_closing_iterate_tree_cancels_scan(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.make_sized_tree(root)
+            with patch('owners.get_owner_id', return_value=0):
+                task = CalculatingMemoryUsage(root)
+                folders = task.iterate_tree()
+                next(folders)
+                folders.close()
+        self.assertFalse(task.running)
+        self.assert_partial_tree_is_consistent(task.tree)
+
+    def test_import_does_not_load_gui_or_process_modules(self):
+        script = ("import sys, disk_usage; print(sorted(name for name in sys.modules if name.split('.')[0] in "
+                  "('PyQt5', 'win32security', 'pywintypes', 'multiprocessing', 'concurrent')))")
+        result = subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).parent.parent,
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+    def make_sized_tree(self, root):
+        for i in range(4):
+            for j in range(3):
+                folder = os.path.join(root, f"dir{i}", f"sub{j}")
+                os.makedirs(folder)
+                with open(os.path.join(folder, "data.bin"), "wb") as file:
+                    file.write(b"\0" * (i * 10 + j + 1))
+
+    def assert_partial_tree_is_consistent(self, tree):
+        self.assertTrue(tree.incomplete)
+        stack = [tree]
+        while stack:
+            folder = stack.pop()
+            expected = sum(file.size for file in folder.files) + sum(sub.size for sub in folder.folders)
+            self.assertEqual(folder.size, expected)
+            if any(sub.incomplete for sub in folder.folders):
+                self.assertTrue(folder.incomplete)
+            stack.extend(folder.folders)
+
+    def test_cancelled_scan_returns_partial_tree(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.make_sized_tree(root)
+            with patch('owners.get_owner_id', return_value=0):
+                task = CalculatingMemoryUsage(root, progress_rate=0)
+                task.on_progress = lambda progress: progress.done == 3 and task.stop()
+                task.run()
+        self.assertEqual(task.scanned_folders, 3)
+        self.assertLess(task.tree.size, 1 + 2 + 3 + 11 + 12 + 13 + 21 + 22 + 23 + 31 + 32 + 33)
+        self.assertTrue(any(folder.incomplete for folder in task.tree.folders))
+        self.assert_partial_tree_is_consistent(task.tree)
+
+    def test_cancelled_parallel_scan_returns_partial_tree(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.make_sized_tree(root)
+            with patch('owners.get_owner_id', return_value=0):
+                task = CalculatingMemoryUsage(root, workers=3)
+                on_folder_scanned = task.on_folder_scanned
+
+                def stop_after_four_folders(folder):
+                    on_folder_scanned(folder)
+                    if task.scanned_folders == 4:
+                        task.stop()
+
+                task.on_folder_scanned = stop_after_four_folders
+                task.run()
+        self.assertLess(task.scanned_folders, 17)
+        self.assertEqual(task.unfinished_subfolders, {})
+        self.assert_partial_tree_is_consistent(task.tree)
+
+    def test_cancel_latency_inside_huge_directory(self):
+        def slow_owner(path, stat_result):
+            time.sleep(0.001)
+            return 0
+
+        with tempfile.TemporaryDirectory() as root:
+            for i in range(5000):
+                open(os.path.join(root, f"file{i}"), "wb").close()
+            with patch('owners.get_owner_id', side_effect=slow_owner):
+                task = CalculatingMemoryUsage(root)
+                thread = threading.Thread(target=task.run)
+                thread.start()
+                time.sleep(0.2)
+                cancelled_at = time.perf_counter()
+                task.stop()
+                thread.join()
+                latency = time.perf_counter() - cancelled_at
+        self.assertLess(latency, 0.1)
+        self.assertTrue(task.tree.incomplete)
+        self.assertLess(len(task.tree.files), 5000)
+
+    def test_calculating_memory_usage_handles_trees_deeper_than_recursion_limit(self):
+        recursion_limit = sys.getrecursionlimit()
+        depth = 300
+        with tempfile.TemporaryDirectory() as root:
+            deepest = os.path.join(root, *["d"] * depth)
+            os.makedirs(deepest)
+            with open(os.path.join(deepest, "leaf.bin"), "wb") as file:
+                file.write(b"\0" * 7)
+            with patch('owners.get_owner_id', return_value=0):
+                task = CalculatingMemoryUsage(root)
+                sys.setrecursionlimit(depth - 100)
+                try:
+                    tree = task.build_tree()
+                finally:
+                    sys.setrecursionlimit(recursion_limit)
+        self.assertEqual(tree.size, 7)
+        self.assertEqual(task.scanned_folders, depth + 1)
+
+    def make_rescan_tree(self, root):
+        for folder, name, size in (("a", "one.bin", 10), ("b/deep", "two.bin", 20), ("c", "three.bin", 30)):
+            os.makedirs(os.path.join(root, folder))
+            with open(os.path.join(root, folder, name), "wb") as file:
+                file.write(b"\0" * size)
+        old = time.time() - 1000
+        for folder in ("a", "b/deep", "b", "c", ""):
+            os.utime(os.path.join(root, folder), (old, old))
+
+    def scan_again(self, root, previous, **kwargs):
+        with patch('owners.get_owner_id', return_value=0):
+            task = CalculatingMemoryUsage(root, previous=previous, **kwargs)
+            task.run()
+            expected = CalculatingMemoryUsage(root)
+            expected.run()
+        return task, expected.tree
+
+    def test_rescan_rereads_only_changed_folders(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.make_rescan_tree(root)
+            with patch('owners.get_owner_id', return_value=0):
+                previous = CalculatingMemoryUsage(root)
+                previous.run()
+            folders = {folder.name: folder for folder in previous.tree.folders}
+            deep = folders["b"].folders[0]
+            with open(os.path.join(root, "a", "new.bin"), "wb") as file:
+                file.write(b"\0" * 5)
+            shutil.rmtree(os.path.join(root, "c"))
+            os.makedirs(os.path.join(root, "b", "deep", "inner"))
+            with open(os.path.join(root, "b", "deep", "inner", "four.bin"), "wb") as file:
+                file.write(b"\0" * 40)
+            task, expected = self.scan_again(root, previous.tree)
+        tree = task.tree
+        self.assertIs(tree, previous.tree)
+        self.assertEqual(tree.size, expected.size)
+        self.assertEqual(tree.size, 75)
+        self.assertEqual(sorted(folder.name for folder in tree.folders), ["a", "b"])
+        self.assertIs(folders["b"].folders[0], deep)
+        self.assertEqual(folders["b"].size, 60)
+        self.assertEqual(sorted(file.name for file in folders["a"].files), ["new.bin", "one.bin"])
+        self.assertEqual((task.reused_folders, task.reread_folders), (1, 4))
+        self.assertEqual(task.count, 8)
+
+    def test_rescan_of_unchanged_tree_reuses_every_folder(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.make_rescan_tree(root)
+            with patch('owners.get_owner_id', return_value=0):
+                previous = CalculatingMemoryUsage(root, lazy_metadata=True)
+                previous.run()
+            first, _ = self.scan_again(root, previous.tree)
+            with patch('os.scandir', side_effect=AssertionError("folder listed")):
+                second = CalculatingMemoryUsage(root, previous=previous.tree, largest_count=2)
+                second.run()
+        self.assertEqual((first.reused_folders, first.reread_folders), (1, 4))
+        self.assertEqual((second.reused_folders, second.reread_folders), (5, 0))
+        self.assertEqual(second.tree.size, 60)
+        self.assertEqual([file.size for file in second.largest.get_files()], [30, 20])
+
+    def test_rescan_rereads_incomplete_folders(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.make_rescan_tree(root)
+            with patch('owners.get_owner_id', return_value=0):
+                previous = CalculatingMemoryUsage(root)
+                previous.run()
+            folder = next(folder for folder in previous.tree.folders if folder.name == "c")
+            folder.files = None
+            folder.add_size(-30)
+            folder.mark_incomplete()
+            task, expected = self.scan_again(root, previous.tree)
+        self.assertEqual(task.tree.size, expected.size)
+        self.assertFalse(task.tree.incomplete)
+        self.assertEqual((task.reused_folders, task.reread_folders), (3, 2))
+
+    def test_unreadable_folders_are_marked_incomplete(self):
+        def deny_c(path):
+            if os.path.basename(path) == "c":
+                raise PermissionError(13, "Permission denied", path)
+            return real_scandir(path)
+
+        with tempfile.TemporaryDirectory() as root:
+            self.make_rescan_tree(root)
+            with patch('owners.get_owner_id', return_value=0):
+                previous = CalculatingMemoryUsage(root)
+                previous.run()
+                for kwargs in ({}, {"workers": 3}, {"previous": previous.tree}):
+                    with self.subTest(**kwargs), patch('os.scandir', deny_c):
+                        if "previous" in kwargs:
+                            os.utime(os.path.join(root, "c"), (1, 1))
+                        tree = CalculatingMemoryUsage(root, **kwargs).run()
+                        folder = next(folder for folder in tree.folders if folder.name == "c")
+                        self.assertTrue(folder.incomplete)
+                        self.assertTrue(tree.incomplete)
+                        self.assertEqual([subfolder.name for subfolder in tree.folders if subfolder.incomplete], ["c"])
+
+    def test_find_folder(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.make_rescan_tree(root)
+            with patch('owners.get_owner_id', return_value=0):
+                task = CalculatingMemoryUsage(root)
+                task.run()
+        tree = task.tree
+        self.assertIs(tree.find_folder(root), tree)
+        self.assertEqual(tree.find_folder(os.path.join(root, "b", "deep")).location, os.path.join(root, "b", "deep"))
+        self.assertIsNone(tree.find_folder(os.path.join(root, "missing")))
+        self.assertIsNone(tree.find_folder(os.path.dirname(root)))
+
+    def test_update_folders_applies_changes_in_place(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.make_rescan_tree(root)
+            with patch('owners.get_owner_id', return_value=0):
+                previous = CalculatingMemoryUsage(root)
+                previous.run()
+            tree = previous.tree
+            with open(os.path.join(root, "a", "one.bin"), "ab") as file:
+                file.write(b"\0" * 5)
+            os.rename(os.path.join(root, "b", "deep"), os.path.join(root, "c", "moved"))
+            os.makedirs(os.path.join(root, "c", "new", "inner"))
+            with open(os.path.join(root, "c", "new", "inner", "four.bin"), "wb") as file:
+                file.write(b"\0" * 40)
+            changed = [os.path.join(root, folder) for folder in ("a", "b", "c")]
+            with patch('owners.get_owner_id', return_value=0):
+                task = CalculatingMemoryUsage(root, aggregate=True)
+                task.update_folders(tree, changed)
+                expected = CalculatingMemoryUsage(root)
+                expected.run()
+        self.assertEqual(tree.size, expected.tree.size)
+        self.assertEqual(tree.size, 105)
+        folders = {folder.name: folder for folder in tree.folders}
+        self.assertFalse(folders["b"].folders)
+        self.assertEqual(folders["b"].size, 0)
+        self.assertEqual(sorted(folder.name for folder in folders["c"].folders), ["moved", "new"])
+        self.assertEqual(folders["c"].size, 90)
+        self.assertEqual(tree.aggregates.extensions[".bin"], (105, 4))
+        self.assertEqual(task.reread_folders, 6)
+
+    def test_deferred_update_changes_tree_only_when_applied(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.make_rescan_tree(root)
+            with patch('owners.get_owner_id', return_value=0):
+                previous = CalculatingMemoryUsage(root)
+                previous.run()
+            tree = previous.tree
+            shutil.rmtree(os.path.join(root, "b"))
+            os.makedirs(os.path.join(root, "c", "new"))
+            with open(os.path.join(root, "c", "new", "four.bin"), "wb") as file:
+                file.write(b"\0" * 40)
+            with patch('owners.get_owner_id', return_value=0):
+                task = CalculatingMemoryUsage(root, deferred=True)
+                task.update_folders(tree, [root, os.path.join(root, "c")])
+            self.assertEqual(tree.size, 60)
+            self.assertEqual(sorted(folder.name for folder in tree.folders), ["a", "b", "c"])
+            task.apply_staged()
+        self.assertEqual(tree.size, 80)
+        folders = {folder.name: folder for folder in tree.folders}
+        self.assertEqual(sorted(folders), ["a", "c"])
+        self.assertEqual(sorted(folder.name for folder in folders["c"].folders), ["new"])
+        self.assertEqual(folders["c"].size, 70)
+
+    def make_linked_tree(self, root):
+        for folder in ("a", "b"):
+            os.makedirs(os.path.join(root, folder))
+        with open(os.path.join(root, "a", "data.bin"), "wb") as file:
+            file.write(b"\1" * 10000)
+        os.link(os.path.join(root, "a", "data.bin"), os.path.join(root, "b", "link.bin"))
+        os.link(os.path.join(root, "a", "data.bin"), os.path.join(root, "link.bin"))
+
+    @unittest.skipIf(os.name == "nt", "directory listings do not report hard links on Windows")
+    def test_hard_links_are_counted_once(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.make_linked_tree(root)
+            allocated = inodes.get_allocated_size(os.stat(os.path.join(root, "link.bin")))
+            for workers in (1, 4):
+                with self.subTest(workers=workers), patch('owners.get_owner_id', return_value=0):
+                    tree = CalculatingMemoryUsage(root, workers).run()
+                    self.assertEqual(tree.size, 10000)
+                    files = [tree.files[0], tree.folders[0].files[0], tree.folders[1].files[0]]
+                    self.assertEqual(len({file.inode for file in files}), 1)
+                    self.assertEqual(sorted(file.size for file in files), [0, 0, 10000])
+            with patch('owners.get_owner_id', return_value=0):
+                on_disk = CalculatingMemoryUsage(root, on_disk=True).run()
+        self.assertEqual(on_disk.size, allocated)
+
+    @unittest.skipIf(os.name == "nt", "creating symbolic links needs extra privileges on Windows")
+    def test_symbolic_links_are_not_followed(self):
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, "a"))
+            with open(os.path.join(root, "a", "data.bin"), "wb") as file:
+                file.write(b"\0" * 10000)
+            os.symlink(os.path.join(root, "a", "data.bin"), os.path.join(root, "a", "data_link"))
+            os.symlink(root, os.path.join(root, "a", "loop"))
+            link_sizes = sum(os.lstat(os.path.join(root, "a", name)).st_size for name in ("data_link", "loop"))
+            for kwargs in ({}, {"workers": 3}, {"processes": 2}, {"lazy_metadata": True}):
+                with self.subTest(**kwargs), patch('owners.get_owner_id', return_value=0):
+                    task = CalculatingMemoryUsage(root, **kwargs)
+                    tree = task.run()
+                    self.assertEqual(tree.size, 10000 + link_sizes)
+                    self.assertEqual([folder.name for folder in tree.folders], ["a"])
+                    self.assertFalse(tree.folders[0].folders)
+                    self.assertEqual(sorted(file.name for file in tree.folders[0].files),
+                                     ["data.bin", "data_link", "loop"])
+                    rescanned = CalculatingMemoryUsage(root, previous=task.tree)
+                    rescanned.previous.folders[0].incomplete = True
+                    self.assertEqual(rescanned.run().size, 10000 + link_sizes)
+
+    def test_switch_sizes_recomputes_folder_sizes(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.make_rescan_tree(root)
+            with patch('owners.get_owner_id', return_value=0):
+                apparent = CalculatingMemoryUsage(root, aggregate=True).run()
+                on_disk = CalculatingMemoryUsage(root, on_disk=True).run()
+        disk_usage.switch_sizes(apparent)
+        self.assertEqual(apparent.size, on_disk.size)
+        self.assertEqual(apparent.aggregates.extensions[".bin"][0], on_disk.size)
+        disk_usage.switch_sizes(apparent)
+        self.assertEqual(apparent.size, 60)
+
+    @unittest.skipIf(os.name == "nt", "directory listings do not report hard links on Windows")
+    @unittest.skipIf(os.name == "nt", "directory listings do not report hard links on Windows")
+    def test_removed_hard_link_moves_size_to_remaining_link(self):
+        for incremental in (False, True):
+            with self.subTest(incremental=incremental), tempfile.TemporaryDirectory() as root:
+                self.make_linked_tree(root)
+                os.remove(os.path.join(root, "link.bin"))
+                old = time.time() - 1000
+                for folder in ("a", "b", ""):
+                    os.utime(os.path.join(root, folder), (old, old))
+                with patch('owners.get_owner_id', return_value=0):
+                    tree = CalculatingMemoryUsage(root).run()
+                    counted = next(file for file in iterate_files(tree) if file.size)
+                    os.remove(counted.location)
+                    task = CalculatingMemoryUsage(root)
+                    if incremental:
+                        task.rescan_tree(tree)
+                    else:
+                        task.update_folders(tree, [os.path.dirname(counted.location)])
+                self.assertEqual(tree.size, 10000)
+                self.assertEqual([file.size for file in iterate_files(tree)], [10000])
+                self.assertEqual(len(task.sizes.inodes), 1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import duplicates
+from disk_usage import CalculatingMemoryUsage
+from duplicates import DuplicateFinder, HashCache
+
+
+class TestDuplicates(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = self.directory.name
+        big = os.urandom(20000)
+        different = big[:10000] + bytes(b ^ 1 for b in big[10000:10001]) + big[10001:]
+        for path, data in (("a/big.bin", big), ("b/big copy.bin", big), ("c/almost.bin", different),
+                           ("a/small.txt", b"small"), ("c/small.txt", b"small"), ("a/empty", b""),
+                           ("b/empty", b""), ("c/unique.bin", os.urandom(20000 - 1))):
+            Path(self.root, path).parent.mkdir(parents=True, exist_ok=True)
+            Path(self.root, path).write_bytes(data)
+        os.link(Path(self.root, "a", "big.bin"), Path(self.root, "c", "big link.bin"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def scan(self):
+        with patch('owners.get_owner_id', return_value=0):
+            return CalculatingMemoryUsage(self.root).run()
+
+    def get_names(self, groups):
+        return [sorted(file.name for file in group.files) for group in groups]
+
+    def test_hashes(self):
+        path = os.path.join(self.root, "a", "big.bin")
+        almost = os.path.join(self.root, "c", "almost.bin")
+        self.assertEqual(duplicates.hash_partial(path, 20000), duplicates.hash_partial(almost, 20000))
+        self.assertNotEqual(duplicates.hash_full(path), duplicates.hash_full(almost))
+        with patch('duplicates.CHUNK_SIZE', 7):
+            self.assertEqual(duplicates.hash_full(path), duplicates.hash_full(os.path.join(self.root, "b", "big copy.bin")))
+
+    def test_finds_duplicates_in_stages(self):
+        finder = DuplicateFinder(self.scan(), workers=4)
+        groups = finder.run()
+        self.assertEqual(len(self.get_names(groups)), 2)
+        self.assertEqual(len(groups[0].files), 2)
+        self.assertIn("big copy.bin", self.get_names(groups)[0])
+        self.assertEqual(self.get_names(groups)[1], ["small.txt", "small.txt"])
+        self.assertEqual([group.size for group in groups], [20000, 5])
+        self.assertEqual(finder.candidates, 5)
+        self.assertEqual(finder.partial_hashes, 5)
+        self.assertEqual(finder.full_hashes, 3)
+
+    def test_hash_cache_is_persisted_and_keyed_by_mtime(self):
+        cache_path = os.path.join(self.root, "hashes.json")
+        tree = self.scan()
+        DuplicateFinder(tree, cache_path=cache_path).run()
+        cached = DuplicateFinder(tree, cache_path=cache_path)
+        self.assertEqual(len(cached.run()), 2)
+        self.assertEqual((cached.partial_hashes, cached.full_hashes), (0, 0))
+        os.utime(os.path.join(self.root, "c", "almost.bin"), ns=(0, 0))
+        changed = DuplicateFinder(tree, HashCache.load(cache_path))
+        changed.run()
+        self.assertEqual((changed.partial_hashes, changed.full_hashes), (1, 1))
+
+    def test_broken_cache_is_ignored(self):
+        cache_path = os.path.join(self.root, "hashes.json")
+        Path(cache_path).write_text("{broken")
+        self.assertEqual(HashCache.load(cache_path).entries, {})
+
+    def test_groups_inside_folder(self):
+        tree = self.scan()
+        groups = DuplicateFinder(tree).run()
+        folder = next(folder for folder in tree.folders if folder.name == "c")
+        self.assertIs(duplicates.get_groups_inside(groups, tree), groups)
+        self.assertEqual(duplicates.get_groups_inside(groups, folder), [])
+
+    def test_refreshed_groups_follow_updated_folders(self):
+        tree = self.scan()
+        groups = DuplicateFinder(tree).run()
+        Path(self.root, "a", "small.txt").unlink()
+        Path(self.root, "b", "new.bin").write_bytes(b"new")
+        with patch('owners.get_owner_id', return_value=0):
+            CalculatingMemoryUsage(self.root).update_folders(tree, [os.path.join(self.root, "a"),
+                                                                    os.path.join(self.root, "b")])
+        refreshed = duplicates.refresh_groups(groups)
+        self.assertEqual(self.get_names(groups)[1], ["small.txt", "small.txt"])
+        self.assertEqual(self.get_names(refreshed), self.get_names(groups)[:1])
+        self.assertTrue(all(file in file.parent.files for file in refreshed[0].files))
+
+    def test_stopped_finder_returns_nothing(self):
+        finder = DuplicateFinder(self.scan())
+        finder.stop()
+        self.assertEqual(finder.run(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
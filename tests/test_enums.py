@@ -1,6 +1,6 @@
 import unittest
 
-from enums import Filters, Grouping, Sorting, Styles, TreeWidgetColumns
+from enums import ChartContent, Filters, Grouping, SizeMode, Sorting, Styles, TreeWidgetColumns
 
 
 class TestEnums(unittest.TestCase):
@@ -29,6 +29,16 @@ class TestEnums(unittest.TestCase):
         self.assertIsInstance(Filters.NO_FILTER, str)
         self.assertIsInstance(Filters.FOLDERS, str)
 
+    def test_chart_content(self):
+        self.assertIsInstance(ChartContent.CHILDREN, str)
+        self.assertIsInstance(ChartContent.LARGEST_FILES, str)
+        self.assertIsInstance(ChartContent.LARGEST_FOLDERS, str)
+        self.assertIsInstance(ChartContent.DUPLICATES, str)
+
+    def test_size_mode(self):
+        self.assertIsInstance(SizeMode.APPARENT, str)
+        self.assertIsInstance(SizeMode.ON_DISK, str)
+
     def test_tree_widget_columns(self):
         self.assertIsInstance(TreeWidgetColumns.FILE_OR_FOLDER_NAME, int)
         self.assertIsInstance(TreeWidgetColumns.SIZE, int)
@@ -0,0 +1,63 @@
+import math
+import unittest
+
+import grouping
+
+
+class TestGrouping(unittest.TestCase):
+
+    def test_group_by_ranges(self):
+        ranges = [("big", 100, math.inf), ("small", 1, 99), ("empty", 0, 0)]
+        groups = grouping.group_by_ranges([5, 0, 500, 99, 100, 1], ranges, lambda item: item, lambda item: False)
+        self.assertEqual(groups, [("big", [500, 100]), ("small", [5, 99, 1]), ("empty", [0])])
+
+    def test_group_by_ranges_with_gaps_and_other(self):
+        ranges = [("A-H", "a", "h"), ("Q-Z", "q", "z")]
+        names = ["alpha", "kilo", "zulu", "_init", "Hotel"]
+        groups = grouping.group_by_ranges(
+            names, ranges, lambda name: name[0].lower(), lambda name: not name[0].isalpha()
+        )
+        self.assertEqual(groups, [("A-H", ["alpha", "Hotel"]), ("Q-Z", ["zulu"]), ("other", ["_init"])])
+
+    def test_group_by_ranges_calls_key_once_per_item(self):
+        calls = []
+        ranges = [("low", 0, 9), ("high", 10, 19)]
+        grouping.group_by_ranges(range(20), ranges, lambda item: calls.append(item) or item, lambda item: False)
+        self.assertEqual(calls, list(range(20)))
+
+    def test_group_by_ranges_skips_missing_keys(self):
+        groups = grouping.group_by_ranges([None, 3], [("any", 0, 10)], lambda item: item, lambda item: item is None)
+        self.assertEqual(groups, [("any", [3]), ("other", [None])])
+
+    def test_group_by_values(self):
+        files = [("a", ".txt"), ("b", ""), ("c", ".py"), ("d", ".txt")]
+        groups = grouping.group_by_values(files, lambda file: file[1], lambda file: not file[1])
+        self.assertEqual(groups, [(".py", [("c", ".py")]), (".txt", [("a", ".txt"), ("d", ".txt")]),
+                                  ("other", [("b", "")])])
+
+    def test_group_by_values_of_nothing(self):
+        self.assertEqual(grouping.group_by_values([], lambda item: item, lambda item: True), [])
+
+    def test_layout_cache_evicts_least_recently_used(self):
+        cache = grouping.LayoutCache(2)
+        cache.put("a", [1])
+        cache.put("b", [2])
+        self.assertEqual(cache.get("a"), [1])
+        cache.put("c", [3])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), [3])
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_layout_cache_pop_and_clear(self):
+        cache = grouping.LayoutCache(4)
+        cache.put("a", [1])
+        self.assertEqual(cache.pop("a"), [1])
+        self.assertIsNone(cache.pop("a"))
+        cache.put("b", [2])
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import inodes
+from inodes import InodeSet, SizeAccounting
+
+
+def make_stat(size: int, blocks: int = None, links: int = 1, device: int = 1, inode: int = 1):
+    stat_result = SimpleNamespace(st_size=size, st_nlink=links, st_dev=device, st_ino=inode)
+    if blocks is not None:
+        stat_result.st_blocks = blocks
+    return stat_result
+
+
+class TestInodes(unittest.TestCase):
+
+    def test_inode_set_adds_each_inode_once(self):
+        inode_set = InodeSet(merge_size=4)
+        self.assertTrue(all(inode_set.add(device, inode) for device in (1, 2) for inode in range(10, 0, -1)))
+        self.assertFalse(any(inode_set.add(device, inode) for device in (1, 2) for inode in range(1, 11)))
+        self.assertEqual(len(inode_set), 20)
+        self.assertIn((2, 7), inode_set)
+        self.assertNotIn((3, 7), inode_set)
+        self.assertTrue(all(list(run) == sorted(run) for run in inode_set.devices[1][0]))
+
+    def test_inode_set_discards_merged_and_pending_inodes(self):
+        inode_set = InodeSet(merge_size=4)
+        for inode in range(6):
+            inode_set.add(1, inode)
+        inode_set.discard(1, 0)
+        inode_set.discard(1, 5)
+        inode_set.discard(2, 1)
+        self.assertEqual(len(inode_set), 4)
+        self.assertNotIn((1, 0), inode_set)
+        self.assertNotIn((1, 5), inode_set)
+        self.assertTrue(inode_set.add(1, 0))
+
+    def test_inode_set_keeps_oversized_inodes(self):
+        inode_set = InodeSet(merge_size=1)
+        self.assertTrue(inode_set.add(1, inodes.MAX_INODE + 1))
+        self.assertFalse(inode_set.add(1, inodes.MAX_INODE + 1))
+        self.assertIn((1, inodes.MAX_INODE + 1), inode_set)
+
+    def test_allocated_size(self):
+        self.assertEqual(inodes.get_allocated_size(make_stat(100, 8)), 4096)
+        self.assertEqual(inodes.get_allocated_size(make_stat(100)), 100)
+
+    def test_hard_links_are_counted_once(self):
+        sizes = SizeAccounting()
+        self.assertEqual(sizes.measure(make_stat(100, 8, links=2, inode=5)), (100, 4096, (1, 5)))
+        self.assertEqual(sizes.measure(make_stat(100, 8, links=2, inode=5)), (0, 0, (1, 5)))
+        self.assertEqual(sizes.measure(make_stat(100, 8, links=2, device=2, inode=5)), (100, 4096, (2, 5)))
+        self.assertEqual(sizes.measure(make_stat(100, 8, inode=5)), (100, 4096, None))
+        self.assertEqual(SizeAccounting(on_disk=True).measure(make_stat(100, 8)), (4096, 100, None))
+
+    @unittest.skipUnless(hasattr(os.stat_result, "st_blocks"), "no allocated blocks on this platform")
+    def test_sparse_file_takes_less_space_on_disk(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, "sparse.bin")
+            with open(path, "wb") as file:
+                file.truncate(64 * 1024 * 1024)
+            size, other_size, _ = SizeAccounting(on_disk=True).measure(os.stat(path))
+        self.assertEqual(other_size, 64 * 1024 * 1024)
+        self.assertLess(size, other_size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from disk_usage import CalculatingMemoryUsage, File
+from largest import LargestIndex
+
+
+class TestLargest(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = File.from_values(None, "root", 0, 0, 0, "", None)
+        for i in range(4):
+            folder = File.from_values(self.tree, f"folder{i}", 0, 0, 0, "", None)
+            self.tree.add_folder(folder)
+            for j in range(5):
+                folder.add_file(File.from_values(folder, f"file{i}_{j}", i * 10 + j, 0, 0, "", None))
+                folder.size += i * 10 + j
+            self.tree.size += folder.size
+
+    def get_names(self, nodes) -> list[str]:
+        return [node.name for node in nodes]
+
+    def test_index_keeps_only_largest_nodes(self):
+        index = LargestIndex.from_tree(self.tree, 3)
+        self.assertEqual(len(index.files), 3)
+        self.assertEqual(self.get_names(index.get_files()), ["file3_4", "file3_3", "file3_2"])
+        self.assertEqual(self.get_names(index.get_folders(count=2)), ["folder3", "folder2"])
+
+    def test_subtree_query_uses_index_when_it_holds_enough_nodes(self):
+        index = LargestIndex.from_tree(self.tree, 3)
+        folder = self.tree.folders[3]
+        with patch('largest.iterate_files', side_effect=AssertionError("subtree walk")):
+            self.assertEqual(self.get_names(index.get_files(folder, 2)), ["file3_4", "file3_3"])
+
+    def test_subtree_query_walks_subtree_outside_index(self):
+        index = LargestIndex.from_tree(self.tree, 3)
+        self.assertEqual(self.get_names(index.get_files(self.tree.folders[1], 2)), ["file1_4", "file1_3"])
+        self.assertEqual(len(index.get_files(self.tree, 10)), 10)
+        self.assertEqual(self.get_names(index.get_folders(self.tree.folders[0])), [])
+
+    def test_scan_maintains_index(self):
+        with tempfile.TemporaryDirectory() as root:
+            for i in range(3):
+                for j in range(3):
+                    folder = os.path.join(root, f"dir{i}", f"sub{j}")
+                    os.makedirs(folder)
+                    with open(os.path.join(folder, "data.bin"), "wb") as file:
+                        file.write(b"\0" * (i * 10 + j + 1))
+            expected = None
+            for kwargs in ({}, {"workers": 3}, {"processes": 2}):
+                with patch('owners.get_owner_id', return_value=0):
+                    task = CalculatingMemoryUsage(root, largest_count=4, **kwargs)
+                    task.run()
+                self.assertIs(task.largest.root, task.tree)
+                sizes = ([file.size for file in task.largest.get_files()],
+                         [(folder.name, folder.size) for folder in task.largest.get_folders()])
+                self.assertEqual(sizes[0], [23, 22, 21, 13])
+                self.assertEqual(sizes[1][0], ("dir2", 66))
+                expected = expected or sizes
+                self.assertEqual(sizes, expected)
+
+    def test_scan_without_index(self):
+        self.assertIsNone(CalculatingMemoryUsage(".").largest)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import tempfile
 import unittest
 from pathlib import Path
 from unittest.mock import MagicMock, patch
@@ -6,9 +7,14 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QApplication
 
 import main
+import snapshot
+from duplicates import DuplicateGroup
 from disk_usage import File
-from enums import Filters, Grouping, TreeWidgetColumns
-from main import MainWindow, QFileItem
+from enums import ChartContent, Filters, Grouping, SizeMode, TreeWidgetColumns
+from main import MainWindow
+from progress import Progress
+from tests.trees import make_tree
+from tree_model import FILE_ROLE, Group
 
 
 class TestMainWindow(unittest.TestCase):
@@ -18,10 +24,13 @@ class TestMainWindow(unittest.TestCase):
         cls.app = QApplication([])
 
     def setUp(self):
+        watch_patch = patch('main.WATCH_CHANGES', False)
+        watch_patch.start()
+        self.addCleanup(watch_patch.stop)
         self.main_window = MainWindow()
 
     def test_init(self):
-        self.assertIsNotNone(self.main_window.filesTreeWidget)
+        self.assertIsNotNone(self.main_window.filesTreeView)
         self.assertIsNotNone(self.main_window.chart)
         self.assertEqual(self.main_window.sorting_order, Qt.SortOrder.DescendingOrder)
         self.assertEqual(self.main_window.sorting_by, TreeWidgetColumns.FILE_OR_FOLDER_NAME)
@@ -32,15 +41,15 @@ class TestMainWindow(unittest.TestCase):
         self.assertTrue(self.main_window.filterComboBox.currentTextChanged.connect)
         self.assertTrue(self.main_window.sortingComboBox.currentTextChanged.connect)
         self.assertTrue(self.main_window.startButton.clicked.connect)
-        self.assertTrue(self.main_window.filesTreeWidget.itemClicked.connect)
+        self.assertTrue(self.main_window.filesTreeView.clicked.connect)
         self.assertTrue(self.main_window.customPathEdit.textChanged.connect)
         self.assertTrue(self.main_window.descendingRadioButton.toggled.connect)
 
     def test_resize_tree_sections(self):
         self.main_window.resize_tree_sections()
-        self.assertEqual(self.main_window.filesTreeWidget.header().sectionSize(0), 300)
-        self.assertEqual(self.main_window.filesTreeWidget.header().sectionSize(1), 50)
-        self.assertEqual(self.main_window.filesTreeWidget.header().sectionSize(4), 100)
+        self.assertEqual(self.main_window.filesTreeView.header().sectionSize(0), 300)
+        self.assertEqual(self.main_window.filesTreeView.header().sectionSize(1), 50)
+        self.assertEqual(self.main_window.filesTreeView.header().sectionSize(4), 100)
 
     def test_add_disk_buttons(self):
         layout = self.main_window.disksLayout
@@ -62,10 +71,11 @@ class TestMainWindow(unittest.TestCase):
             self.assertEqual(self.main_window.sorting_by, TreeWidgetColumns.SIZE)
 
     def test_sort_items(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.current_selected_folder = item
+        self.main_window.display_tree_on_preparing_files_finished(make_tree(3, 0), 3)
+        self.main_window.sorting_by = TreeWidgetColumns.SIZE
+        self.main_window.sorting_order = Qt.SortOrder.AscendingOrder
         self.main_window.sort_items()
+        self.assertEqual(self.get_child_names(self.get_root()), ["file0.txt", "file1.txt", "file2.txt"])
 
     def test_on_order_radiobutton_toggled(self):
         with patch('main.MainWindow.sort_items'):
@@ -79,49 +89,91 @@ class TestMainWindow(unittest.TestCase):
             self.assertEqual(self.main_window.descendingRadioButton.isChecked(), False)
 
     def test_on_filter_settings_changed(self):
-        with patch('main.MainWindow.filter_file_items'):
+        with patch('main.MainWindow.arrange_current_folder'):
             self.main_window.on_filter_settings_changed(Filters.FOLDERS)
             self.assertEqual(self.main_window.filter_settings, "")
             self.main_window.on_filter_settings_changed('.exe')
             self.assertEqual(self.main_window.filter_settings, '.exe')
 
-    def test_filter_file_items(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.current_selected_folder = item
-        self.main_window.filter_settings = Filters.FOLDERS
-        self.main_window.filter_file_items()
+    def test_filter_folder(self):
+        self.main_window.display_tree_on_preparing_files_finished(make_tree(2, 2), 4)
+        self.main_window.on_filter_settings_changed(Filters.FOLDERS)
+        self.assertEqual(self.get_child_names(self.get_root()), ["folder1", "folder0"])
+        self.main_window.on_filter_settings_changed(Filters.NO_FILTER)
+        self.assertEqual(self.get_root().model().rowCount(self.get_root()), 4)
 
     def test_set_groups(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.current_selected_folder = item
+        tree = make_tree(2, 1)
+        self.main_window.display_tree_on_preparing_files_finished(tree, 3)
         self.main_window.set_groups(Grouping.NAME)
+        root = self.get_root()
+        self.assertEqual(self.get_child_names(root), ["A-H"])
+        group = root.model().index(0, 0, root)
+        self.assertIsInstance(group.data(FILE_ROLE), Group)
+        self.assertEqual(self.get_child_names(group), ["folder0", "file1.txt", "file0.txt"])
+        self.assertEqual(len(tree.files), 2)
+        self.main_window.set_groups(Grouping.NO_GROUPING)
+        self.assertEqual(self.get_child_names(root), ["folder0", "file1.txt", "file0.txt"])
+
+    def test_recent_layouts_are_reused(self):
+        tree = make_tree(2, 2)
+        self.main_window.display_tree_on_preparing_files_finished(tree, 4)
+        cache = self.main_window.layout_cache
+        self.main_window.set_groups(Grouping.EXTENSION)
+        group = self.get_root().model().index(0, 0, self.get_root()).data(FILE_ROLE)
+        self.main_window.set_groups(Grouping.SIZE)
+        misses = cache.misses
+        with patch('main.grouping.group_by_values') as group_by_values:
+            self.main_window.set_groups(Grouping.EXTENSION)
+            group_by_values.assert_not_called()
+        self.assertEqual(cache.misses, misses)
+        self.assertEqual(cache.hits, 1)
+        self.assertIs(self.get_root().model().index(0, 0, self.get_root()).data(FILE_ROLE), group)
+        self.main_window.on_file_selected(tree.folders[0])
+        self.main_window.on_file_selected(tree)
+        self.assertEqual(cache.hits, 2)
+
+    def test_sorting_keeps_cached_layout_in_sync(self):
+        tree = make_tree(3, 0)
+        self.main_window.display_tree_on_preparing_files_finished(tree, 3)
+        self.main_window.set_groups(Grouping.EXTENSION)
+        self.main_window.sorting_order = Qt.SortOrder.AscendingOrder
+        self.main_window.sort_items()
+        self.main_window.set_groups(Grouping.NO_GROUPING)
+        self.main_window.set_groups(Grouping.EXTENSION)
+        self.assertEqual(self.main_window.layout_cache.hits, 1)
+        group = self.get_root().model().index(0, 0, self.get_root())
+        self.assertEqual(self.get_child_names(group), ["file0.txt", "file1.txt", "file2.txt"])
+
+    def test_grouping_is_dropped_when_another_folder_is_selected(self):
+        tree = make_tree(1, 2)
+        self.main_window.display_tree_on_preparing_files_finished(tree, 3)
+        self.main_window.set_groups(Grouping.EXTENSION)
+        self.main_window.on_file_selected(tree.folders[0])
+        self.assertEqual(self.get_child_names(self.get_root()), ["folder1", "folder0", "file0.txt"])
+        self.assertIs(self.main_window.current_selected_folder, tree.folders[0])
 
     def test_group_by_specific_data(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.current_selected_folder = item
-        self.main_window.group_by_specific_data(lambda x: x.file.extension, lambda x: not x.file.extension)
+        tree = make_tree(2, 1)
+        self.main_window.current_selected_folder = tree
+        groups = self.main_window.group_by_specific_data(
+            [*tree.folders, *tree.files], lambda x: x.extension, lambda x: not x.extension
+        )
+        self.assertEqual([(group.name, len(group.files)) for group in groups], [(".txt", 2), ("other", 1)])
 
     def test_get_specific_file_date(self):
         path = Path(__file__).parent / "test.txt"
         file = File(str(path))
-        item = QFileItem(file)
-        self.assertEqual(self.main_window.get_specific_file_date(item, "creation date"), file.creation_date.date())
-        self.assertEqual(self.main_window.get_specific_file_date(item, "change date"), file.change_date.date())
+        self.assertEqual(self.main_window.get_specific_file_date(file, "creation date"), file.creation_date.date())
+        self.assertEqual(self.main_window.get_specific_file_date(file, "change date"), file.change_date.date())
+        self.assertIsNone(self.main_window.get_specific_file_date(File("missing.txt"), "change date"))
 
     def test_group_by(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.current_selected_folder = item
-        self.main_window.group_by([("test", 0, 1)], lambda x: x.file.size, lambda x: False)
-
-    def test_ungroup(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.current_selected_folder = item
-        self.main_window.ungroup()
+        tree = make_tree(3, 0)
+        self.main_window.current_selected_folder = tree
+        groups = self.main_window.group_by(tree.files, [("test", 0, 1)], lambda x: x.size, lambda x: False)
+        self.assertEqual([file.name for file in groups[0].files], ["file0.txt", "file1.txt"])
+        self.assertEqual(groups[0].size, 1)
 
     def test_set_directory(self):
         disk_button = MagicMock()
@@ -129,71 +181,268 @@ class TestMainWindow(unittest.TestCase):
         self.main_window.set_directory(disk_button)
         self.assertEqual(self.main_window.processed_disk, "C:\\")
 
-    def test_calculate_files_count(self):
-        with patch('main.disk_usage.CalculatingFilesCount') as mock_task:
-            self.main_window.calculate_files_count()
-            mock_task.assert_called_once()
-
-    def test_on_preparing(self):
-        self.main_window.on_preparing(10)
-        self.assertEqual(self.main_window.progressBar.format(), "10 files found...")
-
-    def test_start_preparing_files_on_calculating_files_count_finished(self):
-        with patch('main.disk_usage.CalculatingMemoryUsage') as mock_task:
-            self.main_window.start_preparing_files_on_calculating_files_count_finished(10)
-            mock_task.assert_called_once()
-
-    def test_update_files_size_on_preparing_files_finished(self):
-        with patch('main.disk_usage.UpdatingFoldersSize') as mock_task:
-            self.main_window.update_files_size_on_preparing_files_finished(File("test.txt"), 10)
-            mock_task.assert_called_once()
-
-    def test_build_widget_on_size_updating_finished(self):
-        with patch('main.BuildingTreeWidget') as mock_task:
-            self.main_window.build_widget_on_size_updating_finished(File("test.txt"), 10)
+    def test_start_preparing_files(self):
+        with tempfile.TemporaryDirectory() as snapshots, \
+                patch('main.SNAPSHOT_DIR', Path(snapshots)), \
+                patch('main.ScanThread') as mock_task:
+            self.main_window.start_preparing_files()
             mock_task.assert_called_once()
+            self.assertTrue(mock_task.call_args.kwargs["snapshot_path"].startswith(snapshots))
+            self.assertEqual(self.main_window.current_processing_phrase, "folders scanned")
+
+    def test_open_last_scan(self):
+        with tempfile.TemporaryDirectory() as snapshots, patch('main.SNAPSHOT_DIR', Path(snapshots)):
+            self.main_window.customPathEdit.setText(snapshots)
+            self.assertFalse(self.main_window.openSnapshotButton.isEnabled())
+            snapshot.save(File(snapshots), str(MainWindow.get_snapshot_path(snapshots)))
+            self.main_window.on_text_changed()
+            self.assertTrue(self.main_window.openSnapshotButton.isEnabled())
+            self.main_window.openSnapshotButton.click()
+        self.assertEqual(self.main_window.currentIndex(), 2)
+        self.assertEqual(self.get_root().data(FILE_ROLE).location, snapshots)
+
+    def test_scan_continues_from_last_scan(self):
+        with tempfile.TemporaryDirectory() as snapshots, \
+                patch('main.SNAPSHOT_DIR', Path(snapshots)), \
+                patch('main.ScanThread') as mock_task:
+            snapshot.save(File(snapshots), str(MainWindow.get_snapshot_path(snapshots)))
+            self.main_window.customPathEdit.setText(snapshots)
+            self.assertTrue(self.main_window.incrementalCheckBox.isEnabled())
+            self.assertFalse(self.main_window.incrementalCheckBox.isChecked())
+            self.main_window.start_preparing_files()
+            self.assertIsNone(mock_task.call_args.kwargs["previous"])
+            self.main_window.incrementalCheckBox.setChecked(True)
+            self.main_window.start_preparing_files()
+            previous = mock_task.call_args.kwargs["previous"]
+        self.assertEqual(previous.location, snapshots)
+        self.assertEqual(self.main_window.current_processing_phrase, "folders checked")
+        scan = self.main_window.processing_files_task.scan
+        scan.tree = previous
+        scan.reused_folders, scan.reread_folders = 3, 1
+        scan.snapshot_error = None
+        self.main_window.display_tree_on_preparing_files_finished(previous, 0)
+        self.assertEqual(self.main_window.windowTitle(), "Disk Usage (3 folders reused, 1 re-read)")
+        scan.snapshot_error = PermissionError(13, "Permission denied")
+        self.main_window.on_scan_saved(self.main_window.processing_files_task)
+        self.assertEqual(self.main_window.windowTitle(),
+                         "Disk Usage (3 folders reused, 1 re-read; scan not saved: Permission denied)")
+
+    def test_open_broken_scan(self):
+        with tempfile.TemporaryDirectory() as snapshots, patch('main.SNAPSHOT_DIR', Path(snapshots)):
+            self.main_window.customPathEdit.setText(snapshots)
+            MainWindow.get_snapshot_path(snapshots).write_bytes(b"broken")
+            self.main_window.on_open_snapshot_button_pressed()
+        self.assertEqual(self.main_window.errorLabel.text(), "The last scan can't be opened!")
+        self.assertNotEqual(self.main_window.currentIndex(), 2)
+
+    def test_display_tree_on_preparing_files_finished(self):
+        self.main_window.display_tree_on_preparing_files_finished(make_tree(3, 2), 5)
+        view = self.main_window.filesTreeView
+        self.assertEqual(view.model().rowCount(), 1)
+        root = self.get_root()
+        self.assertTrue(view.isExpanded(root))
+        self.assertEqual(view.model().rowCount(root), 5)
+        self.assertEqual(self.main_window.currentIndex(), 2)
 
-    def test_display_tree_on_widget_building_finished(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.display_tree_on_widget_building_finished(item)
-        self.assertEqual(self.main_window.filesTreeWidget.topLevelItemCount(), 1)
+    def test_on_selection_new_item(self):
+        tree = make_tree(0, 1)
+        self.main_window.display_tree_on_preparing_files_finished(tree, 1)
+        folder = self.main_window.filesTreeView.model().index(0, 0, self.get_root())
+        self.main_window.on_selection_new_item(folder)
+        self.assertIs(self.main_window.current_selected_folder, tree.folders[0])
+
+    def get_root(self):
+        model = self.main_window.filesTreeView.model()
+        return model.index(0, 0)
+
+    @staticmethod
+    def get_child_names(parent) -> list[str]:
+        model = parent.model()
+        return [model.index(row, 0, parent).data() for row in range(model.rowCount(parent))]
+
+    def test_on_cancel_button_pressed(self):
+        task = MagicMock()
+        task.isRunning.return_value = True
+        self.main_window.processing_files_task = task
+        self.main_window.on_cancel_button_pressed()
+        task.stop.assert_called_once()
+        self.assertFalse(self.main_window.cancelButton.isEnabled())
 
     def test_on_update(self):
-        self.main_window.on_update(5, 10)
-        self.assertEqual(self.main_window.progressBar.format(), "50% (5/10 )")
+        self.main_window.on_update(Progress(5, 10, 50, 2048, 2.0))
+        self.assertEqual(self.main_window.progressBar.format(), "50% (5/10 ), 25 files/s, 1.0 kb/s, ETA 0:00:02")
+        self.assertEqual(self.main_window.progressBar.value(), 50)
 
     def test_on_text_changed(self):
         self.main_window.customPathEdit.setText("C:\\")
         self.main_window.on_text_changed()
         self.assertFalse(self.main_window.disksLayout.itemAt(0).widget().isEnabled())
 
-    def test_on_selection_new_item(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.on_selection_new_item(item)
-
     def test_on_file_selected(self):
         file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.on_file_selected(item)
+        self.main_window.on_file_selected(file)
+        self.assertIsNone(self.main_window.current_selected_folder)
 
     def test_on_group_selected(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.on_group_selected(item)
+        tree = make_tree(2, 0)
+        self.main_window.on_group_selected(Group("test", tree, tree.files))
+        self.assertFalse(self.main_window.groupWidget.isEnabled())
+        self.assertEqual(self.main_window.chart.chart().series()[0].count(), 1)
 
     def test_update_chart(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.current_selected_folder = item
+        self.main_window.current_selected_folder = make_tree(3, 1)
         self.main_window.update_chart()
+        self.assertEqual(self.main_window.chart.chart().series()[0].count(), 2)
 
     def test_update_filters(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.current_selected_folder = item
+        self.main_window.current_selected_folder = make_tree(1, 1)
         self.main_window.update_filters()
+        items = [self.main_window.filterComboBox.itemText(i) for i in range(self.main_window.filterComboBox.count())]
+        self.assertEqual(sorted(items[1:]), [".txt", "folders"])
+
+    def test_on_clicked(self):
+        tree = make_tree(3, 0)
+        self.main_window.display_tree_on_preparing_files_finished(tree, 3)
+        pie_slice = MagicMock()
+        pie_slice.label.return_value = "file1.txt"
+        self.main_window.on_clicked(pie_slice)
+        selected = self.main_window.filesTreeView.selectionModel().selectedRows()
+        self.assertEqual([index.data() for index in selected], ["file1.txt"])
+
+    def test_chart_of_largest_files_reveals_them_in_tree(self):
+        tree = make_tree(3, 2)
+        self.main_window.display_tree_on_preparing_files_finished(tree, 5)
+        self.main_window.chartContentComboBox.setCurrentText(ChartContent.LARGEST_FILES)
+        self.assertEqual(self.main_window.chart_data.slices[:2], [("file2.txt", 2), ("file1.txt", 1)])
+        self.assertEqual(self.main_window.chart.chart().series()[0].count(), 4)
+        pie_slice = MagicMock()
+        pie_slice.label.return_value = "inner.txt"
+        self.main_window.on_clicked(pie_slice)
+        selected = self.main_window.filesTreeView.selectionModel().selectedRows()
+        self.assertEqual([index.data(FILE_ROLE) for index in selected], [folder.files[0] for folder in tree.folders])
+
+    def test_chart_of_largest_folders_uses_scan_index(self):
+        tree = make_tree(0, 2)
+        tree.folders[1].size = 5
+        task = MagicMock()
+        task.scan.tree = tree
+        task.scan.largest.get_folders.return_value = [tree.folders[1]]
+        self.main_window.processing_files_task = task
+        self.main_window.display_tree_on_preparing_files_finished(tree, 2)
+        self.main_window.set_chart_content(ChartContent.LARGEST_FOLDERS)
+        task.scan.largest.get_folders.assert_called_once_with(tree, main.LARGEST_CHART_COUNT)
+        self.assertEqual(self.main_window.chart_data.slices, [("folder1", 5)])
+
+    def test_chart_of_huge_folder_is_capped_and_cached(self):
+        tree = make_tree(1000, 0)
+        self.main_window.display_tree_on_preparing_files_finished(tree, 1000)
+        series = self.main_window.chart.chart().series()[0]
+        self.assertEqual(series.count(), main.CHART_SLICES + 1)
+        self.assertEqual(series.slices()[0].label(), "file999.txt")
+        self.assertEqual(series.slices()[-1].label(), f"other ({999 - main.CHART_SLICES} items)")
+        self.assertEqual(series.sum(), sum(range(1000)))
+        chart_data = self.main_window.chart_data
+        with patch('main.ChartData') as chart_data_class:
+            self.main_window.update_chart()
+            chart_data_class.assert_not_called()
+        self.assertIs(self.main_window.chart_data, chart_data)
+
+    def test_on_clicked_in_group_chart(self):
+        tree = make_tree(3, 0)
+        self.main_window.display_tree_on_preparing_files_finished(tree, 3)
+        self.main_window.on_group_selected(Group("test", tree, tree.files[1:]))
+        pie_slice = MagicMock()
+        pie_slice.label.return_value = "file2.txt"
+        self.main_window.on_clicked(pie_slice)
+        selected = self.main_window.filesTreeView.selectionModel().selectedRows()
+        self.assertEqual([index.data() for index in selected], ["file2.txt"])
+
+    def test_display_tree_starts_watching_it(self):
+        with tempfile.TemporaryDirectory() as root, patch('main.WATCH_CHANGES', True), \
+                patch('main.Watcher') as watcher_class:
+            tree = File(root)
+            self.main_window.display_tree_on_preparing_files_finished(tree, 0)
+            watcher_class.assert_called_once_with(root, excluded=(str(main.SNAPSHOT_DIR),))
+            watcher_class.return_value.start.assert_called_once()
+            self.assertTrue(self.main_window.watch_timer.isActive())
+            self.main_window.stop_watching()
+            watcher_class.return_value.stop.assert_called_once()
+            self.assertFalse(self.main_window.watch_timer.isActive())
+
+    def test_apply_changes_refreshes_shown_tree(self):
+        with tempfile.TemporaryDirectory() as root:
+            for folder in ("kept/inner", "removed"):
+                Path(root, folder).mkdir(parents=True)
+            Path(root, "removed", "old.bin").write_bytes(b"\0" * 10)
+            with patch('owners.get_owner_id', return_value=0):
+                task = main.disk_usage.CalculatingMemoryUsage(root)
+                task.run()
+            tree = task.tree
+            self.main_window.display_tree_on_preparing_files_finished(tree, 3)
+            kept = next(folder for folder in tree.folders if folder.name == "kept")
+            removed = next(folder for folder in tree.folders if folder.name == "removed")
+            self.main_window.filesTreeView.expand(self.main_window.get_view_index(kept))
+            self.main_window.on_file_selected(removed)
+            Path(root, "removed", "old.bin").unlink()
+            Path(root, "removed").rmdir()
+            Path(root, "kept", "new.bin").write_bytes(b"\0" * 7)
+            self.main_window.watcher = MagicMock()
+            self.main_window.watcher.take_changes.return_value = ({root, str(Path(root, "kept"))}, False)
+            with patch('owners.get_owner_id', return_value=0):
+                self.main_window.apply_changes()
+                self.main_window.update_task.wait()
+            self.assertEqual(tree.size, 10)
+            self.assertEqual(len(tree.folders), 2)
+            QApplication.processEvents()
+        self.assertIsNone(self.main_window.update_task)
+        self.assertEqual(tree.size, 7)
+        self.assertEqual([folder.name for folder in tree.folders], ["kept"])
+        self.assertIs(self.main_window.current_selected_folder, tree)
+        self.assertEqual(self.main_window.expanded_folders, {tree, kept})
+        self.assertTrue(self.main_window.filesTreeView.isExpanded(self.main_window.get_view_index(kept)))
+        self.assertEqual(self.main_window.chart_data.slices, [("kept", 7)])
+
+    def test_size_mode_switches_shown_sizes(self):
+        tree = File.from_values(None, "root", 3, 0, 0, "", None)
+        tree.add_file(File.from_values(tree, "sparse.bin", 3, 0, 0, ".bin", None, 4096))
+        self.main_window.display_tree_on_preparing_files_finished(tree, 1)
+        self.main_window.sizeModeComboBox.setCurrentText(SizeMode.ON_DISK)
+        self.assertTrue(self.main_window.is_on_disk())
+        self.assertEqual(tree.size, 4096)
+        self.assertEqual(self.main_window.chart_data.slices, [("sparse.bin", 4096)])
+        self.main_window.sizeModeComboBox.setCurrentText(SizeMode.APPARENT)
+        self.assertEqual(tree.size, 3)
+        with tempfile.TemporaryDirectory() as snapshots, \
+                patch('main.SNAPSHOT_DIR', Path(snapshots)), \
+                patch('main.ScanThread') as mock_task:
+            self.main_window.sizeModeComboBox.setCurrentText(SizeMode.ON_DISK)
+            self.main_window.start_preparing_files()
+        self.assertTrue(mock_task.call_args.kwargs["on_disk"])
+
+    def test_duplicates_chart_searches_once_and_reveals_copies(self):
+        tree = make_tree(0, 3)
+        self.main_window.display_tree_on_preparing_files_finished(tree, 3)
+        with tempfile.TemporaryDirectory() as snapshots, patch('main.SNAPSHOT_DIR', Path(snapshots)), \
+                patch('main.DuplicatesThread') as thread_class:
+            self.main_window.set_chart_content(ChartContent.DUPLICATES)
+            self.main_window.set_chart_content(ChartContent.DUPLICATES)
+            thread_class.assert_called_once()
+            self.assertEqual(self.main_window.duplicatesLabel.text(), "searching...")
+            self.assertEqual(self.main_window.chart_data.slices, [])
+            copies = [folder.files[0] for folder in tree.folders[:2]]
+            self.main_window.on_duplicates_found(thread_class.return_value, [DuplicateGroup(copies, 1)])
+            self.assertEqual(self.main_window.duplicatesLabel.text(), "1 groups, 1 b reclaimable")
+            self.assertEqual(self.main_window.chart_data.slices, [("inner.txt (2 copies)", 1)])
+            pie_slice = MagicMock()
+            pie_slice.label.return_value = "inner.txt (2 copies)"
+            self.main_window.on_clicked(pie_slice)
+            selected = self.main_window.filesTreeView.selectionModel().selectedRows()
+            self.assertEqual([index.data(FILE_ROLE) for index in selected], copies)
+            self.main_window.display_tree_on_preparing_files_finished(tree, 3)
+            self.assertEqual(thread_class.call_count, 2)
+            self.main_window.set_chart_content(ChartContent.CHILDREN)
+            self.main_window.forget_duplicates()
+        thread_class.return_value.stop.assert_called_once()
 
     def test_on_hovered(self):
         slice = MagicMock()
@@ -201,25 +450,10 @@ class TestMainWindow(unittest.TestCase):
         slice.setExploded.assert_called_once_with(True)
         slice.setLabelVisible.assert_called_once_with()
 
-    def test_remove_children_and_temporarily_save_them(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.main_window.remove_children_and_temporarily_save_them(item)
-
     def test_get_disks(self):
-        with patch('main.win32api.GetLogicalDriveStrings', return_value="C:\\\0D:\\\0"):
+        with patch('win32api.GetLogicalDriveStrings', return_value="C:\\\0D:\\\0"):
             self.assertEqual(self.main_window.get_disks(), ["C", "D"])
 
-    def test_get_children(self):
-        file = File("test.txt")
-        item = QFileItem(file)
-        self.assertEqual(list(self.main_window.get_children(item)), [])
-
-    def test_convert_bytes(self):
-        b = 782634
-        converted = "764.3 kb"
-        self.assertEqual(main.QFileItem.convert_bytes(b), converted)
-
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,49 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import owners
+
+
+class TestOwners(unittest.TestCase):
+
+    def setUp(self):
+        owners.resolve_owner.cache_clear()
+
+    def tearDown(self):
+        owners.resolve_owner.cache_clear()
+
+    def test_get_owner_name_markers(self):
+        self.assertEqual(owners.get_owner_name(None), "")
+        self.assertEqual(owners.get_owner_name(owners.ACCESS_DENIED), "??? (access denied)")
+        self.assertEqual(owners.get_owner_name(owners.UNKNOWN), "???")
+
+    def test_resolve_owner_is_cached(self):
+        with patch('owners.lookup_owner_name', return_value="owner") as lookup:
+            for _ in range(1000):
+                self.assertEqual(owners.get_owner_name(42), "owner")
+            lookup.assert_called_once_with(42)
+
+    def test_resolve_owner_cache_is_bounded(self):
+        with patch('owners.lookup_owner_name', side_effect=str):
+            for owner_id in range(owners.CACHE_SIZE * 2):
+                owners.get_owner_name(owner_id)
+        self.assertEqual(owners.resolve_owner.cache_info().currsize, owners.CACHE_SIZE)
+
+    @unittest.skipIf(os.name == "nt", "POSIX backend")
+    def test_posix_owner_id_is_uid(self):
+        stat_result = os.stat(__file__)
+        self.assertEqual(owners.get_owner_id(__file__, stat_result), stat_result.st_uid)
+        self.assertEqual(owners.lookup_owner_name(2 ** 31 - 7), str(2 ** 31 - 7))
+
+    @unittest.skipUnless(os.name == "nt", "Windows backend")
+    def test_windows_owner_id_is_sid(self):
+        with patch('win32security.GetFileSecurity') as mock_get_file_security, \
+                patch('win32security.ConvertSidToStringSid', return_value="S-1-5-18"):
+            owner_id = owners.get_owner_id(__file__, os.stat(__file__))
+            mock_get_file_security.assert_called_once()
+        self.assertEqual(owner_id, "S-1-5-18")
+
+
+if __name__ == '__main__':
+    unittest.main()
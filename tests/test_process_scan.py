@@ -0,0 +1,190 @@
+import concurrent.futures
+import multiprocessing
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import process_scan
+from disk_usage import CalculatingMemoryUsage, File
+
+
+class InlineExecutor(concurrent.futures.ThreadPoolExecutor):
+    def __init__(self, workers, mp_context=None, initializer=None, initargs=()):
+        super().__init__(workers)
+
+
+class TestProcessScan(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        for i in range(3):
+            for j in range(2):
+                folder = os.path.join(self.root, f"dir{i}", f"sub{j}")
+                os.makedirs(folder)
+                with open(os.path.join(folder, f"data{j}.bin"), "wb") as file:
+                    file.write(b"\0" * (i * 10 + j))
+        with open(os.path.join(self.root, "dir0", "notes.txt"), "wb") as file:
+            file.write(b"\0" * 5)
+
+    def tearDown(self):
+        process_scan.init_worker(None)
+        self.temp_dir.cleanup()
+
+    def test_scan_subtree_round_trip(self):
+        path = os.path.join(self.root, "dir0")
+        with patch('owners.get_owner_id', return_value=0):
+            name, size, folders_count, entries_count, complete, owner_ids, _ = process_scan.scan_subtree(path)
+            expected = File(path)
+            CalculatingMemoryUsage(path).fill_disk_usage(path, expected)
+        folder = File(path)
+        process_scan.read_subtree(name, size, folder, owner_ids)
+        self.assertEqual(owner_ids, [0])
+        self.assertTrue(complete)
+        self.assertEqual(folders_count, 3)
+        self.assertEqual(entries_count, 5)
+        self.assertEqual(folder.size, 6)
+        self.assertEqual(sorted(file.name for file in folder.files), ["notes.txt"])
+        notes = folder.files[0]
+        self.assertEqual(notes.extension, ".txt")
+        self.assertEqual(notes.owner_id, 0)
+        self.assertEqual(notes.mtime, expected.files[0].mtime)
+        self.assertEqual(notes.location, os.path.join(path, "notes.txt"))
+        self.assertEqual(sorted(sub.size for sub in folder.folders), [0, 1])
+
+    def test_cancelled_scan_subtree_is_decoded_as_incomplete(self):
+        cancel_event = MagicMock()
+        cancel_event.is_set.return_value = True
+        process_scan.init_worker(cancel_event)
+        path = os.path.join(self.root, "dir1")
+        name, size, folders_count, entries_count, complete, owner_ids, _ = process_scan.scan_subtree(path)
+        self.assertFalse(complete)
+        self.assertEqual(entries_count, 0)
+        folder = File(path)
+        process_scan.read_subtree(name, size, folder, owner_ids)
+        self.assertTrue(folder.incomplete)
+        self.assertEqual(folder.size, 0)
+
+    def test_unreadable_folder_is_decoded_as_incomplete(self):
+        path = os.path.join(self.root, "dir2")
+        scandir = os.scandir
+
+        def deny_sub0(folder):
+            if os.path.basename(folder) == "sub0":
+                raise PermissionError(13, "Permission denied", folder)
+            return scandir(folder)
+
+        with patch('os.scandir', deny_sub0), patch('owners.get_owner_id', return_value=0):
+            name, size, folders_count, entries_count, complete, owner_ids, _ = process_scan.scan_subtree(path)
+        self.assertTrue(complete)
+        folder = File(path)
+        process_scan.read_subtree(name, size, folder, owner_ids)
+        self.assertTrue(folder.incomplete)
+        self.assertEqual({sub.name: sub.incomplete for sub in folder.folders}, {"sub0": True, "sub1": False})
+        self.assertEqual(folder.size, 21)
+
+    def test_cancelled_scan_in_processes_returns_partial_tree(self):
+        task = CalculatingMemoryUsage(self.root, processes=2)
+        task.stop()
+        task.run()
+        self.assertTrue(task.tree.incomplete)
+        self.assertEqual(task.tree.size, 0)
+
+    def test_scan_subtree_without_owners(self):
+        path = os.path.join(self.root, "dir0")
+        name, size, folders_count, entries_count, complete, owner_ids, _ = process_scan.scan_subtree(path, False)
+        folder = File(path)
+        process_scan.read_subtree(name, size, folder, owner_ids)
+        self.assertEqual(owner_ids, [None])
+        self.assertEqual(folder.files[0].owner, "")
+
+    def test_lazy_scan_subtree_defers_metadata(self):
+        path = os.path.join(self.root, "dir0")
+        with patch('owners.get_owner_id', side_effect=AssertionError("eager owner lookup")):
+            name, size, folders_count, entries_count, complete, owner_ids, _ = \
+                process_scan.scan_subtree(path, True, True)
+        folder = File(path)
+        process_scan.read_subtree(name, size, folder, owner_ids)
+        self.assertEqual(folder.size, 6)
+        notes = folder.files[0]
+        self.assertEqual(notes.extension, ".txt")
+        self.assertEqual(folder.folders[0].extension, "")
+        with patch('owners.get_owner_id', return_value=0):
+            self.assertEqual(notes.owner_id, 0)
+        self.assertEqual(notes.mtime, int(os.stat(notes.location).st_mtime))
+
+    def test_calculating_memory_usage_in_processes_matches_serial_scan(self):
+        serial = CalculatingMemoryUsage(self.root)
+        serial.run()
+        task = CalculatingMemoryUsage(self.root, processes=2)
+        task.run()
+        self.assertEqual(task.tree.size, serial.tree.size)
+        self.assertEqual(task.count, serial.count)
+        self.assertEqual(task.scanned_folders, serial.scanned_folders)
+        self.assertEqual(task.scanned_folders, task.discovered_folders)
+        self.assertEqual(
+            {folder.name: folder.size for folder in task.tree.folders},
+            {folder.name: folder.size for folder in serial.tree.folders},
+        )
+
+    def test_exported_blocks_are_kept_until_released(self):
+        context = multiprocessing.get_context("spawn")
+        released_queues = [context.Queue(), context.Queue()]
+        slots = context.Value("i", 1)
+        process_scan.init_worker(None, released_queues, slots)
+        name, size, _, _, _, owner_ids, slot = process_scan.scan_subtree(os.path.join(self.root, "dir0"), False)
+        self.assertEqual(slot, 1)
+        self.assertEqual(slots.value, 2)
+        self.assertIn(name, process_scan._exported_blocks)
+        process_scan.read_subtree(name, size, File(self.root), owner_ids)
+        released_queues[slot].put(name)
+        while process_scan._exported_blocks:
+            process_scan.release_exported_blocks()
+        self.assertEqual(process_scan._exported_blocks, {})
+
+    def test_failed_subtree_is_marked_incomplete(self):
+        with patch('process_scan.scan_subtree', side_effect=PermissionError(13, "Permission denied")):
+            task = CalculatingMemoryUsage(self.root, processes=2)
+            with patch('concurrent.futures.ProcessPoolExecutor', InlineExecutor):
+                task.run()
+        self.assertTrue(task.tree.incomplete)
+        self.assertTrue(all(folder.incomplete for folder in task.tree.folders))
+
+    def test_subtrees_arriving_after_cancel_are_kept_as_incomplete(self):
+        serial = CalculatingMemoryUsage(self.root)
+        serial.run()
+        task = CalculatingMemoryUsage(self.root, processes=2)
+        scan_subtree = process_scan.scan_subtree
+
+        def scan_and_cancel(*args):
+            result = scan_subtree(*args)
+            task.stop()
+            return result
+
+        with patch('process_scan.scan_subtree', scan_and_cancel), \
+                patch('concurrent.futures.ProcessPoolExecutor', InlineExecutor):
+            task.run()
+        expected = {folder.name: folder.size for folder in serial.tree.folders}
+        scanned = [folder for folder in task.tree.folders if folder.size]
+        self.assertTrue(scanned)
+        self.assertEqual({folder.name: folder.size for folder in scanned},
+                         {folder.name: expected[folder.name] for folder in scanned})
+        self.assertEqual(task.tree.size, sum(folder.size for folder in scanned))
+        self.assertTrue(all(folder.incomplete for folder in task.tree.folders))
+
+    @unittest.skipIf(os.name == "nt", "directory listings do not report hard links on Windows")
+    def test_hard_links_are_counted_once_across_processes(self):
+        os.link(os.path.join(self.root, "dir2", "sub1", "data1.bin"), os.path.join(self.root, "dir1", "link.bin"))
+        os.link(os.path.join(self.root, "dir2", "sub1", "data1.bin"), os.path.join(self.root, "dir2", "link.bin"))
+        serial = CalculatingMemoryUsage(self.root)
+        serial.run()
+        task = CalculatingMemoryUsage(self.root, processes=2)
+        task.run()
+        self.assertEqual(task.tree.size, serial.tree.size)
+        self.assertEqual(task.tree.size, 68)
+        self.assertEqual(len(task.sizes.inodes), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
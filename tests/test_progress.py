@@ -0,0 +1,52 @@
+import unittest
+
+from progress import Progress, ProgressReporter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestProgress(unittest.TestCase):
+
+    def test_progress_rates_and_eta(self):
+        progress = Progress(25, 100, 1000, 4096, 2.0)
+        self.assertEqual(progress.percent, 25)
+        self.assertEqual(progress.entries_per_second, 500)
+        self.assertEqual(progress.bytes_per_second, 2048)
+        self.assertEqual(progress.eta, 6.0)
+
+    def test_progress_without_data(self):
+        progress = Progress(0, 0, 0, 0, 0.0)
+        self.assertEqual(progress.percent, 0)
+        self.assertEqual(progress.entries_per_second, 0)
+        self.assertIsNone(progress.eta)
+
+    def test_reporter_coalesces_updates(self):
+        clock = FakeClock()
+        reports = []
+        reporter = ProgressReporter(reports.append, rate=20, clock=clock)
+        for done in range(1, 1001):
+            clock.now += 0.001
+            reporter.update(done, 1000, done * 10, done * 100)
+        self.assertEqual(len(reports), 20)
+        self.assertEqual(reports[0].done, 1)
+        reporter.finish()
+        self.assertEqual(reports[-1].done, 1000)
+        self.assertEqual(reports[-1].entries, 10000)
+        self.assertAlmostEqual(reports[-1].elapsed, 1.0)
+
+    def test_reporter_without_rate_reports_every_update(self):
+        reports = []
+        reporter = ProgressReporter(reports.append, rate=0)
+        for done in range(5):
+            reporter.update(done, 5)
+        self.assertEqual([report.done for report in reports], [0, 1, 2, 3, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
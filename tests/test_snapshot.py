@@ -0,0 +1,192 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import owners
+import snapshot
+from disk_usage import NOT_LOADED, CalculatingMemoryUsage, File
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.temp_dir.name, "root")
+        self.path = os.path.join(self.temp_dir.name, "scan.snapshot")
+        for folder, name, size in (("", "top.txt", 3), ("a", "mid.log", 10), ("a/b", "deep", 100),
+                                   ("c", "ünïcode.bin", 7), ("c/empty", None, 0)):
+            os.makedirs(os.path.join(self.root, folder), exist_ok=True)
+            if name is not None:
+                with open(os.path.join(self.root, folder, name), "wb") as file:
+                    file.write(b"\0" * size)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def scan(self, **kwargs) -> File:
+        with patch('owners.get_owner_id', return_value=1000):
+            task = CalculatingMemoryUsage(self.root, **kwargs)
+            task.run()
+        return task.tree
+
+    def assert_same_tree(self, expected: File, actual: File):
+        stack = [(expected, actual)]
+        while stack:
+            expected, actual = stack.pop()
+            for name in ("name", "size", "other_size", "inode", "incomplete", "_ctime", "_mtime", "_extension",
+                         "_owner_id"):
+                self.assertEqual(getattr(actual, name), getattr(expected, name), f"{expected.location}: {name}")
+            self.assertEqual(actual.location, expected.location)
+            self.assertEqual([file.name for file in actual.files], [file.name for file in expected.files])
+            self.assertEqual([folder.name for folder in actual.folders], [folder.name for folder in expected.folders])
+            stack.extend(zip(expected.folders, actual.folders))
+            stack.extend(zip(expected.files, actual.files))
+
+    def test_round_trip(self):
+        tree = self.scan()
+        snapshot.save(tree, self.path)
+        self.assert_same_tree(tree, snapshot.load(self.path))
+
+    def test_round_trip_keeps_lazy_metadata_unloaded(self):
+        tree = self.scan(lazy_metadata=True)
+        snapshot.save(tree, self.path)
+        loaded = snapshot.load(self.path)
+        self.assert_same_tree(tree, loaded)
+        deep = next(folder for folder in loaded.folders if folder.name == "a").folders[0].files[0]
+        self.assertIs(deep._ctime, NOT_LOADED)
+        self.assertIs(deep._owner_id, NOT_LOADED)
+        with patch('owners.get_owner_id', return_value=1000):
+            self.assertEqual(deep.owner_id, 1000)
+        self.assertEqual(deep.mtime, int(os.stat(deep.location).st_mtime))
+
+    def test_round_trip_of_special_values(self):
+        tree = File.from_values(None, "root", 7, 1, 2, "", "S-1-5-18")
+        tree._location = self.root
+        tree.add_file(File.from_values(tree, "protected", 0, None, None, "protected system file", owners.UNKNOWN))
+        tree.add_file(File.from_values(tree, "unowned.txt", 7, -5, 2 ** 40, ".txt", None))
+        tree.add_folder(File.from_values(tree, "name\udcff", 0, 3, 4, "", owners.ACCESS_DENIED))
+        tree.folders[0].mark_incomplete()
+        snapshot.save(tree, self.path)
+        loaded = snapshot.load(self.path)
+        self.assert_same_tree(tree, loaded)
+        self.assertTrue(loaded.incomplete)
+        self.assertIsNone(loaded.files[0].creation_date)
+
+    def test_children_are_built_on_access(self):
+        tree = self.scan()
+        snapshot.save(tree, self.path)
+        loaded = snapshot.load(self.path)
+        self.assertEqual(loaded.size, 120)
+        self.assertIsNone(loaded._folders)
+        folder = next(folder for folder in loaded.folders if folder.name == "a")
+        self.assertIsNone(folder._folders)
+        self.assertIs(folder.parent, loaded)
+        self.assertEqual(folder.size, 110)
+        folder.add_file(File.from_values(folder, "new", 1, 0, 0, "", None))
+        self.assertEqual([file.name for file in folder.files], ["mid.log", "new"])
+        self.assertEqual(len(folder.folders), 1)
+
+    def test_mapping_is_closed_once_every_node_is_loaded(self):
+        snapshot.save(self.scan(), self.path)
+        loaded = snapshot.load(self.path)
+        source = loaded._snapshot
+        self.assertFalse(source.buffer.closed)
+        snapshot.save(loaded, self.path)
+        self.assertTrue(source.buffer.closed)
+        loaded = snapshot.load(self.path)
+        source = loaded._snapshot
+        snapshot.close(loaded)
+        self.assertTrue(source.buffer.closed)
+
+    def test_rejects_other_files_and_versions(self):
+        for content in (b"", b"not a snapshot at all, definitely not" * 2):
+            with open(self.path, "wb") as file:
+                file.write(content)
+            with self.assertRaises(snapshot.SnapshotError):
+                snapshot.load(self.path)
+        snapshot.save(self.scan(), self.path)
+        with open(self.path, "r+b") as file:
+            file.seek(len(snapshot.MAGIC))
+            file.write((snapshot.VERSION + 1).to_bytes(2, "little"))
+        with self.assertRaisesRegex(snapshot.SnapshotError, f"version {snapshot.VERSION + 1}"):
+            snapshot.load(self.path)
+
+    def test_damaged_snapshot_raises_snapshot_error(self):
+        snapshot.save(self.scan(), self.path)
+        with open(self.path, "rb") as file:
+            content = file.read()
+        damaged = [content[:length] for length in range(len(content))]
+        damaged += [content[:index] + bytes([content[index] ^ 0xFF]) + content[index + 1:]
+                    for index in range(len(content))]
+        for data in damaged:
+            with open(self.path, "wb") as file:
+                file.write(data)
+            try:
+                tree = snapshot.load(self.path)
+                stack = [tree]
+                while stack:
+                    node = stack.pop()
+                    stack.extend(node.folders)
+                    stack.extend(node.files)
+            except snapshot.SnapshotError:
+                pass
+
+    def test_scan_saves_snapshot(self):
+        with patch('owners.get_owner_id', return_value=1000):
+            task = CalculatingMemoryUsage(self.root, snapshot_path=self.path)
+            task.run()
+        self.assertFalse(os.path.exists(self.path))
+        task.save_snapshot(task.tree)
+        self.assert_same_tree(task.tree, snapshot.load(self.path))
+
+    def test_cancelled_scan_keeps_previous_snapshot(self):
+        snapshot.save(self.scan(), self.path)
+        with open(self.path, "rb") as file:
+            saved = file.read()
+        with open(os.path.join(self.root, "new.txt"), "wb") as file:
+            file.write(b"\0" * 5)
+        with patch('owners.get_owner_id', return_value=1000):
+            task = CalculatingMemoryUsage(self.root, snapshot_path=self.path)
+            task.stop()
+            task.save_snapshot(task.run())
+        with open(self.path, "rb") as file:
+            self.assertEqual(file.read(), saved)
+
+    @unittest.skipIf(os.name == "nt", "directory listings do not report hard links on Windows")
+    def test_round_trip_keeps_hard_links_and_size_mode(self):
+        os.link(os.path.join(self.root, "a", "b", "deep"), os.path.join(self.root, "c", "link"))
+        tree = self.scan(on_disk=True)
+        snapshot.save(tree, self.path, on_disk=True)
+        self.assert_same_tree(tree, snapshot.load(self.path))
+        self.assert_same_tree(tree, snapshot.load(self.path, on_disk=True))
+        apparent = snapshot.load(self.path, on_disk=False)
+        self.assertEqual(apparent.size, 120)
+        self.assertEqual(self.scan(previous=apparent).size, 120)
+
+    def test_folders_changed_during_scan_are_reread(self):
+        tree = self.scan()
+        started_at = time.time() + 1000
+        folder = tree.find_folder(os.path.join(self.root, "a"))
+        folder._mtime = int(started_at)
+        snapshot.save(tree, self.path, started_at=started_at)
+        loaded = snapshot.load(self.path)
+        self.assertIs(loaded.find_folder(os.path.join(self.root, "a"))._mtime, NOT_LOADED)
+        self.assertEqual(loaded._mtime, tree._mtime)
+        self.assertEqual(loaded.find_folder(os.path.join(self.root, "a")).files[0]._mtime,
+                         tree.find_folder(os.path.join(self.root, "a")).files[0]._mtime)
+        with patch('owners.get_owner_id', return_value=1000):
+            task = CalculatingMemoryUsage(self.root, previous=loaded)
+            task.run()
+        self.assertEqual(task.reread_folders, 1)
+
+    def test_save_replaces_previous_snapshot(self):
+        snapshot.save(File(self.root), self.path)
+        snapshot.save(self.scan(), self.path)
+        self.assertEqual(snapshot.load(self.path).size, 120)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import unittest
+from pathlib import Path
+from unittest.mock import PropertyMock, patch
+
+from PyQt5.QtCore import QCoreApplication, QModelIndex, QPersistentModelIndex, Qt
+
+import aggregates
+from disk_usage import File
+from enums import TreeWidgetColumns
+from tests.trees import make_tree
+from tree_model import (FILE_ROLE, FileTreeModel, Group, LayoutProxyModel,
+                        convert_bytes)
+
+
+class TestTreeModel(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QCoreApplication.instance() or QCoreApplication([])
+
+    def setUp(self):
+        self.tree = make_tree(2500, 2, 4)
+        self.model = FileTreeModel(self.tree)
+        self.root = self.model.index(0, 0)
+
+    def test_rows_are_fetched_in_batches(self):
+        self.assertTrue(self.model.hasChildren(self.root))
+        self.assertEqual(self.model.rowCount(self.root), 0)
+        self.assertTrue(self.model.canFetchMore(self.root))
+        self.model.fetchMore(self.root)
+        self.assertEqual(self.model.rowCount(self.root), 1000)
+        self.model.fetch_all(self.root)
+        self.assertEqual(self.model.rowCount(self.root), 2502)
+        self.assertFalse(self.model.canFetchMore(self.root))
+
+    def test_index_and_parent(self):
+        self.model.fetch_all(self.root)
+        folder = self.model.index(1, 0, self.root)
+        self.assertIs(folder.data(FILE_ROLE), self.tree.folders[1])
+        self.model.fetch_all(folder)
+        inner = self.model.index(0, 0, folder)
+        self.assertEqual(inner.data(), "inner.txt")
+        self.assertEqual(inner.parent(), folder)
+        self.assertEqual(self.model.index_of(self.tree.files[5]).row(), 7)
+        self.assertEqual(self.model.index_of(self.tree.folders[1]), folder)
+
+    def test_cells_are_formatted_on_display(self):
+        file = File(str(Path(__file__).parent / "test.txt"))
+        with patch.object(File, 'owner', new_callable=PropertyMock, return_value="owner") as owner:
+            model = FileTreeModel(file)
+            index = model.index(0, TreeWidgetColumns.OWNER)
+            owner.assert_not_called()
+            self.assertEqual(index.data(), "owner")
+        self.assertEqual(model.index(0, TreeWidgetColumns.EXTENSION).data(), ".txt")
+        self.assertEqual(
+            model.index(0, TreeWidgetColumns.CHANGE_DATE).data(), file.change_date.strftime("%H:%M:%S %d.%m.%y")
+        )
+
+    def test_protected_file_cells(self):
+        model = FileTreeModel(File("missing.txt"))
+        self.assertEqual(model.index(0, TreeWidgetColumns.CREATION_DATE).data(), "??:??:?? ??.??.????")
+        self.assertEqual(model.index(0, TreeWidgetColumns.EXTENSION).data(), "protected system file")
+
+    def test_incomplete_size_is_marked(self):
+        self.tree.incomplete = True
+        self.assertTrue(self.model.index(0, TreeWidgetColumns.SIZE).data().endswith("+"))
+
+    def test_subtree_aggregates_are_shown_as_tooltip(self):
+        self.assertIsNone(self.root.data(Qt.ToolTipRole))
+        for folder in self.tree.folders:
+            aggregates.collect(folder, 0)
+        aggregates.collect(self.tree, 0)
+        tooltip = self.root.data(Qt.ToolTipRole)
+        self.assertIn(".txt: 3.7 kb in 2502 files", tooltip)
+        self.assertIn("???: 3.7 kb in 2502 files", tooltip)
+
+    def test_layout_proxy_sorts_by_precomputed_keys(self):
+        proxy = self.make_proxy()
+        proxy.sort(TreeWidgetColumns.SIZE, Qt.DescendingOrder)
+        root = proxy.index(0, 0)
+        proxy.fetchMore(root)
+        sizes = [proxy.index(row, 0, root).data(FILE_ROLE).size for row in range(proxy.rowCount(root))]
+        self.assertEqual(sizes, sorted(sizes, reverse=True))
+        self.assertEqual(sizes[:4], [3, 3, 3, 3])
+        self.assertEqual(self.tree.files[3].name, "file3.txt")
+
+    def test_layout_proxy_sort_keeps_persistent_indexes(self):
+        proxy = self.make_proxy()
+        proxy.sort(TreeWidgetColumns.FILE_OR_FOLDER_NAME, Qt.AscendingOrder)
+        root = proxy.index(0, 0)
+        proxy.fetchMore(root)
+        folder = QPersistentModelIndex(proxy.index(0, 0, root))
+        self.assertEqual(folder.data(), "file0.txt")
+        with patch.object(File, 'size', new_callable=PropertyMock) as size:
+            proxy.sort(TreeWidgetColumns.FILE_OR_FOLDER_NAME, Qt.DescendingOrder)
+            size.assert_not_called()
+        self.assertEqual(proxy.index(0, 0, root).data(), "folder1")
+        self.assertFalse(folder.isValid())
+        proxy.sort(TreeWidgetColumns.FILE_OR_FOLDER_NAME, Qt.AscendingOrder)
+        moved = QPersistentModelIndex(proxy.index(1, 0, root))
+        self.assertEqual(moved.data(), "file1.txt")
+        proxy.sort(TreeWidgetColumns.SIZE, Qt.AscendingOrder)
+        self.assertEqual(moved.row(), 627)
+        self.assertEqual(proxy.index(627, 0, root).data(), "file1.txt")
+
+    def test_layout_proxy_sorts_inside_groups(self):
+        proxy = self.make_proxy()
+        proxy.sort(TreeWidgetColumns.FILE_OR_FOLDER_NAME, Qt.DescendingOrder)
+        files = self.tree.files
+        groups = [Group("first", self.tree, files[:3]), Group("second", self.tree, files[3:5])]
+        proxy.set_layout(self.tree, groups)
+        root = proxy.index(0, 0)
+        self.assertEqual([proxy.index(row, 0, root).data() for row in range(2)], ["first", "second"])
+        first = proxy.index(0, 0, root)
+        self.assertEqual([proxy.index(row, 0, first).data() for row in range(3)],
+                         ["file2.txt", "file1.txt", "file0.txt"])
+
+    def test_layout_proxy_passes_through_unarranged_folders(self):
+        proxy = self.make_proxy()
+        root = proxy.index(0, 0)
+        self.assertTrue(proxy.canFetchMore(root))
+        proxy.fetchMore(root)
+        self.assertEqual(proxy.rowCount(root), 1000)
+        self.assertEqual(proxy.index(0, 0, root).data(), "folder0")
+        self.assertEqual(proxy.mapToSource(proxy.index(3, 0, root)), self.model.index(3, 0, self.root))
+
+    def test_layout_proxy_groups_folder_without_moving_files(self):
+        proxy = self.make_proxy()
+        files = self.tree.files
+        groups = [Group("small", self.tree, files[:2]), Group("folders", self.tree, self.tree.folders)]
+        proxy.set_layout(self.tree, groups)
+        root = proxy.index(0, 0)
+        self.assertEqual(proxy.rowCount(root), 2)
+        small = proxy.index(0, 0, root)
+        self.assertEqual(small.data(), "small")
+        self.assertEqual(small.data(Qt.BackgroundRole), proxy.data(proxy.index(1, 0, root), Qt.BackgroundRole))
+        member = proxy.index(1, 0, small)
+        self.assertIs(member.data(FILE_ROLE), files[1])
+        self.assertEqual(member.parent(), small)
+        folders = proxy.index(1, 0, root)
+        folder = proxy.index(0, 0, folders)
+        proxy.fetchMore(folder)
+        inner = proxy.index(0, 0, folder)
+        self.assertEqual(inner.parent().parent(), folders)
+        self.assertEqual(proxy.mapFromSource(self.model.index_of(files[1])), member)
+        self.assertFalse(proxy.mapFromSource(self.model.index_of(files[2])).isValid())
+        self.assertEqual(len(self.tree.files), 2500)
+        proxy.reset_layout(self.tree)
+        self.assertEqual(proxy.rowCount(root), 2502)
+        self.assertEqual(proxy.index(2, 0, root).data(), "file0.txt")
+
+    def test_set_tree_resets_layouts(self):
+        proxy = self.make_proxy()
+        proxy.set_layout(self.tree, self.tree.folders)
+        self.model.set_tree(make_tree(1, 0, 4))
+        self.assertFalse(proxy.layouts)
+        self.assertEqual(proxy.rowCount(proxy.index(0, 0)), 0)
+        self.assertEqual(proxy.rowCount(QModelIndex()), 1)
+
+    def test_convert_bytes(self):
+        self.assertEqual(convert_bytes(782634), "764.3 kb")
+
+    def make_proxy(self) -> LayoutProxyModel:
+        proxy = LayoutProxyModel()
+        proxy.setSourceModel(self.model)
+        return proxy
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import watcher
+from watcher import Watcher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestWatcher(unittest.TestCase):
+
+    def wait_for_changes(self, folder_watcher, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        changes = set()
+        while time.monotonic() < deadline:
+            paths, rescan = folder_watcher.take_changes()
+            changes |= paths
+            if changes or rescan:
+                return changes
+            time.sleep(0.05)
+        return changes
+
+    def test_take_changes_waits_until_changes_settle(self):
+        clock = FakeClock()
+        folder_watcher = Watcher("root", debounce=0.5, max_delay=2.0, clock=clock)
+        self.assertEqual(folder_watcher.take_changes(), (set(), False))
+        folder_watcher.add_change("root/a")
+        clock.now = 0.3
+        folder_watcher.add_change("root/b")
+        self.assertEqual(folder_watcher.take_changes(), (set(), False))
+        clock.now = 0.8
+        self.assertEqual(folder_watcher.take_changes(), ({"root/a", "root/b"}, False))
+        self.assertEqual(folder_watcher.take_changes(), (set(), False))
+
+    def test_take_changes_flushes_busy_batches_after_max_delay(self):
+        clock = FakeClock()
+        folder_watcher = Watcher("root", debounce=0.5, max_delay=2.0, clock=clock)
+        for step in range(5):
+            clock.now = step * 0.4
+            folder_watcher.add_change(f"root/{step}")
+        self.assertEqual(folder_watcher.take_changes(), (set(), False))
+        clock.now = 2.0
+        folder_watcher.request_rescan()
+        paths, rescan = folder_watcher.take_changes()
+        self.assertEqual(len(paths), 5)
+        self.assertTrue(rescan)
+
+    def test_polling_reports_changed_folders(self):
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, "a", "b"))
+            folder_watcher = Watcher(root, use_inotify=False, debounce=0, poll_interval=0.05)
+            folder_watcher.start()
+            try:
+                folder_watcher.ready.wait(5)
+                self.assertEqual(folder_watcher.backend, "polling")
+                os.makedirs(os.path.join(root, "a", "b", "new"))
+                self.assertEqual(self.wait_for_changes(folder_watcher), {os.path.join(root, "a", "b")})
+                with open(os.path.join(root, "a", "b", "new", "file.txt"), "w") as file:
+                    file.write("data")
+                self.assertEqual(self.wait_for_changes(folder_watcher), {os.path.join(root, "a", "b", "new")})
+            finally:
+                folder_watcher.stop()
+
+    @unittest.skipIf(watcher.load_inotify() is None, "inotify is not available")
+    def test_inotify_reports_changed_and_moved_folders(self):
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, "a", "b"))
+            folder_watcher = Watcher(root, debounce=0)
+            folder_watcher.start()
+            try:
+                folder_watcher.ready.wait(5)
+                self.assertEqual(folder_watcher.backend, "inotify")
+                os.rename(os.path.join(root, "a", "b"), os.path.join(root, "c"))
+                self.assertEqual(self.wait_for_changes(folder_watcher), {root, os.path.join(root, "a")})
+                with open(os.path.join(root, "c", "file.txt"), "w") as file:
+                    file.write("data")
+                self.assertEqual(self.wait_for_changes(folder_watcher), {os.path.join(root, "c")})
+            finally:
+                folder_watcher.stop()
+
+    def test_falls_back_to_polling_when_inotify_fails(self):
+        with tempfile.TemporaryDirectory() as root:
+            folder_watcher = Watcher(root, poll_interval=0.05)
+            with patch.object(Watcher, 'watch_with_inotify', side_effect=OSError(28, "no space")):
+                folder_watcher.start()
+                folder_watcher.ready.wait(5)
+            try:
+                self.assertEqual(folder_watcher.backend, "polling")
+            finally:
+                folder_watcher.stop()
+
+    def test_excluded_folders_are_not_watched(self):
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, "a"))
+            os.makedirs(os.path.join(root, "snapshots", "old"))
+            folder_watcher = Watcher(root, use_inotify=False, debounce=0, poll_interval=0.05,
+                                     excluded=(os.path.join(root, "snapshots"),))
+            times = {}
+            folder_watcher.add_polled_folder(root, times)
+            self.assertEqual(set(times), {root, os.path.join(root, "a")})
+            folder_watcher.start()
+            try:
+                folder_watcher.ready.wait(5)
+                with open(os.path.join(root, "snapshots", "hashes.json"), "w") as file:
+                    file.write("{}")
+                os.makedirs(os.path.join(root, "snapshots", "new"))
+                self.assertEqual(self.wait_for_changes(folder_watcher, timeout=0.5), set())
+                with open(os.path.join(root, "a", "file.txt"), "w") as file:
+                    file.write("data")
+                self.assertEqual(self.wait_for_changes(folder_watcher), {os.path.join(root, "a")})
+            finally:
+                folder_watcher.stop()
+
+    def test_stop_interrupts_walking_the_tree(self):
+        iterate_directories = watcher.iterate_directories
+        with tempfile.TemporaryDirectory() as root:
+            for name in ("a", "b", "c"):
+                os.makedirs(os.path.join(root, name))
+            folder_watcher = Watcher(root, use_inotify=False)
+
+            def stop_after_first(folder, excluded):
+                for path in iterate_directories(folder, excluded):
+                    yield path
+                    folder_watcher.stopped.set()
+
+            times = {}
+            with patch('watcher.iterate_directories', stop_after_first):
+                folder_watcher.add_polled_folder(root, times)
+        self.assertEqual(list(times), [root])
+
+
+if __name__ == '__main__':
+    unittest.main()
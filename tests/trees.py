@@ -0,0 +1,13 @@
+from disk_usage import File
+
+
+def make_tree(files_count: int, folders_count: int, size_cycle: int = None) -> File:
+    tree = File.from_values(None, "root", 0, 0, 0, "", None)
+    for i in range(files_count):
+        size = i if size_cycle is None else i % size_cycle
+        tree.add_file(File.from_values(tree, f"file{i}.txt", size, 0, 0, ".txt", None))
+    for i in range(folders_count):
+        folder = File.from_values(tree, f"folder{i}", 0, 0, 0, "", None)
+        folder.add_file(File.from_values(folder, "inner.txt", 1, 0, 0, ".txt", None))
+        tree.add_folder(folder)
+    return tree
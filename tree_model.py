@@ -0,0 +1,447 @@
+import operator
+
+from PyQt5.QtCore import QAbstractItemModel, QAbstractProxyModel, QModelIndex, Qt
+from PyQt5.QtGui import QColor, QFont
+
+import owners
+from aggregates import Aggregates
+from disk_usage import File
+from enums import TreeWidgetColumns
+
+FILE_ROLE = Qt.UserRole
+FETCH_BATCH = 1000
+HEADERS = ("File/folder name", "Size", "Creation date", "Change date", "Extension", "Owner")
+GROUP_COLOR = QColor(255, 239, 232)
+UNKNOWN_DATE = "??:??:?? ??.??.????"
+AGGREGATE_ROWS = 5
+SORT_KEYS = {
+    TreeWidgetColumns.FILE_OR_FOLDER_NAME: operator.attrgetter("name"),
+    TreeWidgetColumns.SIZE: operator.attrgetter("size"),
+    TreeWidgetColumns.CREATION_DATE: lambda file: file.ctime or 0,
+    TreeWidgetColumns.CHANGE_DATE: lambda file: file.mtime or 0,
+    TreeWidgetColumns.EXTENSION: operator.attrgetter("extension"),
+    TreeWidgetColumns.OWNER: operator.attrgetter("owner"),
+}
+
+
+def convert_bytes(size) -> str:
+    if size < 1024:
+        return f"{size} b"
+    elif 1024 <= size < 1024 ** 2:
+        return f"{round(size / 1024, 1)} kb"
+    elif 1024 ** 2 <= size < 1024 ** 3:
+        return f"{round(size / 1024 ** 2, 1)} mb"
+    else:
+        return f"{round(size / 1024 ** 3, 1)} gb"
+
+
+def format_date(date) -> str:
+    return UNKNOWN_DATE if date is None else date.strftime("%H:%M:%S %d.%m.%y")
+
+
+def format_aggregates(aggregates: Aggregates) -> str:
+    lines = []
+    tables = (
+        ("Extensions", aggregates.extensions, lambda extension: extension or "no extension"),
+        ("Owners", aggregates.owners, lambda owner_id: owners.get_owner_name(owner_id) or "???"),
+        ("Changed", aggregates.ages, str),
+    )
+    for title, table, get_name in tables:
+        lines.append(f"{title}:")
+        for key, size, count in Aggregates.get_largest(table, AGGREGATE_ROWS):
+            lines.append(f"  {get_name(key)}: {convert_bytes(size)} in {count} files")
+    return "\n".join(lines)
+
+
+class Group:
+    __slots__ = ("name", "folder", "files", "size")
+
+    def __init__(self, name: str, folder: File, files: list[File]):
+        self.name = name
+        self.folder = folder
+        self.files = files
+        self.size = sum(file.size for file in files)
+
+
+class FileTreeModel(QAbstractItemModel):
+    def __init__(self, tree: File = None, batch: int = FETCH_BATCH, parent=None):
+        super().__init__(parent)
+        self.tree = tree
+        self.batch = batch
+        self.fetched = {}
+        self.rows = {}
+
+    def set_tree(self, tree: File):
+        self.beginResetModel()
+        self.tree = tree
+        self.fetched.clear()
+        self.rows.clear()
+        self.endResetModel()
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, self.tree)
+        return self.createIndex(row, column, self.get_child(parent.internalPointer(), row))
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        file = index.internalPointer()
+        if file is self.tree:
+            return QModelIndex()
+        return self.index_of(file.parent)
+
+    def index_of(self, file: File, column: int = 0) -> QModelIndex:
+        if file is self.tree:
+            return self.createIndex(0, column, file)
+        return self.createIndex(self.get_row(file), column, file)
+
+    def get_row(self, file: File) -> int:
+        row = self.rows.get(id(file))
+        if row is None:
+            for row, child in enumerate(self.get_children(file.parent)):
+                self.rows[id(child)] = row
+            row = self.rows[id(file)]
+        return row
+
+    @staticmethod
+    def get_child(folder: File, row: int) -> File:
+        folders = folder.folders
+        return folders[row] if row < len(folders) else folder.files[row - len(folders)]
+
+    @staticmethod
+    def get_children(folder: File) -> list[File]:
+        return [*folder.folders, *folder.files]
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        if not parent.isValid():
+            return 0 if self.tree is None else 1
+        return self.fetched.get(id(parent.internalPointer()), 0)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(HEADERS)
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        if parent.column() > 0:
+            return False
+        if not parent.isValid():
+            return self.tree is not None
+        folder = parent.internalPointer()
+        return bool(folder.folders or folder.files)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        if not parent.isValid():
+            return False
+        folder = parent.internalPointer()
+        return self.fetched.get(id(folder), 0) < len(folder.folders) + len(folder.files)
+
+    def fetchMore(self, parent: QModelIndex):
+        self.fetch(parent, self.batch)
+
+    def fetch_all(self, parent: QModelIndex):
+        if parent.isValid():
+            folder = parent.internalPointer()
+            self.fetch(parent, len(folder.folders) + len(folder.files))
+
+    def fetch(self, parent: QModelIndex, count: int):
+        if not parent.isValid() or parent.column() > 0:
+            return
+        folder = parent.internalPointer()
+        fetched = self.fetched.get(id(folder), 0)
+        count = min(count, len(folder.folders) + len(folder.files) - fetched)
+        if count <= 0:
+            return
+        self.beginInsertRows(parent, fetched, fetched + count - 1)
+        self.fetched[id(folder)] = fetched + count
+        self.endInsertRows()
+
+    def flags(self, index: QModelIndex):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def headerData(self, section: int, orientation, role: int = Qt.DisplayRole):
+        if orientation != Qt.Horizontal:
+            return None
+        if role == Qt.DisplayRole:
+            return HEADERS[section]
+        if role == Qt.FontRole:
+            return QFont("Montserrat Medium")
+        return None
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        return self.get_data(index.internalPointer(), index.column(), role)
+
+    @classmethod
+    def get_data(cls, node, column: int, role: int):
+        if role == FILE_ROLE:
+            return node
+        if isinstance(node, Group):
+            return cls.get_group_data(node, column, role)
+        if role == Qt.DisplayRole:
+            return cls.get_text(node, column)
+        if role == Qt.ToolTipRole and node.aggregates is not None:
+            return format_aggregates(node.aggregates)
+        return None
+
+    @staticmethod
+    def get_group_data(group: Group, column: int, role: int):
+        if role == Qt.BackgroundRole:
+            return GROUP_COLOR
+        if role == Qt.DisplayRole and column == TreeWidgetColumns.FILE_OR_FOLDER_NAME:
+            return group.name
+        return None
+
+    @staticmethod
+    def get_text(file: File, column: int) -> str:
+        match column:
+            case TreeWidgetColumns.FILE_OR_FOLDER_NAME:
+                return file.name
+            case TreeWidgetColumns.SIZE:
+                return convert_bytes(file.size) + ("+" if file.incomplete else "")
+            case TreeWidgetColumns.CREATION_DATE:
+                return format_date(file.creation_date)
+            case TreeWidgetColumns.CHANGE_DATE:
+                return format_date(file.change_date)
+            case TreeWidgetColumns.EXTENSION:
+                return str(file.extension)
+            case TreeWidgetColumns.OWNER:
+                return file.owner
+        return ""
+
+
+class LayoutProxyModel(QAbstractProxyModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.layouts = {}
+        self.orders = {}
+        self.positions = {}
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+
+    def setSourceModel(self, model: FileTreeModel):
+        self.beginResetModel()
+        super().setSourceModel(model)
+        model.modelAboutToBeReset.connect(self.on_source_about_to_be_reset)
+        model.modelReset.connect(self.endResetModel)
+        model.rowsAboutToBeInserted.connect(self.on_source_rows_about_to_be_inserted)
+        model.rowsInserted.connect(self.on_source_rows_inserted)
+        self.endResetModel()
+
+    def on_source_about_to_be_reset(self):
+        self.beginResetModel()
+        self.layouts.clear()
+        self.orders.clear()
+        self.positions.clear()
+
+    def on_source_rows_about_to_be_inserted(self, parent: QModelIndex, first: int, last: int):
+        if not self.is_arranged(parent.internalPointer()):
+            self.beginInsertRows(self.mapFromSource(parent), first, last)
+
+    def on_source_rows_inserted(self, parent: QModelIndex, first: int, last: int):
+        if not self.is_arranged(parent.internalPointer()):
+            self.endInsertRows()
+
+    def is_arranged(self, folder) -> bool:
+        return folder in self.layouts
+
+    def set_layout(self, folder: File, nodes: list, sort: bool = True):
+        source = self.sourceModel()
+        source.fetch_all(source.index_of(folder))
+        parent = self.index_of(folder)
+        self.remove_children(folder, parent)
+        if sort:
+            self.sort_nodes(nodes)
+        if nodes:
+            self.beginInsertRows(parent, 0, len(nodes) - 1)
+        self.layouts[folder] = nodes
+        self.set_positions(folder, nodes)
+        if nodes:
+            self.endInsertRows()
+
+    def reset_layout(self, folder: File):
+        if not self.is_arranged(folder):
+            return
+        parent = self.index_of(folder)
+        self.remove_children(folder, parent)
+        source_parent = self.sourceModel().index_of(folder)
+        count = self.sourceModel().rowCount(source_parent)
+        if count:
+            self.beginInsertRows(parent, 0, count - 1)
+        del self.layouts[folder]
+        self.set_positions(folder, self.get_order(folder))
+        if count:
+            self.endInsertRows()
+
+    def remove_children(self, folder: File, parent: QModelIndex):
+        count = self.rowCount(parent)
+        if count:
+            self.beginRemoveRows(parent, 0, count - 1)
+        nodes = self.layouts[folder] if self.is_arranged(folder) else self.orders.get(folder, ())
+        for node in nodes:
+            self.positions.pop(node, None)
+            if isinstance(node, Group):
+                for member in node.files:
+                    self.positions.pop(member, None)
+        self.layouts[folder] = []
+        if count:
+            self.endRemoveRows()
+
+    def get_order(self, folder: File) -> list[File]:
+        order = self.orders.get(folder)
+        if order is None:
+            order = FileTreeModel.get_children(folder)
+            self.sort_files(order)
+            self.orders[folder] = order
+            if not self.is_arranged(folder):
+                self.set_positions(folder, order)
+        return order
+
+    def set_positions(self, parent, nodes: list):
+        positions = self.positions
+        for row, node in enumerate(nodes):
+            positions[node] = (parent, row)
+            if isinstance(node, Group):
+                for member_row, member in enumerate(node.files):
+                    positions[member] = (node, member_row)
+
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        if column == self.sort_column and order == self.sort_order:
+            return
+        reverse_only = column == self.sort_column
+        self.layoutAboutToBeChanged.emit([], QAbstractItemModel.VerticalSortHint)
+        persistent = self.persistentIndexList()
+        nodes = [(index.internalPointer(), index.column()) for index in persistent]
+        self.sort_column = column
+        self.sort_order = order
+        for folder, files in self.orders.items():
+            self.sort_files(files, reverse_only)
+            if not self.is_arranged(folder):
+                self.set_positions(folder, files)
+        for folder, layout in self.layouts.items():
+            self.sort_nodes(layout, reverse_only)
+            self.set_positions(folder, layout)
+        self.changePersistentIndexList(persistent, [self.find_index(node, column) for node, column in nodes])
+        self.layoutChanged.emit([], QAbstractItemModel.VerticalSortHint)
+
+    def sort_nodes(self, nodes: list, reverse_only: bool = False):
+        if nodes and isinstance(nodes[0], Group):
+            for group in nodes:
+                self.sort_files(group.files, reverse_only)
+        else:
+            self.sort_files(nodes, reverse_only)
+
+    def sort_files(self, files: list[File], reverse_only: bool = False):
+        if self.sort_column is None:
+            return
+        if reverse_only:
+            files.reverse()
+        else:
+            files.sort(key=SORT_KEYS[self.sort_column], reverse=self.sort_order == Qt.DescendingOrder)
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column, self.sourceModel().tree)
+        node = parent.internalPointer()
+        if isinstance(node, Group):
+            child = node.files[row]
+        elif self.is_arranged(node):
+            child = self.layouts[node][row]
+        else:
+            child = self.get_order(node)[row]
+        return self.createIndex(row, column, child)
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        node = index.internalPointer()
+        if node is self.sourceModel().tree:
+            return QModelIndex()
+        return self.index_of(self.positions[node][0])
+
+    def index_of(self, node, column: int = 0) -> QModelIndex:
+        if node is self.sourceModel().tree:
+            return self.createIndex(0, column, node)
+        position = self.positions.get(node)
+        if position is None and not self.is_arranged(node.parent):
+            self.get_order(node.parent)
+            position = self.positions.get(node)
+        if position is None:
+            return QModelIndex()
+        return self.createIndex(position[1], column, node)
+
+    def find_index(self, node, column: int = 0) -> QModelIndex:
+        index = self.index_of(node, column)
+        if index.isValid() and index.row() >= self.rowCount(index.parent()):
+            return QModelIndex()
+        return index
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        if not parent.isValid():
+            return self.sourceModel().rowCount()
+        node = parent.internalPointer()
+        if isinstance(node, Group):
+            return len(node.files)
+        if self.is_arranged(node):
+            return len(self.layouts[node])
+        return self.sourceModel().rowCount(self.sourceModel().index_of(node))
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return self.sourceModel().columnCount()
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        if parent.column() > 0:
+            return False
+        if not parent.isValid():
+            return self.sourceModel().hasChildren()
+        node = parent.internalPointer()
+        if isinstance(node, Group):
+            return bool(node.files)
+        if self.is_arranged(node):
+            return bool(self.layouts[node])
+        return bool(node.folders or node.files)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        if not parent.isValid():
+            return False
+        node = parent.internalPointer()
+        if isinstance(node, Group) or self.is_arranged(node):
+            return False
+        return self.sourceModel().canFetchMore(self.sourceModel().index_of(node))
+
+    def fetchMore(self, parent: QModelIndex):
+        if self.canFetchMore(parent):
+            self.sourceModel().fetchMore(self.sourceModel().index_of(parent.internalPointer()))
+
+    def mapToSource(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid() or isinstance(index.internalPointer(), Group):
+            return QModelIndex()
+        return self.sourceModel().index_of(index.internalPointer(), index.column())
+
+    def mapFromSource(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        return self.find_index(index.internalPointer(), index.column())
+
+    def flags(self, index: QModelIndex):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def headerData(self, section: int, orientation, role: int = Qt.DisplayRole):
+        return self.sourceModel().headerData(section, orientation, role)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        return FileTreeModel.get_data(index.internalPointer(), index.column(), role)
@@ -0,0 +1,277 @@
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable
+
+DEBOUNCE = 0.5
+MAX_DELAY = 2.0
+POLL_INTERVAL = 2.0
+READ_TIMEOUT = 0.2
+
+IN_MODIFY = 0x2
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+IN_DONT_FOLLOW = 0x2000000
+IN_EXCL_UNLINK = 0x4000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+              | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+EVENT = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+def load_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    import ctypes
+    import ctypes.util
+
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    libc.inotify_rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+    return libc
+
+
+def iterate_directories(root: str, excluded: frozenset = frozenset()):
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        if excluded and os.path.normpath(path) in excluded:
+            continue
+        yield path
+        try:
+            with os.scandir(path) as entries:
+                stack.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+        except OSError:
+            pass
+
+
+def is_inside(path: str, folder: str) -> bool:
+    return path == folder or path.startswith(folder.rstrip(os.sep) + os.sep)
+
+
+class Watcher:
+    def __init__(self, root: str, use_inotify: bool = True, debounce: float = DEBOUNCE,
+                 max_delay: float = MAX_DELAY, poll_interval: float = POLL_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic, excluded: tuple = ()):
+        self.root = root
+        self.excluded = frozenset(os.path.normpath(os.path.abspath(path)) for path in excluded)
+        self.use_inotify = use_inotify
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self.backend = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.ready = threading.Event()
+        self.thread = None
+        self.pending = set()
+        self.rescan_needed = False
+        self.first_change = None
+        self.last_change = None
+        self.libc = None
+        self.fd = -1
+        self.paths = {}
+        self.watches = {}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def run(self):
+        try:
+            if self.use_inotify:
+                self.libc = load_inotify()
+                if self.libc is not None:
+                    try:
+                        self.watch_with_inotify()
+                        return
+                    except OSError:
+                        pass
+                    finally:
+                        self.close_inotify()
+            self.watch_with_polling()
+        finally:
+            self.ready.set()
+
+    def add_change(self, path: str):
+        with self.lock:
+            self.pending.add(path)
+            self.mark_changed()
+
+    def request_rescan(self):
+        with self.lock:
+            self.rescan_needed = True
+            self.mark_changed()
+
+    def mark_changed(self):
+        now = self.clock()
+        if self.first_change is None:
+            self.first_change = now
+        self.last_change = now
+
+    def take_changes(self) -> tuple[set, bool]:
+        with self.lock:
+            if self.first_change is None:
+                return set(), False
+            now = self.clock()
+            if now - self.last_change < self.debounce and now - self.first_change < self.max_delay:
+                return set(), False
+            changes, rescan = self.pending, self.rescan_needed
+            self.pending = set()
+            self.rescan_needed = False
+            self.first_change = self.last_change = None
+            return changes, rescan
+
+    def watch_with_inotify(self):
+        import ctypes
+
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.add_watches(self.root)
+        self.backend = "inotify"
+        self.ready.set()
+        while not self.stopped.is_set():
+            readable, _, _ = select.select([self.fd], [], [], READ_TIMEOUT)
+            if readable:
+                self.read_events()
+
+    def close_inotify(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.paths.clear()
+        self.watches.clear()
+
+    def add_watches(self, folder: str):
+        import ctypes
+
+        for path in iterate_directories(folder, self.excluded):
+            if self.stopped.is_set():
+                return
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                    continue
+                raise OSError(error, f"inotify_add_watch failed for {path}")
+            self.paths[wd] = path
+            self.watches[path] = wd
+
+    def remove_watches(self, folder: str):
+        for path in [path for path in self.watches if is_inside(path, folder)]:
+            wd = self.watches.pop(path)
+            self.paths.pop(wd, None)
+            self.libc.inotify_rm_watch(self.fd, wd)
+
+    def move_watches(self, source: str, destination: str):
+        for path in [path for path in self.watches if is_inside(path, source)]:
+            wd = self.watches.pop(path)
+            moved = destination + path[len(source):]
+            self.paths[wd] = moved
+            self.watches[moved] = wd
+
+    def read_events(self):
+        moved_from = {}
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT.unpack_from(data, offset)
+                offset += EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                self.handle_event(wd, mask, cookie, name, moved_from)
+        for path in moved_from.values():
+            self.remove_watches(path)
+
+    def handle_event(self, wd: int, mask: int, cookie: int, name: str, moved_from: dict):
+        if mask & IN_Q_OVERFLOW:
+            self.request_rescan()
+            return
+        folder = self.paths.get(wd)
+        if folder is None:
+            return
+        if mask & IN_IGNORED:
+            self.paths.pop(wd, None)
+            if self.watches.get(folder) == wd:
+                del self.watches[folder]
+            return
+        if mask & IN_DELETE_SELF:
+            return
+        self.add_change(folder)
+        if not mask & IN_ISDIR:
+            return
+        path = os.path.join(folder, name)
+        if mask & IN_MOVED_FROM:
+            moved_from[cookie] = path
+        elif mask & IN_MOVED_TO and cookie in moved_from:
+            self.move_watches(moved_from.pop(cookie), path)
+        elif mask & (IN_CREATE | IN_MOVED_TO):
+            self.add_watches(path)
+
+    def watch_with_polling(self):
+        self.backend = "polling"
+        times = {}
+        self.add_polled_folder(self.root, times)
+        self.ready.set()
+        while not self.stopped.wait(self.poll_interval):
+            for path in list(times):
+                if self.stopped.is_set():
+                    return
+                try:
+                    stat_result = os.stat(path)
+                except OSError:
+                    del times[path]
+                    continue
+                current = (stat_result.st_ctime_ns, stat_result.st_mtime_ns)
+                if times[path] != current:
+                    times[path] = current
+                    self.add_change(path)
+                    self.add_new_subfolders(path, times)
+
+    def add_polled_folder(self, folder: str, times: dict):
+        for path in iterate_directories(folder, self.excluded):
+            if self.stopped.is_set():
+                return
+            try:
+                stat_result = os.stat(path)
+            except OSError:
+                continue
+            times[path] = (stat_result.st_ctime_ns, stat_result.st_mtime_ns)
+
+    def add_new_subfolders(self, folder: str, times: dict):
+        try:
+            with os.scandir(folder) as entries:
+                subfolders = [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return
+        for path in subfolders:
+            if self.stopped.is_set():
+                return
+            if path not in times:
+                self.add_polled_folder(path, times)